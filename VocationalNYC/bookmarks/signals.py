@@ -0,0 +1,13 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from vocationalnyc.conditional import bump_page_versions
+from .models import BookmarkList
+
+
+@receiver(post_save, sender=BookmarkList)
+@receiver(post_delete, sender=BookmarkList)
+def bump_owner_pages(sender, instance, raw=False, **kwargs):
+    # Catalog pages offer the visitor's bookmark lists in the bookmark modal
+    if not raw:
+        bump_page_versions("user", [instance.user_id])
@@ -0,0 +1,103 @@
+"""
+Read-only JSON API over the course catalog.
+
+``GET /courses/api/`` takes the same filter parameters as the course list
+(see ``courses.filters``), the list's ``sort``/``order``/``per_page``/
+``cursor`` pagination, and ``fields``: a comma-separated subset of
+``API_FIELDS`` to return (``DEFAULT_FIELDS`` if omitted). Only the columns
+behind the requested fields are loaded.
+
+A response depends on nothing but its query string and the catalog, so its
+``ETag`` is a hash of the two, with the catalog side taken from the result
+cache's version stamp; ``Last-Modified`` is when that stamp last changed.
+Clients and shared caches revalidate and get a 304 until the catalog changes.
+"""
+
+import hashlib
+
+from django.urls import reverse
+
+from .results import results_modified, results_version
+
+# name -> (columns to load, how to read the value off a course)
+API_FIELDS = {
+    "course_id": ((), lambda course: course.course_id),
+    "name": (("name",), lambda course: course.name),
+    "provider": (
+        ("provider__name",),
+        lambda course: {
+            "provider_id": course.provider_id,
+            "name": course.provider.name,
+        },
+    ),
+    "keywords": (("keywords",), lambda course: course.keywords),
+    "course_desc": (("course_desc",), lambda course: course.course_desc),
+    "cost": (("cost",), lambda course: course.cost),
+    "location": (("location",), lambda course: course.location),
+    "latitude": (("latitude",), lambda course: course.latitude),
+    "longitude": (("longitude",), lambda course: course.longitude),
+    "classroom_hours": (("classroom_hours",), lambda course: course.classroom_hours),
+    "lab_hours": (("lab_hours",), lambda course: course.lab_hours),
+    "internship_hours": (
+        ("internship_hours",),
+        lambda course: course.internship_hours,
+    ),
+    "practical_hours": (("practical_hours",), lambda course: course.practical_hours),
+    "total_hours": ((), lambda course: course.total_hours),
+    "avg_rating": ((), lambda course: course.avg_rating),
+    "reviews_count": ((), lambda course: course.reviews_count),
+    "url": (
+        (),
+        lambda course: reverse("course_detail", args=[course.course_id]),
+    ),
+}
+DEFAULT_FIELDS = (
+    "course_id",
+    "name",
+    "provider",
+    "cost",
+    "location",
+    "total_hours",
+    "avg_rating",
+    "reviews_count",
+    "url",
+)
+
+
+def parse_fields(value):
+    """
+    The requested field names, in the order given; raises ``ValueError``
+    naming any unknown ones.
+    """
+    names = (name.strip() for name in (value or "").split(","))
+    fields = list(dict.fromkeys(name for name in names if name))
+    if not fields:
+        return list(DEFAULT_FIELDS)
+    unknown = [name for name in fields if name not in API_FIELDS]
+    if unknown:
+        raise ValueError(", ".join(unknown))
+    return fields
+
+
+def select_fields(courses, fields):
+    """Load only the columns ``fields`` need."""
+    columns = {"course_id"}
+    for name in fields:
+        columns.update(API_FIELDS[name][0])
+    if "provider" in fields:
+        courses = courses.select_related("provider")
+        columns.add("provider_id")
+    return courses.only(*columns)
+
+
+def serialize_course(course, fields):
+    return {name: API_FIELDS[name][1](course) for name in fields}
+
+
+def catalog_etag(request):
+    query = "&".join(sorted(request.GET.urlencode().split("&")))
+    return hashlib.sha256(f"{results_version()}?{query}".encode()).hexdigest()
+
+
+def catalog_last_modified(request):
+    return results_modified()
@@ -0,0 +1,98 @@
+"""
+Cached course card fragments.
+
+A rendered card only changes when its course, provider or reviews do, so
+each card's HTML is cached under a per-course version stamp. Signals on
+``Course``, ``Provider``, ``Review`` and ``ReviewVote`` bump the stamp,
+which makes the next listing render that card afresh; every other card on
+the page comes out of the cache in a single ``get_many``.
+
+Bumping a stamp just deletes it: the next reader stores a new random one.
+The delete waits for the surrounding transaction to commit; otherwise a
+request could re-render the card from the old rows under the new stamp.
+Bulk writes that skip signals (the catalog sync, the rating stats rebuild)
+either bump the affected courses explicitly or bump the generation shared by
+every card.
+"""
+
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+CARD_TEMPLATE = "courses/course_card.html"
+CARD_TIMEOUT = 60 * 60 * 24
+GENERATION_KEY = "course_card_generation"
+
+
+def _version_key(course_id):
+    return f"course_card_version:{course_id}"
+
+
+def _new_stamp():
+    return uuid.uuid4().hex
+
+
+def card_versions(course_ids):
+    """Current version stamp of each course's card, creating missing ones."""
+    keys = {_version_key(course_id): course_id for course_id in course_ids}
+    stamps = cache.get_many(keys)
+    missing = {key: _new_stamp() for key in keys if key not in stamps}
+    if missing:
+        cache.set_many(missing, None)
+        stamps.update(missing)
+    return {keys[key]: stamp for key, stamp in stamps.items()}
+
+
+def bump_card_versions(course_ids):
+    keys = [_version_key(course_id) for course_id in course_ids]
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def bump_all_card_versions():
+    transaction.on_commit(lambda: cache.set(GENERATION_KEY, _new_stamp(), None))
+
+
+def viewer_variant(user):
+    """Cards differ only by the kind of visitor (the bookmark button)."""
+    if getattr(user, "role", None) == "training_provider":
+        return "provider"
+    if user is not None and user.is_authenticated:
+        return "member"
+    return "anonymous"
+
+
+def render_cards(courses, request):
+    """
+    Set ``card_html`` on each course, from the cache where possible.
+
+    ``courses`` should come from ``Course.objects.for_cards()``.
+    """
+    courses = list(courses)
+    if not courses:
+        return courses
+
+    generation = cache.get_or_set(GENERATION_KEY, _new_stamp, None)
+    versions = card_versions([course.pk for course in courses])
+    user = getattr(request, "user", None)
+    variant = viewer_variant(user)
+    keys = {
+        course.pk: f"course_card:{generation}:{course.pk}:{versions[course.pk]}:{variant}"
+        for course in courses
+    }
+
+    cached = cache.get_many(keys.values())
+    rendered = {}
+    for course in courses:
+        key = keys[course.pk]
+        html = cached.get(key)
+        if html is None:
+            html = render_to_string(CARD_TEMPLATE, {"course": course, "user": user})
+            rendered[key] = html
+        course.card_html = mark_safe(html)
+
+    if rendered:
+        cache.set_many(rendered, CARD_TIMEOUT)
+    return courses
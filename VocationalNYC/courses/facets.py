@@ -0,0 +1,174 @@
+"""
+Bucketed counts for the course filter sidebar.
+
+For the current filters, ``facet_counts`` reports how many courses fall in
+each cost range, total-hours range, rating band, borough / ZIP code and
+provider, so the sidebar can show what a filter would leave before it is
+applied. Every bucket comes out of a single ``GROUP BY`` over the five
+bucket columns; the per-facet totals are summed up in Python.
+
+ZIP codes are parsed out of ``Course.location`` when a course is saved
+(``Course.postcode``) and mapped to boroughs by prefix, since neither can be
+extracted portably in SQL. Results are cached like filter results and
+retired by the same catalog version stamp.
+"""
+
+import re
+from collections import Counter
+
+from django.db.models import Case, Count, F, IntegerField, Value, When
+from django.db.models.functions import Cast, Floor
+
+from vocationalnyc.cache import get_or_compute
+from .models import Course
+from .results import RESULTS_TIMEOUT, matching_courses, results_key
+
+POSTCODE_RE = re.compile(r"\b(\d{5})(?:-\d{4})?\b")
+
+# (label, min, max) - the bounds are the filter parameters selecting it
+COST_BUCKETS = [
+    ("Free", 0, 0),
+    ("$1 - $500", 1, 500),
+    ("$501 - $1,000", 501, 1000),
+    ("$1,001 - $5,000", 1001, 5000),
+    ("Over $5,000", 5001, None),
+]
+HOURS_BUCKETS = [
+    ("Under 40 hours", 0, 39),
+    ("40 - 99 hours", 40, 99),
+    ("100 - 249 hours", 100, 249),
+    ("250 - 499 hours", 250, 499),
+    ("500+ hours", 500, None),
+]
+RATING_BANDS = [4, 3, 2, 1]
+
+# First three digits of NYC ZIP codes. 110xx is left out: it is mostly
+# Nassau County, and the few Queens ZIPs in it straddle the city line.
+BOROUGH_PREFIXES = {
+    "100": "Manhattan",
+    "101": "Manhattan",
+    "102": "Manhattan",
+    "103": "Staten Island",
+    "104": "Bronx",
+    "111": "Queens",
+    "112": "Brooklyn",
+    "113": "Queens",
+    "114": "Queens",
+    "116": "Queens",
+}
+OTHER_AREA = "Outside NYC"
+
+MAX_PROVIDERS = 20
+
+
+def parse_postcode(location):
+    """The last ZIP code in ``location``, or ``""``."""
+    matches = POSTCODE_RE.findall(location or "")
+    return matches[-1] if matches else ""
+
+
+def borough(postcode):
+    if not postcode:
+        return None
+    return BOROUGH_PREFIXES.get(postcode[:3], OTHER_AREA)
+
+
+def _bucket(field, buckets):
+    """Index of the bucket ``field`` falls in, as an SQL expression."""
+    return Case(
+        *[
+            When(**{f"{field}__lte": upper}, then=Value(index))
+            for index, (_, _, upper) in enumerate(buckets)
+            if upper is not None
+        ],
+        default=Value(len(buckets) - 1),
+        output_field=IntegerField(),
+    )
+
+
+def _ranges(counts, buckets, lower_param, upper_param):
+    return [
+        {
+            "label": label,
+            lower_param: lower,
+            upper_param: upper,
+            "count": counts[index],
+        }
+        for index, (label, lower, upper) in enumerate(buckets)
+    ]
+
+
+def compute_facets(courses):
+    """Facet counts for ``courses``, which must have card fields."""
+    cells = (
+        courses.annotate(
+            cost_bucket=_bucket("cost", COST_BUCKETS),
+            hours_bucket=_bucket("total_hours", HOURS_BUCKETS),
+            rating_floor=Cast(Floor(F("avg_rating")), IntegerField()),
+        )
+        .values(
+            "cost_bucket",
+            "hours_bucket",
+            "rating_floor",
+            "postcode",
+            "provider_id",
+            "provider__name",
+        )
+        .annotate(count=Count("course_id"))
+        .order_by()
+    )
+
+    total = 0
+    costs, hours, ratings = Counter(), Counter(), Counter()
+    boroughs, postcodes, providers = Counter(), Counter(), Counter()
+    for cell in cells:
+        count = cell["count"]
+        total += count
+        costs[cell["cost_bucket"]] += count
+        hours[cell["hours_bucket"]] += count
+        ratings[cell["rating_floor"]] += count
+        if cell["postcode"]:
+            boroughs[borough(cell["postcode"])] += count
+            postcodes[cell["postcode"]] += count
+        providers[(cell["provider_id"], cell["provider__name"])] += count
+
+    return {
+        "count": total,
+        "cost": _ranges(costs, COST_BUCKETS, "min_cost", "max_cost"),
+        "hours": _ranges(hours, HOURS_BUCKETS, "min_hours", "max_hours"),
+        # Bands are cumulative, like the min_rating filter
+        "rating": [
+            {
+                "label": f"{band} & up",
+                "min_rating": band,
+                "count": sum(
+                    count
+                    for floor, count in ratings.items()
+                    if floor is not None and floor >= band
+                ),
+            }
+            for band in RATING_BANDS
+        ],
+        "borough": [
+            {"label": name, "count": count} for name, count in boroughs.most_common()
+        ],
+        "postcode": [
+            {"postcode": postcode, "borough": borough(postcode), "count": count}
+            for postcode, count in sorted(postcodes.items())
+        ],
+        "provider": [
+            {"provider_id": provider_id, "name": name, "count": count}
+            for (provider_id, name), count in providers.most_common(MAX_PROVIDERS)
+        ],
+    }
+
+
+def facet_counts(filters):
+    """Facet counts for the courses matching normalized ``filters``."""
+    return get_or_compute(
+        results_key(filters, "course_facets"),
+        lambda: compute_facets(
+            matching_courses(Course.objects.with_card_fields(), filters)[0]
+        ),
+        RESULTS_TIMEOUT,
+    )
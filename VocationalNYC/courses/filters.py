@@ -0,0 +1,103 @@
+"""
+The course filters, declared once.
+
+Every view that filters the catalog (the listing, search and sort views, the
+map and the JSON endpoints) reads the same query parameters through
+``FILTERS``: each entry names the parameter, how to parse it and the
+condition it adds. ``normalize_filters`` turns a query string into canonical
+values (also the cache key of a result set, see ``courses.results``) and
+``apply_filters`` compiles them into a single ``filter()`` call.
+
+Conditions are written against table columns rather than view annotations,
+so they work on any ``Course`` queryset and the database can use the indexes
+on those columns.
+"""
+
+import re
+
+from django.db.models import Q
+from django.db.models.lookups import GreaterThanOrEqual, LessThanOrEqual
+
+from .pagination import TOTAL_HOURS
+from .search import match_courses
+
+
+def parse_text(value):
+    return re.sub(r"\s+", " ", value or "").strip().lower()
+
+
+def parse_number(value):
+    value = (value or "").strip()
+    return int(value) if value.isdigit() else None
+
+
+def parse_rating(value):
+    value = (value or "").strip()
+    return float(value) if value.replace(".", "", 1).isdigit() else None
+
+
+class CourseFilter:
+    """
+    One query parameter: ``parse`` turns its raw value into a canonical one
+    (``None`` or ``""`` if unset or invalid), and ``lookup`` is either a field
+    lookup or a function building the condition from that value.
+    """
+
+    def __init__(self, param, parse, lookup):
+        self.param = param
+        self.parse = parse
+        self.lookup = lookup
+
+    def condition(self, value):
+        if callable(self.lookup):
+            return self.lookup(value)
+        return Q(**{self.lookup: value})
+
+
+FILTERS = (
+    CourseFilter("course_id", parse_number, "course_id"),
+    CourseFilter("provider", parse_text, "provider__name__icontains"),
+    CourseFilter("min_cost", parse_number, "cost__gte"),
+    CourseFilter("max_cost", parse_number, "cost__lte"),
+    CourseFilter("location", parse_text, "location__icontains"),
+    CourseFilter(
+        "min_hours", parse_number, lambda hours: GreaterThanOrEqual(TOTAL_HOURS, hours)
+    ),
+    CourseFilter(
+        "max_hours", parse_number, lambda hours: LessThanOrEqual(TOTAL_HOURS, hours)
+    ),
+    CourseFilter("min_rating", parse_rating, "rating_stats__avg_rating__gte"),
+)
+
+# Matched by full-text search (courses.search) rather than a lookup
+KEYWORDS = "keywords"
+
+
+def normalize_filters(params):
+    """
+    The filters in ``params`` that are set and valid, in canonical form, so
+    ``?provider=ABC&min_cost=`` and ``?provider=abc%20`` are the same query.
+    """
+    filters = {KEYWORDS: parse_text(params.get(KEYWORDS))}
+    for course_filter in FILTERS:
+        filters[course_filter.param] = course_filter.parse(
+            params.get(course_filter.param)
+        )
+    return {name: value for name, value in filters.items() if value not in ("", None)}
+
+
+def apply_filters(courses, filters):
+    """
+    Narrow ``courses`` by normalized ``filters``. Returns ``(courses,
+    fuzzy)``; ``fuzzy`` is set when the keywords only matched by similarity.
+    """
+    conditions = [
+        course_filter.condition(filters[course_filter.param])
+        for course_filter in FILTERS
+        if course_filter.param in filters
+    ]
+    if conditions:
+        courses = courses.filter(*conditions)
+    if KEYWORDS in filters:
+        return match_courses(courses, filters[KEYWORDS])
+    return courses, False
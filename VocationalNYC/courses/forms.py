@@ -2,6 +2,10 @@ from django import forms
 from .models import Course
 
 
+def duplicate_course_message(name):
+    return f"You already have a course named '{name}'."
+
+
 class CourseForm(forms.ModelForm):
     location = forms.CharField(required=False)
 
@@ -19,15 +23,30 @@ class CourseForm(forms.ModelForm):
             "practical_hours",
         ]
 
-        def __init__(self, *args, **kwargs):
-            self.provider = kwargs.pop("provider", None)
-            super().__init__(*args, **kwargs)
-
-        def clean_location(self):
-            location = self.cleaned_data.get("location", "")
-            if not location or location.strip() == "":
-                if self.provider and hasattr(self.provider, "address"):
-                    return self.provider.address
-                else:
-                    return location
-            return location
+    def __init__(self, *args, **kwargs):
+        self.provider = kwargs.pop("provider", None)
+        super().__init__(*args, **kwargs)
+
+    def clean_name(self):
+        # The provider isn't a form field, so ModelForm skips the
+        # unique_course_per_provider constraint; check it here instead
+        name = self.cleaned_data.get("name")
+        if (
+            self.provider is not None
+            and Course.objects.filter(provider=self.provider, name=name)
+            .exclude(pk=self.instance.pk)
+            .exists()
+        ):
+            raise forms.ValidationError(
+                duplicate_course_message(name), code="duplicate"
+            )
+        return name
+
+    def clean_location(self):
+        location = self.cleaned_data.get("location", "")
+        if not location or location.strip() == "":
+            if self.provider and hasattr(self.provider, "address"):
+                return self.provider.address
+            else:
+                return location
+        return location
@@ -0,0 +1,161 @@
+"""
+Spatial lookups for the course map.
+
+Every placed course stores a geohash of its coordinates in ``Course.geohash``.
+Nearby points share a geohash prefix, so grouping on a prefix clusters
+markers in a single indexed ``GROUP BY``; the prefix length follows the map
+zoom. Viewport and radius queries filter on the indexed latitude/longitude
+columns first and only then compute exact distances.
+
+This works on plain PostgreSQL and SQLite; no PostGIS is required.
+"""
+
+import math
+
+from django.db.models import Avg, Count, ExpressionWrapper, F, FloatField, Max, Min
+from django.db.models.functions import ASin, Cos, Power, Radians, Sin, Sqrt, Substr
+
+GEOHASH_PRECISION = 9
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+EARTH_RADIUS_MILES = 3958.8
+MILES_PER_DEGREE_LAT = 69.0
+
+# Zoom levels the map can ask for
+MIN_ZOOM, MAX_ZOOM = 0, 22
+# At and above this zoom individual markers are returned
+MARKER_ZOOM = 13
+# Never send more than this many individual markers
+MAX_MARKERS = 500
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    if latitude is None or longitude is None:
+        return None
+
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars = []
+    bits, bit_count, even = 0, 0, True
+    while len(chars) < precision:
+        value, interval = (longitude, lng_range) if even else (latitude, lat_range)
+        mid = (interval[0] + interval[1]) / 2
+        bits <<= 1
+        if value >= mid:
+            bits |= 1
+            interval[0] = mid
+        else:
+            interval[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(GEOHASH_ALPHABET[bits])
+            bits, bit_count = 0, 0
+    return "".join(chars)
+
+
+def location_fields(coordinates):
+    """Model field values for a ``(lat, lng)`` pair (or ``None``)."""
+    latitude, longitude = coordinates or (None, None)
+    return {
+        "latitude": latitude,
+        "longitude": longitude,
+        "geohash": encode_geohash(latitude, longitude),
+    }
+
+
+def cluster_precision(zoom):
+    """Geohash prefix length to cluster on at ``zoom``; ``None`` for markers."""
+    if zoom >= MARKER_ZOOM:
+        return None
+    # Each geohash character is roughly two zoom levels of detail, which
+    # leaves a dozen or so clusters across a typical screen
+    return max(1, min(GEOHASH_PRECISION, zoom // 2))
+
+
+def parse_zoom(value, default=MARKER_ZOOM):
+    """Map zoom as an int within the supported range; fractional zooms
+    (from pinch or scroll-wheel zooming) round down."""
+    try:
+        zoom = int(float(value))
+    except (TypeError, ValueError, OverflowError):
+        return default
+    return max(MIN_ZOOM, min(MAX_ZOOM, zoom))
+
+
+def parse_bbox(value):
+    """``"south,west,north,east"`` -> tuple of floats, or ``None``."""
+    try:
+        south, west, north, east = (float(part) for part in value.split(","))
+    except (AttributeError, ValueError):
+        return None
+    if south > north:
+        return None
+    return south, west, north, east
+
+
+def in_bbox(courses, bbox):
+    south, west, north, east = bbox
+    courses = courses.filter(latitude__range=(south, north))
+    if west <= east:
+        return courses.filter(longitude__range=(west, east))
+    # The viewport crosses the antimeridian
+    return courses.filter(longitude__gte=west) | courses.filter(longitude__lte=east)
+
+
+def distance_miles(latitude, longitude):
+    """Haversine distance from a point to each course, as an expression."""
+    dlat = Radians(F("latitude") - latitude) / 2
+    dlng = Radians(F("longitude") - longitude) / 2
+    a = Power(Sin(dlat), 2) + math.cos(math.radians(latitude)) * Cos(
+        Radians(F("latitude"))
+    ) * Power(Sin(dlng), 2)
+    return 2 * EARTH_RADIUS_MILES * ASin(Sqrt(a))
+
+
+def within_radius(courses, latitude, longitude, miles):
+    """Courses within ``miles`` of a point, annotated with ``distance``."""
+    lat_delta = miles / MILES_PER_DEGREE_LAT
+    lng_delta = miles / (
+        MILES_PER_DEGREE_LAT * max(math.cos(math.radians(latitude)), 0.01)
+    )
+    # The bounding box narrows the search through the index first
+    courses = courses.filter(
+        latitude__range=(latitude - lat_delta, latitude + lat_delta),
+        longitude__range=(longitude - lng_delta, longitude + lng_delta),
+    )
+    distance = ExpressionWrapper(
+        distance_miles(latitude, longitude), output_field=FloatField()
+    )
+    return courses.annotate(distance=distance).filter(distance__lte=miles)
+
+
+def clusters(courses, precision):
+    """One row per geohash cell: its centre of mass and course count."""
+    cells = (
+        courses.annotate(cell=Substr("geohash", 1, precision))
+        .values("cell")
+        .annotate(count=Count("course_id"), lat=Avg("latitude"), lng=Avg("longitude"))
+        .order_by("-count")
+    )
+    return [
+        {
+            "geohash": cell["cell"],
+            "count": cell["count"],
+            "latitude": cell["lat"],
+            "longitude": cell["lng"],
+        }
+        for cell in cells
+    ]
+
+
+def bounds(courses):
+    """``[south, west, north, east]`` around ``courses``, or ``None``."""
+    extent = courses.aggregate(
+        south=Min("latitude"),
+        west=Min("longitude"),
+        north=Max("latitude"),
+        east=Max("longitude"),
+    )
+    if extent["south"] is None:
+        return None
+    return [extent["south"], extent["west"], extent["north"], extent["east"]]
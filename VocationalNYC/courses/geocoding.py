@@ -0,0 +1,204 @@
+"""
+Batch geocoding of course locations and provider addresses.
+
+Coordinates are stored on ``Course`` and ``Provider`` so the map never calls
+a geocoding API during a request. ``geocode_pending`` (run by the
+``geocode_locations`` management command after each catalog sync) looks up
+every distinct address still missing coordinates, a few at a time, and
+writes the results back.
+
+The geocoder is pluggable: ``settings.GEOCODER`` is the dotted path of a
+``Geocoder`` subclass. ``GoogleGeocoder`` reads its key from
+``settings.GOOGLE_MAPS_API_KEY``; ``StubGeocoder`` answers from a dict and is
+what the tests use.
+"""
+
+import hashlib
+import logging
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+from users.models import Provider
+from vocationalnyc.cache import get_or_compute
+from .geo import location_fields
+from .models import Course
+from .results import bump_results_version
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_GEOCODE_URL = "https://maps.googleapis.com/maps/api/geocode/json"
+
+MAX_WORKERS = 4
+RETRIES = 3
+RETRY_BACKOFF = 1.0
+
+CACHE_TIMEOUT = 60 * 60 * 24 * 7  # 7 days
+# Addresses the geocoder couldn't place are remembered for a shorter time
+MISS_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+class GeocodingError(Exception):
+    """A transient failure worth retrying (network error, rate limit)."""
+
+
+class Geocoder(ABC):
+    @abstractmethod
+    def geocode(self, address):
+        """
+        Return ``(latitude, longitude)`` for ``address``, or ``None`` if it
+        can't be placed. Raise ``GeocodingError`` on transient failures.
+        """
+        raise NotImplementedError
+
+
+class GoogleGeocoder(Geocoder):
+    def __init__(self, api_key=None, timeout=10):
+        self.api_key = api_key or settings.GOOGLE_MAPS_API_KEY
+        if not self.api_key:
+            raise ImproperlyConfigured(
+                "GoogleGeocoder needs the GOOGLE_MAPS_API_KEY setting"
+            )
+        self.timeout = timeout
+
+    def geocode(self, address):
+        try:
+            response = requests.get(
+                GOOGLE_GEOCODE_URL,
+                params={"address": address, "key": self.api_key},
+                timeout=self.timeout,
+            )
+            response.raise_for_status()
+            data = response.json()
+        except (requests.RequestException, ValueError) as e:
+            raise GeocodingError(str(e)) from e
+
+        status = data.get("status")
+        if status == "OK":
+            location = data["results"][0]["geometry"]["location"]
+            return location["lat"], location["lng"]
+        if status in ("OVER_QUERY_LIMIT", "UNKNOWN_ERROR"):
+            raise GeocodingError(status)
+        return None
+
+
+class StubGeocoder(Geocoder):
+    """Answers from a fixed ``{address: (lat, lng)}`` mapping."""
+
+    def __init__(self, locations=None):
+        self.locations = locations or {}
+        self.calls = []
+
+    def geocode(self, address):
+        self.calls.append(address)
+        return self.locations.get(address)
+
+
+def get_geocoder():
+    return import_string(settings.GEOCODER)()
+
+
+def _cache_key(address):
+    return "coords:" + hashlib.sha256(address.encode()).hexdigest()
+
+
+def cached_coordinates(address):
+    """Coordinates already known for ``address``: ``(lat, lng)``, ``None``
+    for a remembered miss, or ``False`` if it hasn't been looked up."""
+    return cache.get(_cache_key(address), False)
+
+
+def geocode_with_retry(geocoder, address, retries=RETRIES, backoff=RETRY_BACKOFF):
+    for attempt in range(retries):
+        try:
+            return geocoder.geocode(address)
+        except GeocodingError as e:
+            if attempt == retries - 1:
+                logger.error("Geocoding failed for %r: %s", address, e)
+                raise
+            time.sleep(backoff * 2**attempt)
+
+
+def geocode_address(geocoder, address):
+    try:
+        return get_or_compute(
+            _cache_key(address),
+            lambda: geocode_with_retry(geocoder, address),
+            timeout=lambda coords: CACHE_TIMEOUT if coords else MISS_CACHE_TIMEOUT,
+        )
+    except GeocodingError:
+        # Left uncached so the next run tries again
+        return None
+
+
+def geocode_addresses(addresses, geocoder=None, max_workers=MAX_WORKERS):
+    """Geocode ``addresses`` concurrently; returns ``{address: coords}``."""
+    geocoder = geocoder or get_geocoder()
+    addresses = list(addresses)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(
+            lambda address: geocode_address(geocoder, address), addresses
+        )
+        return dict(zip(addresses, results))
+
+
+def known_coordinates(address):
+    """Stored or cached coordinates for ``address``, without calling out."""
+    if not address:
+        return None
+    for model, field in ((Course, "location"), (Provider, "address")):
+        coords = (
+            model.objects.filter(**{field: address}, latitude__isnull=False)
+            .values_list("latitude", "longitude")
+            .first()
+        )
+        if coords:
+            return coords
+    return cached_coordinates(address) or None
+
+
+def geocode_pending(geocoder=None, max_workers=MAX_WORKERS, limit=None):
+    """
+    Fill in coordinates for every course and provider that lacks them.
+
+    Each distinct address is looked up once. Returns the number of addresses
+    that were placed.
+    """
+    pending = Course.objects.filter(latitude__isnull=True).exclude(location="")
+    addresses = set(pending.values_list("location", flat=True).distinct())
+    addresses.update(
+        Provider.objects.filter(latitude__isnull=True)
+        .exclude(address="")
+        .values_list("address", flat=True)
+        .distinct()
+    )
+    addresses = sorted(addresses)
+    if limit is not None:
+        addresses = addresses[:limit]
+
+    results = geocode_addresses(addresses, geocoder, max_workers)
+
+    placed = 0
+    for address, coords in results.items():
+        if not coords:
+            continue
+        latitude, longitude = coords
+        Course.objects.filter(location=address, latitude__isnull=True).update(
+            **location_fields(coords)
+        )
+        Provider.objects.filter(address=address, latitude__isnull=True).update(
+            latitude=latitude, longitude=longitude
+        )
+        placed += 1
+
+    if placed:
+        # The updates skip signals; the map and the API serve coordinates
+        bump_results_version()
+    logger.info(f"Geocoded {placed} of {len(results)} addresses")
+    return placed
@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count, Min
+
+from courses.models import Course
+
+NAME_LENGTH = Course._meta.get_field("name").max_length
+
+
+def deduplicated_name(name, course_id):
+    suffix = f" (#{course_id})"
+    return name[: NAME_LENGTH - len(suffix)] + suffix
+
+
+class Command(BaseCommand):
+    help = (
+        "Rename courses that share a name with another course of the same "
+        "provider, so the unique_course_per_provider constraint can be added. "
+        "Run before migrate."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Print the renames without writing them",
+        )
+
+    def handle(self, *args, **options):
+        if Course._meta.db_table not in connection.introspection.table_names():
+            self.stdout.write("No courses table yet; nothing to do")
+            return
+
+        # Only touch columns the table had before this constraint, since the
+        # command runs against the pre-migration schema
+        groups = (
+            Course.objects.values("provider_id", "name")
+            .annotate(copies=Count("course_id"), keep=Min("course_id"))
+            .filter(copies__gt=1)
+            .order_by()
+        )
+        renamed = 0
+        with transaction.atomic():
+            for group in groups:
+                duplicates = (
+                    Course.objects.filter(
+                        provider_id=group["provider_id"], name=group["name"]
+                    )
+                    .exclude(course_id=group["keep"])
+                    .values_list("course_id", flat=True)
+                )
+                for course_id in duplicates:
+                    new_name = deduplicated_name(group["name"], course_id)
+                    self.stdout.write(f"{course_id}: {group['name']!r} -> {new_name!r}")
+                    if not options["dry_run"]:
+                        Course.objects.filter(course_id=course_id).update(name=new_name)
+                    renamed += 1
+
+        verb = "Would rename" if options["dry_run"] else "Renamed"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {renamed} duplicate courses"))
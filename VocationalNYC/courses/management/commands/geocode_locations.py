@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from courses.geocoding import MAX_WORKERS, geocode_pending
+
+
+class Command(BaseCommand):
+    help = "Store coordinates for courses and providers that don't have them yet"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=MAX_WORKERS,
+            help="Number of addresses to look up concurrently",
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=None,
+            help="Only geocode this many addresses",
+        )
+
+    def handle(self, *args, **options):
+        placed = geocode_pending(max_workers=options["workers"], limit=options["limit"])
+        self.stdout.write(self.style.SUCCESS(f"Geocoded {placed} addresses"))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from courses.facets import parse_postcode
+from courses.models import Course
+from courses.results import bump_results_version
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = "Re-parse the ZIP code of every course used by the filter facets"
+
+    def handle(self, *args, **options):
+        changed = []
+        for course in Course.objects.only("course_id", "location", "postcode").iterator(
+            chunk_size=BATCH_SIZE
+        ):
+            postcode = parse_postcode(course.location)
+            if course.postcode != postcode:
+                course.postcode = postcode
+                changed.append(course)
+        Course.objects.bulk_update(changed, ["postcode"], batch_size=BATCH_SIZE)
+        bump_results_version()
+        self.stdout.write(
+            self.style.SUCCESS(f"Updated the ZIP code of {len(changed)} courses")
+        )
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from courses.models import Course
+from courses.search import is_postgres, update_search_vector
+
+
+class Command(BaseCommand):
+    help = "Recompute the full-text search vector of every course"
+
+    def handle(self, *args, **options):
+        if not is_postgres():
+            self.stdout.write("Full-text search index is only kept on PostgreSQL")
+            return
+        updated = update_search_vector(Course.objects.all())
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt search vectors for {updated} courses")
+        )
@@ -0,0 +1,42 @@
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.sync import BATCH_SIZE, SYNC_LOCK_KEY, SYNC_LOCK_TIMEOUT, sync_courses
+from vocationalnyc.cache import LockNotAcquired, cache_lock
+
+
+class Command(BaseCommand):
+    help = "Import training providers and courses from NYC Open Data"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=BATCH_SIZE,
+            help="Number of rows upserted per bulk statement",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report inserts, updates and deletes without writing anything",
+        )
+        parser.add_argument(
+            "--prune",
+            action="store_true",
+            help="Delete imported courses that are no longer in the dataset",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with cache_lock(SYNC_LOCK_KEY, SYNC_LOCK_TIMEOUT):
+                report = sync_courses(
+                    batch_size=options["batch_size"],
+                    dry_run=options["dry_run"],
+                    prune=options["prune"],
+                )
+        except LockNotAcquired:
+            raise CommandError("Another course sync is already running")
+        except requests.RequestException as e:
+            raise CommandError(f"External API call failed: {e}")
+
+        self.stdout.write(self.style.SUCCESS(str(report)))
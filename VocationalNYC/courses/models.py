@@ -1,4 +1,8 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models import Case, F, FloatField, IntegerField, Value, When
+from django.db.models.functions import Cast, Coalesce, Floor, Round, Substr
 from users.models import Provider
 
 
@@ -12,6 +16,63 @@ class Tag(models.Model):
         ordering = ["name"]
 
 
+# Columns a course card (courses/courses_section.html) reads
+CARD_FIELDS = (
+    "course_id",
+    "name",
+    "provider_id",
+    "keywords",
+    "cost",
+    "provider__name",
+    "provider__verification_status",
+    "provider__address",
+)
+# Cards clamp the description to a few lines; load no more than this of it
+CARD_SUMMARY_LENGTH = 500
+
+
+class CourseQuerySet(models.QuerySet):
+    def for_cards(self):
+        """
+        Everything needed to render course cards, in one query: the card
+        fields, the provider joined in, and only the start of the description.
+        """
+        return (
+            self.with_card_fields()
+            .select_related("provider")
+            .only(*CARD_FIELDS)
+            .annotate(course_summary=Substr("course_desc", 1, CARD_SUMMARY_LENGTH))
+        )
+
+    def with_card_fields(self):
+        """
+        Annotate everything a course card shows beyond the model's columns.
+
+        Ratings come from the denormalized ``CourseRatingStats`` row (a
+        one-to-one join), and the star split and total hours are computed in
+        SQL, so listing views can render rows straight from the queryset.
+        """
+        avg = Coalesce(F("rating_stats__avg_rating"), Value(0.0))
+        full_stars = Cast(Floor(avg), IntegerField())
+        partial = Cast((avg - Floor(avg)) * 100, IntegerField())
+        return self.annotate(
+            avg_rating=F("rating_stats__avg_rating"),
+            reviews_count=Coalesce(F("rating_stats__review_count"), 0),
+            rating=Round(avg, 1, output_field=FloatField()),
+            rating_full_stars=full_stars,
+            rating_partial_percentage=partial,
+            rating_partial_star_position=Case(
+                When(rating_partial_percentage__gt=0, then=full_stars + 1),
+                default=Value(0),
+                output_field=IntegerField(),
+            ),
+            total_hours=F("classroom_hours")
+            + F("lab_hours")
+            + F("internship_hours")
+            + F("practical_hours"),
+        )
+
+
 class Course(models.Model):
     course_id = models.AutoField(primary_key=True)
     name = models.CharField(max_length=255)
@@ -27,6 +88,33 @@ class Course(models.Model):
     internship_hours = models.IntegerField(default=0)
     practical_hours = models.IntegerField(default=0)
     tags = models.ManyToManyField(Tag, related_name="courses", blank=True)
+    # Hash of the NYC Open Data row this course was imported from, if any
+    source_hash = models.CharField(max_length=64, null=True, blank=True, editable=False)
+    # Full-text search document, maintained by courses.search (PostgreSQL only)
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Filled in by courses.geocoding; the map only reads these
+    latitude = models.FloatField(null=True, blank=True, editable=False)
+    longitude = models.FloatField(null=True, blank=True, editable=False)
+    # Geohash of the coordinates, used to cluster map markers (courses.geo)
+    geohash = models.CharField(
+        max_length=12, null=True, blank=True, editable=False, db_index=True
+    )
+    # ZIP code parsed from the location, for the filter facets (courses.facets)
+    postcode = models.CharField(max_length=10, blank=True, default="", editable=False)
+
+    objects = CourseQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            # Lets the catalog sync upsert on (provider, name)
+            models.UniqueConstraint(
+                fields=["provider", "name"], name="unique_course_per_provider"
+            ),
+        ]
+        indexes = [
+            GinIndex(fields=["search_vector"], name="course_search_vector_idx"),
+            models.Index(fields=["latitude", "longitude"], name="course_lat_lng_idx"),
+        ]
 
     def get_tags_list(self):
         return self.tags.all()
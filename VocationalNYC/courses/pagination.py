@@ -0,0 +1,179 @@
+"""
+Keyset (cursor) pagination for course listings.
+
+Pages are addressed by the sort value and ``course_id`` of the last course on
+the previous page rather than by an OFFSET, so deep pages cost the same as
+the first one. The cursor is opaque to clients and carries the sort it was
+issued for; a cursor that doesn't match the requested sort is ignored.
+"""
+
+import base64
+import binascii
+import json
+import math
+
+from django.db.models import ExpressionWrapper, F, IntegerField, Q
+from django.db.models.functions import Coalesce
+
+TOTAL_HOURS = ExpressionWrapper(
+    F("classroom_hours")
+    + F("lab_hours")
+    + F("internship_hours")
+    + F("practical_hours"),
+    output_field=IntegerField(),
+)
+
+# Sortable fields, mapped to the expression the keyset is built on
+SORT_FIELDS = {
+    "course_id": F("course_id"),
+    "name": F("name"),
+    "cost": F("cost"),
+    "avg_rating": Coalesce(F("rating_stats__avg_rating"), 0.0),
+    "total_hours": TOTAL_HOURS,
+    "classroom_hours": F("classroom_hours"),
+    "lab_hours": F("lab_hours"),
+    "internship_hours": F("internship_hours"),
+    "practical_hours": F("practical_hours"),
+}
+
+# Only offered for keyword searches, which annotate each course's search_rank
+RELEVANCE = "relevance"
+
+# Sorts whose keyset value is text; every other one (relevance included) is
+# a number
+TEXT_SORTS = {"name"}
+
+PER_PAGE_CHOICES = (10, 20, 25, 50, 100, 150, 200)
+DEFAULT_PER_PAGE = 10
+
+
+class CoursePage:
+    """One page of courses plus what the client needs to fetch the next."""
+
+    per_page_choices = PER_PAGE_CHOICES
+
+    def __init__(self, courses, sort, order, per_page, count, next_cursor):
+        self.courses = courses
+        self.sort = sort
+        self.order = order
+        self.per_page = per_page
+        self.count = count
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def num_pages(self):
+        return max(1, -(-self.count // self.per_page))
+
+    def as_dict(self):
+        return {
+            "sort": self.sort,
+            "order": self.order,
+            "per_page": self.per_page,
+            "count": self.count,
+            "num_pages": self.num_pages,
+            "next_cursor": self.next_cursor,
+            "has_next": self.has_next,
+        }
+
+
+def encode_cursor(sort, order, value, course_id):
+    payload = json.dumps([sort, order, value, course_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(payload).decode("ascii")
+
+
+def decode_cursor(cursor, sort, order):
+    """Return ``(value, course_id)`` or ``None`` if the cursor is unusable."""
+    if not cursor:
+        return None
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        cursor_sort, cursor_order, value, course_id = payload
+    except (ValueError, TypeError, binascii.Error, UnicodeEncodeError):
+        return None
+    if (cursor_sort, cursor_order) != (sort, order) or not isinstance(course_id, int):
+        return None
+    return value, course_id
+
+
+def _valid_value(sort, value):
+    """Whether a cursor's ``value`` has the type ``sort``'s keyset holds."""
+    if sort in TEXT_SORTS:
+        return isinstance(value, str)
+    return (
+        isinstance(value, (int, float))
+        and not isinstance(value, bool)
+        and math.isfinite(value)
+    )
+
+
+def get_sort_params(
+    params, default_sort="course_id", default_order="desc", sort_fields=SORT_FIELDS
+):
+    sort = params.get("sort")
+    if sort not in sort_fields:
+        sort, order = default_sort, default_order
+    else:
+        order = "desc" if params.get("order") == "desc" else "asc"
+
+    try:
+        per_page = int(params.get("per_page", DEFAULT_PER_PAGE))
+    except (TypeError, ValueError):
+        per_page = DEFAULT_PER_PAGE
+    if per_page not in PER_PAGE_CHOICES:
+        per_page = DEFAULT_PER_PAGE
+
+    return sort, order, per_page
+
+
+def paginate_courses(courses, params, default_sort="course_id", default_order="desc"):
+    """
+    Order ``courses`` by the requested sort and return one ``CoursePage``.
+
+    ``params`` is a ``QueryDict`` (normally ``request.GET``) carrying
+    ``sort``, ``order``, ``per_page`` and ``cursor``. Search results (those
+    annotated with ``search_rank``) can also be sorted by relevance, which
+    becomes their default.
+    """
+    sort_fields = SORT_FIELDS
+    if "search_rank" in courses.query.annotations:
+        sort_fields = {**SORT_FIELDS, RELEVANCE: F("search_rank")}
+        default_sort, default_order = RELEVANCE, "desc"
+
+    sort, order, per_page = get_sort_params(
+        params, default_sort, default_order, sort_fields
+    )
+    descending = order == "desc"
+
+    courses = courses.annotate(sort_key=sort_fields[sort])
+    count = courses.count()
+
+    position = decode_cursor(params.get("cursor"), sort, order)
+    if position is not None and not _valid_value(sort, position[0]):
+        # A well-formed cursor carrying the wrong kind of value
+        position = None
+    if position is not None:
+        value, course_id = position
+        if descending:
+            after = Q(sort_key__lt=value) | Q(sort_key=value, course_id__lt=course_id)
+        else:
+            after = Q(sort_key__gt=value) | Q(sort_key=value, course_id__gt=course_id)
+        courses = courses.filter(after)
+
+    if descending:
+        courses = courses.order_by("-sort_key", "-course_id")
+    else:
+        courses = courses.order_by("sort_key", "course_id")
+
+    # Fetch one extra row to learn whether another page follows
+    rows = list(courses[: per_page + 1])
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        last = rows[-1]
+        next_cursor = encode_cursor(sort, order, last.sort_key, last.course_id)
+
+    return CoursePage(rows, sort, order, per_page, count, next_cursor)
@@ -0,0 +1,104 @@
+"""
+Short-lived cache of filter and search results.
+
+Listing, searching and re-sorting all start from the same filtered course
+set, and the expensive part is finding it (full-text match, rating and
+hours aggregates). The IDs of the matching courses are cached for a few
+minutes under a key built from the normalized filter parameters, so paging
+through results or switching the sort order only fetches the rows of the
+page being shown.
+
+Every key includes a catalog version stamp. Course, provider and review
+writes (and the catalog sync) bump the stamp once they commit, which
+retires every cached result set at once. The stamp and the time it changed also serve as the
+catalog's HTTP validators (see ``courses.api``).
+"""
+
+import hashlib
+import json
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from vocationalnyc.cache import get_or_compute
+from .filters import KEYWORDS, apply_filters
+from .models import Course
+from .search import rank_courses
+
+RESULTS_TIMEOUT = 60 * 5
+VERSION_KEY = "course_results_version"
+MODIFIED_KEY = "course_results_modified"
+# Broader result sets are cheaper to query again than to ship as an IN list
+MAX_CACHED_IDS = 5000
+
+
+def results_version():
+    return cache.get_or_set(VERSION_KEY, lambda: uuid.uuid4().hex, None)
+
+
+def results_modified():
+    """When the stamp was last bumped (or first read, if it was lost)."""
+    return cache.get_or_set(MODIFIED_KEY, timezone.now, None)
+
+
+def catalog_version(*args, **kwargs):
+    """``(stamp, modified)`` of the whole catalog, as a page version."""
+    return [(results_version(), results_modified())]
+
+
+def bump_results_version():
+    transaction.on_commit(
+        lambda: cache.set_many(
+            {VERSION_KEY: uuid.uuid4().hex, MODIFIED_KEY: timezone.now()}, None
+        )
+    )
+
+
+def results_key(filters, prefix="course_results"):
+    digest = hashlib.sha256(json.dumps(filters, sort_keys=True).encode()).hexdigest()
+    return f"{prefix}:{results_version()}:{digest}"
+
+
+def cached_results(filters):
+    """
+    ``{"ids": [...], "fuzzy": bool}`` for ``filters``, from the cache where
+    possible. ``ids`` is ``None`` when the result set is too large to cache.
+    """
+
+    def compute():
+        courses, fuzzy = apply_filters(Course.objects.all(), filters)
+        ids = list(
+            courses.order_by().values_list("course_id", flat=True)[: MAX_CACHED_IDS + 1]
+        )
+        if len(ids) > MAX_CACHED_IDS:
+            ids = None
+        return {"ids": ids, "fuzzy": fuzzy}
+
+    return get_or_compute(results_key(filters), compute, RESULTS_TIMEOUT)
+
+
+def matching_courses(courses, filters):
+    """
+    ``courses`` narrowed by ``filters`` through the result cache. Returns
+    ``(courses, fuzzy)`` like ``apply_filters``.
+    """
+    if not filters:
+        return courses, False
+
+    results = cached_results(filters)
+    if results["ids"] is None:
+        return apply_filters(courses, filters)
+    return courses.filter(course_id__in=results["ids"]), results["fuzzy"]
+
+
+def filter_courses(courses, filters):
+    """
+    ``courses`` narrowed by ``filters`` through the result cache, ranked by
+    ``search_rank`` when there are keywords.
+    """
+    courses, fuzzy = matching_courses(courses, filters)
+    if KEYWORDS in filters:
+        courses = rank_courses(courses, filters[KEYWORDS], fuzzy)
+    return courses
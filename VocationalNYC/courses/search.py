@@ -0,0 +1,129 @@
+"""
+Keyword search over the course catalog.
+
+On PostgreSQL each course keeps a weighted ``search_vector`` (name, keywords,
+provider name, description) backed by a GIN index, so a search is an index
+lookup ranked with ``ts_rank`` rather than a scan of every text column. Query
+terms are prefix-matched, and when nothing matches at all the search falls
+back to trigram similarity on the course name to catch typos.
+
+Other databases (SQLite in development and tests) fall back to
+``icontains`` matching with a simple field-weighted rank, so callers can use
+``search_courses`` without caring which backend is active.
+"""
+
+import re
+
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+    TrigramWordSimilarity,
+)
+from django.db import connection
+from django.db.models import Case, F, FloatField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Cast
+
+from users.models import Provider
+
+SEARCH_CONFIG = "english"
+
+# Minimum word similarity for the typo fallback (pg_trgm's own default)
+TRIGRAM_THRESHOLD = 0.3
+
+
+def is_postgres():
+    return connection.vendor == "postgresql"
+
+
+def search_vector():
+    """The expression ``Course.search_vector`` is kept equal to."""
+    provider_name = Subquery(
+        Provider.objects.filter(provider_id=OuterRef("provider_id"))
+        .order_by()
+        .values("name")[:1]
+    )
+    return (
+        SearchVector("name", weight="A", config=SEARCH_CONFIG)
+        + SearchVector("keywords", weight="B", config=SEARCH_CONFIG)
+        + SearchVector(provider_name, weight="B", config=SEARCH_CONFIG)
+        + SearchVector("course_desc", weight="C", config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vector(courses):
+    """Recompute ``search_vector`` for ``courses`` in one UPDATE."""
+    if not is_postgres():
+        return 0
+    return courses.update(search_vector=search_vector())
+
+
+def prefix_query(keywords):
+    """
+    Turn free text into a ``to_tsquery`` string matching every word as a
+    prefix, e.g. ``"nurse aid"`` -> ``"nurse:* & aid:*"``.
+    """
+    terms = re.findall(r"[^\W_]+", keywords.lower())
+    return " & ".join(f"{term}:*" for term in terms)
+
+
+def search_courses(courses, keywords):
+    """
+    Filter ``courses`` to those matching ``keywords`` and annotate each with
+    a ``search_rank`` (higher is better).
+    """
+    courses, fuzzy = match_courses(courses, keywords)
+    return rank_courses(courses, keywords, fuzzy)
+
+
+def match_courses(courses, keywords):
+    """
+    Filter ``courses`` to those matching ``keywords``. Returns
+    ``(courses, fuzzy)``; ``fuzzy`` is set when nothing matched exactly and
+    the typo fallback was used instead.
+    """
+    if not is_postgres():
+        return courses.filter(_fallback_match(keywords)), False
+
+    raw = prefix_query(keywords)
+    if not raw:
+        return courses.none(), False
+
+    query = SearchQuery(raw, search_type="raw", config=SEARCH_CONFIG)
+    matches = courses.filter(search_vector=query)
+    if matches.exists():
+        return matches, False
+    return courses.filter(name__trigram_word_similar=keywords), True
+
+
+def rank_courses(courses, keywords, fuzzy=False):
+    """Annotate already matched ``courses`` with their ``search_rank``."""
+    if not is_postgres():
+        return courses.annotate(search_rank=_fallback_rank(keywords))
+    if fuzzy:
+        rank = TrigramWordSimilarity(keywords, "name")
+    else:
+        query = SearchQuery(
+            prefix_query(keywords), search_type="raw", config=SEARCH_CONFIG
+        )
+        rank = SearchRank(F("search_vector"), query)
+    return courses.annotate(search_rank=Cast(rank, FloatField()))
+
+
+def _fallback_match(keywords):
+    return (
+        Q(name__icontains=keywords)
+        | Q(keywords__icontains=keywords)
+        | Q(provider__name__icontains=keywords)
+        | Q(course_desc__icontains=keywords)
+    )
+
+
+def _fallback_rank(keywords):
+    return Case(
+        When(name__icontains=keywords, then=Value(1.0)),
+        When(keywords__icontains=keywords, then=Value(0.4)),
+        When(provider__name__icontains=keywords, then=Value(0.4)),
+        default=Value(0.2),
+        output_field=FloatField(),
+    )
@@ -0,0 +1,127 @@
+from django.conf import settings
+from django.db import connection
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from users.models import Provider
+from vocationalnyc.conditional import bump_page_versions
+from .cards import bump_card_versions
+from .facets import parse_postcode
+from .models import Course
+from .geo import encode_geohash
+from .geocoding import known_coordinates
+from .results import bump_results_version
+from .search import is_postgres, update_search_vector
+
+# Trigram index behind the typo fallback in courses.search. It needs the
+# pg_trgm extension, which has no portable model-level declaration, so both
+# are created after migrate instead.
+TRIGRAM_SQL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS course_name_trgm_idx "
+    "ON courses_course USING gin (name gin_trgm_ops)",
+]
+
+
+def create_trigram_index(sender, **kwargs):
+    if not is_postgres():
+        return
+    with connection.cursor() as cursor:
+        for statement in TRIGRAM_SQL:
+            cursor.execute(statement)
+
+
+@receiver(post_save, sender=Course)
+def update_course_search_vector(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    update_search_vector(Course.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Provider)
+def update_provider_courses_search_vector(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # The provider name is part of each of its courses' search documents
+    update_fields = kwargs.get("update_fields")
+    if update_fields is None or "name" in update_fields:
+        update_search_vector(Course.objects.filter(provider=instance))
+
+
+def _refresh_coordinates(instance, field, update_fields):
+    """
+    Clear stale coordinates when an address changes, reusing those of any
+    course or provider already placed at the new address.
+    """
+    if update_fields is not None and field not in update_fields:
+        return
+    address = getattr(instance, field)
+    if instance.pk:
+        previous = (
+            type(instance)
+            .objects.filter(pk=instance.pk)
+            .values_list(field, flat=True)
+            .first()
+        )
+        if previous == address:
+            return
+    coordinates = known_coordinates(address) or (None, None)
+    instance.latitude, instance.longitude = coordinates
+    if isinstance(instance, Course):
+        instance.geohash = encode_geohash(*coordinates)
+
+
+@receiver(pre_save, sender=Course)
+def refresh_course_coordinates(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _refresh_coordinates(instance, "location", kwargs.get("update_fields"))
+
+
+@receiver(pre_save, sender=Course)
+def set_course_postcode(sender, instance, raw=False, **kwargs):
+    update_fields = kwargs.get("update_fields")
+    if not raw and (update_fields is None or "location" in update_fields):
+        instance.postcode = parse_postcode(instance.location)
+
+
+@receiver(pre_save, sender=Provider)
+def refresh_provider_coordinates(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _refresh_coordinates(instance, "address", kwargs.get("update_fields"))
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def bump_course_card(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_card_versions([instance.pk])
+        bump_page_versions("course", [instance.pk])
+        bump_page_versions("provider", [instance.provider_id])
+
+
+@receiver(post_save, sender=Provider)
+def bump_provider_course_cards(sender, instance, raw=False, **kwargs):
+    if not raw:
+        course_ids = list(instance.course.values_list("pk", flat=True))
+        bump_card_versions(course_ids)
+        bump_page_versions("course", course_ids)
+        bump_page_versions("provider", [instance.pk])
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def bump_user_provider_page(sender, instance, raw=False, **kwargs):
+    # The provider page shows its account's email and join date
+    update_fields = kwargs.get("update_fields")
+    if raw or (update_fields is not None and set(update_fields) == {"last_login"}):
+        return
+    bump_page_versions(
+        "provider", Provider.objects.filter(user=instance).values_list("pk", flat=True)
+    )
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+@receiver(post_save, sender=Provider)
+def bump_course_results(sender, raw=False, **kwargs):
+    if not raw:
+        bump_results_version()
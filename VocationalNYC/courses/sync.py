@@ -0,0 +1,332 @@
+"""
+Offline ingestion of the NYC Open Data training course catalog.
+
+The list views only read from the database; this module is what fills it.
+It is run by the ``sync_courses`` management command (see
+``courses/management/commands/sync_courses.py``) from cron or a worker, never
+from inside a web request.
+
+Each imported course stores a hash of the row it came from, so a re-sync
+only writes rows whose content actually changed.
+"""
+
+import hashlib
+import json
+import logging
+import re
+
+import requests
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from users.models import Provider, invalidate_provider_count
+from vocationalnyc.conditional import bump_page_versions
+from .cards import bump_card_versions
+from .facets import parse_postcode
+from .geo import location_fields
+from .models import Course
+from .results import bump_results_version
+from .search import update_search_vector
+
+logger = logging.getLogger(__name__)
+
+API_URL = "https://data.cityofnewyork.us/resource/fgq8-am2v.json"
+API_TIMEOUT = 30
+PAGE_SIZE = 1000
+BATCH_SIZE = 500
+
+# Cache key recording when the catalog was last synced
+LAST_UPDATED_KEY = "courses_last_updated"
+# Held while a sync runs, so overlapping cron runs don't both import
+SYNC_LOCK_KEY = "courses_sync"
+SYNC_LOCK_TIMEOUT = 60 * 60
+
+PROVIDER_UPDATE_FIELDS = [
+    "phone_num",
+    "address",
+    "open_time",
+    "provider_desc",
+    "website",
+    "contact_firstname",
+    "contact_lastname",
+    "latitude",
+    "longitude",
+    "updated_at",
+]
+
+COURSE_UPDATE_FIELDS = [
+    "keywords",
+    "course_desc",
+    "cost",
+    "location",
+    "classroom_hours",
+    "lab_hours",
+    "internship_hours",
+    "practical_hours",
+    "latitude",
+    "longitude",
+    "geohash",
+    "postcode",
+    "source_hash",
+]
+
+
+class SyncReport:
+    """Counts of what a sync did (or, on a dry run, would do)."""
+
+    def __init__(self, dry_run=False):
+        self.dry_run = dry_run
+        self.inserted = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.deleted = 0
+        # Imported courses missing from the feed that were left in place
+        self.stale = 0
+
+    def __str__(self):
+        prefix = "Dry run: " if self.dry_run else ""
+        summary = (
+            f"{prefix}{self.inserted} inserted, {self.updated} updated, "
+            f"{self.unchanged} unchanged, {self.deleted} deleted"
+        )
+        if self.stale:
+            summary += f", {self.stale} no longer in the dataset"
+        return summary
+
+
+def parse_hours(duration, label):
+    """Pull e.g. ``Lab Hours 20`` out of the ``cost_includes`` text."""
+    match = re.search(rf"{label} Hours\s+(\d+\.?\d*)", duration)
+    return int(float(match.group(1))) if match else 0
+
+
+def parse_cost(value):
+    try:
+        return int(float(str(value).strip()))
+    except (TypeError, ValueError):
+        return 0
+
+
+def parse_row(row):
+    """
+    Map one dataset row to ``(provider_fields, course_fields)``.
+
+    Returns ``None`` for rows without a course or organization name.
+    """
+    course_name = row.get("course_name", "").strip()
+    provider_name = row.get("organization_name", "").strip()
+
+    if not course_name or not provider_name:
+        return None
+
+    location = ", ".join(
+        filter(
+            None,
+            [
+                row.get("address1", "").strip(),
+                row.get("city", "").strip(),
+                row.get("state", "").strip(),
+                row.get("zip_code", "").strip(),
+            ],
+        )
+    )
+
+    provider_fields = {
+        "name": provider_name,
+        "phone_num": row.get("phone1", "0000000000"),
+        "address": location,
+        "open_time": row.get("open_time", ""),
+        "provider_desc": row.get("provider_description", ""),
+        "website": row.get("website", ""),
+        "contact_firstname": row.get("contact_firstname", ""),
+        "contact_lastname": row.get("contact_lastname", ""),
+    }
+
+    duration = row.get("cost_includes", "").strip()
+    course_fields = {
+        "name": course_name,
+        "keywords": row.get("keywords", ""),
+        "course_desc": row.get("coursedescription", ""),
+        "cost": parse_cost(row.get("cost_total", 0)),
+        "location": location,
+        "classroom_hours": parse_hours(duration, "Classroom"),
+        "lab_hours": parse_hours(duration, "Lab"),
+        "internship_hours": parse_hours(duration, "Internship"),
+        "practical_hours": parse_hours(duration, "Practical"),
+    }
+    course_fields["source_hash"] = row_hash(provider_fields, course_fields)
+
+    return provider_fields, course_fields
+
+
+def row_hash(provider_fields, course_fields):
+    payload = json.dumps([provider_fields, course_fields], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def fetch_rows(url=API_URL, page_size=PAGE_SIZE, timeout=API_TIMEOUT):
+    """Yield raw rows from the Socrata endpoint one page at a time."""
+    offset = 0
+    while True:
+        response = requests.get(
+            url,
+            params={"$limit": page_size, "$offset": offset, "$order": ":id"},
+            timeout=timeout,
+        )
+        response.raise_for_status()
+        rows = response.json()
+        yield from rows
+
+        if len(rows) < page_size:
+            break
+        offset += page_size
+
+
+def known_locations(addresses):
+    """Map each already-geocoded address in ``addresses`` to its ``(lat, lng)``."""
+    locations = {
+        location: (latitude, longitude)
+        for location, latitude, longitude in Course.objects.filter(
+            location__in=addresses, latitude__isnull=False
+        ).values_list("location", "latitude", "longitude")
+    }
+    locations.update(
+        (address, (latitude, longitude))
+        for address, latitude, longitude in Provider.objects.filter(
+            address__in=addresses, latitude__isnull=False
+        ).values_list("address", "latitude", "longitude")
+    )
+    return locations
+
+
+def upsert_batch(parsed_rows):
+    """
+    Upsert one batch of parsed rows with two ``bulk_create`` statements.
+
+    Providers are written first so their ids can be attached to the courses.
+    Addresses that are already geocoded keep their coordinates; new ones are
+    left blank for the geocoding job.
+    """
+    addresses = {provider_fields["address"] for provider_fields, _ in parsed_rows}
+    addresses.update(course_fields["location"] for _, course_fields in parsed_rows)
+    locations = known_locations(addresses)
+
+    def coordinates(address):
+        latitude, longitude = locations.get(address, (None, None))
+        return {"latitude": latitude, "longitude": longitude}
+
+    providers = {}
+    for provider_fields, _ in parsed_rows:
+        providers[provider_fields["name"]] = Provider(
+            **provider_fields, **coordinates(provider_fields["address"])
+        )
+
+    with transaction.atomic():
+        Provider.objects.bulk_create(
+            providers.values(),
+            update_conflicts=True,
+            unique_fields=["name"],
+            update_fields=PROVIDER_UPDATE_FIELDS,
+        )
+        provider_ids = dict(
+            Provider.objects.filter(name__in=providers).values_list(
+                "name", "provider_id"
+            )
+        )
+
+        courses = [
+            Course(
+                provider_id=provider_ids[provider_fields["name"]],
+                **course_fields,
+                **location_fields(locations.get(course_fields["location"])),
+                postcode=parse_postcode(course_fields["location"]),
+            )
+            for provider_fields, course_fields in parsed_rows
+        ]
+        Course.objects.bulk_create(
+            courses,
+            update_conflicts=True,
+            unique_fields=["provider", "name"],
+            update_fields=COURSE_UPDATE_FIELDS,
+        )
+        # bulk_create skips post_save, so refresh the search documents and
+        # card fragments here
+        update_search_vector(
+            Course.objects.filter(
+                source_hash__in=[fields["source_hash"] for _, fields in parsed_rows]
+            )
+        )
+        course_ids = [course.pk for course in courses if course.pk]
+        bump_card_versions(course_ids)
+        bump_page_versions("course", course_ids)
+        bump_page_versions("provider", provider_ids.values())
+
+
+def sync_courses(rows=None, batch_size=BATCH_SIZE, dry_run=False, prune=False):
+    """
+    Stream the dataset into the database, writing only changed rows.
+
+    ``rows`` defaults to the live API; tests pass a list instead. With
+    ``prune``, imported courses that have left the dataset are deleted.
+    Courses created by providers on the site are never pruned.
+    """
+    if rows is None:
+        rows = fetch_rows()
+
+    report = SyncReport(dry_run=dry_run)
+    existing = {
+        (provider_name, name): (course_id, source_hash)
+        for course_id, provider_name, name, source_hash in Course.objects.values_list(
+            "course_id", "provider__name", "name", "source_hash"
+        )
+    }
+    seen = set()
+
+    batch = []
+    for row in rows:
+        parsed = parse_row(row)
+        if parsed is None:
+            continue
+
+        provider_fields, course_fields = parsed
+        key = (provider_fields["name"], course_fields["name"])
+        if key in seen:
+            continue
+        seen.add(key)
+
+        if key not in existing:
+            report.inserted += 1
+        elif existing[key][1] != course_fields["source_hash"]:
+            report.updated += 1
+        else:
+            report.unchanged += 1
+            continue
+
+        batch.append(parsed)
+        if len(batch) >= batch_size:
+            if not dry_run:
+                upsert_batch(batch)
+            batch = []
+
+    if batch and not dry_run:
+        upsert_batch(batch)
+
+    removed = [
+        course_id
+        for key, (course_id, source_hash) in existing.items()
+        if source_hash is not None and key not in seen
+    ]
+    if prune:
+        report.deleted = len(removed)
+    else:
+        report.stale = len(removed)
+    if prune and removed and not dry_run:
+        Course.objects.filter(course_id__in=removed).delete()
+
+    if not dry_run:
+        cache.set(LAST_UPDATED_KEY, timezone.now().isoformat(), None)
+        invalidate_provider_count()
+        bump_results_version()
+    logger.info(f"Course sync: {report}")
+    return report
@@ -1,12 +1,27 @@
 # import unittest
 from unittest.mock import patch
+from io import StringIO
 import json
-
-from django.test import TestCase, RequestFactory, Client
+import re
+
+from django.test import (
+    Client,
+    RequestFactory,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.template.loader import render_to_string
 from django.urls import reverse
 from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
 from django.contrib.messages import get_messages
 from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.core.management.base import CommandError
 
 from courses.forms import CourseForm
 from courses.views import (
@@ -15,9 +30,29 @@ from courses.views import (
     filterCourses,
 )
 from courses.models import Course
+from courses.pagination import encode_cursor
+from courses.sync import SYNC_LOCK_KEY, fetch_rows, sync_courses
+from courses.search import prefix_query
+from courses.cards import bump_all_card_versions
+from courses.facets import borough, parse_postcode
+from courses.filters import apply_filters, normalize_filters
+from courses.results import bump_results_version
+from courses.geo import encode_geohash, location_fields, parse_zoom
+from courses.geocoding import (
+    Geocoder,
+    GeocodingError,
+    GoogleGeocoder,
+    StubGeocoder,
+    cached_coordinates,
+    geocode_address,
+    geocode_pending,
+)
 from users.models import CustomUser, Provider
-from review.models import Review
+from bookmarks.models import BookmarkList
+from review.models import CourseRatingStats, Review, ReviewReply, ReviewVote
 from requests.exceptions import RequestException
+from vocationalnyc.cache import cache_lock
+from django.db import connection
 from django.db.models import Avg, Count
 
 
@@ -34,10 +69,8 @@ class MockResponse:
             raise Exception(f"API returned {self.status_code}")
 
 
-class CourseListViewTest(TestCase):
-    @patch("courses.views.requests.get")
-    def setUp(self, mock_get):
-        self.factory = RequestFactory()
+class CourseSyncTest(TestCase):
+    def setUp(self):
         self.mock_api_response = [
             {
                 "course_name": "Test Course",
@@ -56,32 +89,30 @@ class CourseListViewTest(TestCase):
                 "cost_total": "1000",
             }
         ]
-        mock_get.return_value = MockResponse(self.mock_api_response)
 
-        # Create view instance
-        self.view = CourseListView()
-
-    @patch("courses.views.requests.get")
-    def test_get_queryset_api_call(self, mock_get):
+    @patch("courses.sync.requests.get")
+    def test_sync_courses_api_call(self, mock_get):
         mock_get.return_value = MockResponse(self.mock_api_response)
 
-        # Call the method
-        courses = self.view.get_queryset()
+        report = sync_courses()
 
-        # Verify API was called
         mock_get.assert_called_once_with(
-            "https://data.cityofnewyork.us/resource/fgq8-am2v.json", timeout=10
+            "https://data.cityofnewyork.us/resource/fgq8-am2v.json",
+            params={"$limit": 1000, "$offset": 0, "$order": ":id"},
+            timeout=30,
         )
+        self.assertEqual(report.inserted, 1)
 
         # Verify a course was created
-        self.assertEqual(courses.count(), 1)
-        course = courses.first()
+        self.assertEqual(Course.objects.count(), 1)
+        course = Course.objects.first()
         self.assertEqual(course.name, "Test Course")
 
         # Verify provider was created
         provider = Provider.objects.first()
         self.assertEqual(provider.name, "Test Provider")
         self.assertEqual(provider.phone_num, "1234567890")
+        self.assertEqual(course.provider, provider)
 
         # Verify course details
         self.assertEqual(course.classroom_hours, 40)
@@ -89,15 +120,165 @@ class CourseListViewTest(TestCase):
         self.assertEqual(course.internship_hours, 10)
         self.assertEqual(course.practical_hours, 15)
         self.assertEqual(course.cost, 1000)
+        self.assertEqual(course.location, "123 Test St, Test City, TS, 12345")
+        self.assertIsNotNone(course.source_hash)
+
+    @patch("courses.sync.requests.get")
+    def test_fetch_rows_pages_until_short_page(self, mock_get):
+        row = self.mock_api_response[0]
+        mock_get.side_effect = [
+            MockResponse([dict(row, course_name="A"), dict(row, course_name="B")]),
+            MockResponse([dict(row, course_name="C")]),
+        ]
+
+        rows = list(fetch_rows(page_size=2))
+
+        self.assertEqual([r["course_name"] for r in rows], ["A", "B", "C"])
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertEqual(mock_get.call_args.kwargs["params"]["$offset"], 2)
+
+    def test_sync_courses_updates_existing_rows(self):
+        sync_courses(rows=self.mock_api_response)
+        course_id = Course.objects.get().pk
+
+        changed = dict(self.mock_api_response[0], cost_total="1500", phone1="555")
+        report = sync_courses(rows=[changed])
+
+        self.assertEqual((report.inserted, report.updated), (0, 1))
+        self.assertEqual(Course.objects.count(), 1)
+        self.assertEqual(Provider.objects.count(), 1)
+        course = Course.objects.get()
+        self.assertEqual(course.pk, course_id)
+        self.assertEqual(course.cost, 1500)
+        self.assertEqual(course.provider.phone_num, "555")
+
+    def test_sync_courses_skips_unchanged_rows(self):
+        sync_courses(rows=self.mock_api_response)
+
+        with self.assertNumQueries(1):
+            # Only the lookup of existing hashes; nothing is written
+            report = sync_courses(rows=self.mock_api_response)
+
+        self.assertEqual(report.unchanged, 1)
+        self.assertEqual(report.inserted + report.updated, 0)
+
+    def test_sync_courses_batches_and_skips_invalid_rows(self):
+        rows = [
+            dict(self.mock_api_response[0], course_name=f"Course {i}") for i in range(5)
+        ]
+        rows.append({"course_name": "", "organization_name": "Nobody"})
+
+        with self.assertNumQueries(22):
+            # Hash lookup, then three batches of: two known-coordinate
+            # lookups, savepoint, two upserts, provider lookup, release
+            report = sync_courses(rows=rows, batch_size=2)
+
+        self.assertEqual(report.inserted, 5)
+        self.assertEqual(Course.objects.count(), 5)
+        self.assertEqual(Provider.objects.count(), 1)
+
+    def test_sync_courses_keeps_coordinates_of_known_addresses(self):
+        sync_courses(rows=self.mock_api_response)
+        Course.objects.update(latitude=40.7, longitude=-74.0)
 
-    @patch("courses.views.requests.get")
-    def test_get_queryset_api_error(self, mock_get):
+        rows = [
+            dict(self.mock_api_response[0], course_name="Elsewhere", zip_code="1"),
+            dict(self.mock_api_response[0], course_name="Same Place"),
+            dict(self.mock_api_response[0], cost_total="1500"),
+        ]
+        sync_courses(rows=rows)
+
+        coordinates = dict(Course.objects.values_list("name", "latitude"))
+        self.assertEqual(
+            coordinates,
+            {"Test Course": 40.7, "Same Place": 40.7, "Elsewhere": None},
+        )
+        self.assertEqual(Provider.objects.get().latitude, 40.7)
+
+    def test_sync_courses_dry_run_writes_nothing(self):
+        sync_courses(rows=self.mock_api_response)
+        Course.objects.update(cost=1)
+        rows = [
+            dict(self.mock_api_response[0], cost_total="2000"),
+            dict(self.mock_api_response[0], course_name="New Course"),
+        ]
+
+        report = sync_courses(rows=rows, dry_run=True)
+
+        self.assertEqual((report.inserted, report.updated), (1, 1))
+        self.assertEqual(Course.objects.count(), 1)
+        self.assertEqual(Course.objects.get().cost, 1)
+        self.assertTrue(str(report).startswith("Dry run:"))
+
+    def test_sync_courses_prune_removes_only_imported_courses(self):
+        sync_courses(rows=self.mock_api_response)
+        provider = Provider.objects.get()
+        Course.objects.create(name="Posted On Site", provider=provider)
+
+        report = sync_courses(rows=[], dry_run=True, prune=True)
+        self.assertEqual(report.deleted, 1)
+        self.assertEqual(Course.objects.count(), 2)
+
+        report = sync_courses(rows=[])
+        self.assertEqual((report.deleted, report.stale), (0, 1))
+        self.assertEqual(Course.objects.count(), 2)
+
+        report = sync_courses(rows=[], prune=True)
+        self.assertEqual(report.deleted, 1)
+        self.assertEqual(
+            list(Course.objects.values_list("name", flat=True)), ["Posted On Site"]
+        )
+
+    @patch("courses.sync.requests.get")
+    def test_sync_command_api_error(self, mock_get):
         mock_get.side_effect = RequestException("API Error")
 
-        # Call the method
+        with self.assertRaises(CommandError):
+            call_command("sync_courses", stdout=StringIO())
+
+        self.assertEqual(Course.objects.count(), 0)
+
+    def test_sync_command_refuses_to_run_concurrently(self):
+        with cache_lock(SYNC_LOCK_KEY):
+            with self.assertRaises(CommandError):
+                call_command("sync_courses", stdout=StringIO())
+
+    @patch("courses.sync.requests.get")
+    def test_sync_command(self, mock_get):
+        mock_get.return_value = MockResponse(self.mock_api_response)
+        out = StringIO()
+
+        call_command("sync_courses", "--batch-size", "10", stdout=out)
+
+        self.assertIn("1 inserted", out.getvalue())
+        self.assertEqual(Course.objects.count(), 1)
+
+    @patch("courses.sync.requests.get")
+    def test_sync_command_dry_run(self, mock_get):
+        mock_get.return_value = MockResponse(self.mock_api_response)
+        out = StringIO()
+
+        call_command("sync_courses", "--dry-run", stdout=out)
+
+        self.assertIn("Dry run: 1 inserted", out.getvalue())
+        self.assertEqual(Course.objects.count(), 0)
+
+
+class CourseListViewTest(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+        # Create view instance
+        self.view = CourseListView()
+
+    @patch("courses.sync.requests.get")
+    def test_get_queryset_reads_database_only(self, mock_get):
+        provider = Provider.objects.create(name="Test Provider")
+        Course.objects.create(name="Test Course", provider=provider)
+
         courses = self.view.get_queryset()
 
-        # Should return all courses even if API fails
+        mock_get.assert_not_called()
         self.assertEqual(list(courses), list(Course.objects.all()))
 
     def test_list_view_template(self):
@@ -151,6 +332,65 @@ class CourseListViewTest(TestCase):
         self.assertEqual(course.tags.count(), 5)  # only python exists, a,b,c ignored
 
 
+class CourseCardFieldsTest(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username="reviewer", password="testpassword"
+        )
+        provider = Provider.objects.create(
+            name="Card Provider", phone_num="1234567890", address="NYC"
+        )
+        self.rated = Course.objects.create(
+            name="Rated",
+            provider=provider,
+            location="NYC",
+            classroom_hours=10,
+            lab_hours=5,
+            internship_hours=2,
+            practical_hours=1,
+        )
+        self.unrated = Course.objects.create(
+            name="Unrated", provider=provider, location="NYC"
+        )
+        for score in (4, 3):
+            Review.objects.create(
+                user=get_user_model().objects.create_user(username=f"u{score}"),
+                course=self.rated,
+                score_rating=score,
+            )
+        Review.objects.create(user=self.user, course=self.rated, score_rating=4)
+
+    def test_card_fields_are_computed_in_sql(self):
+        with self.assertNumQueries(1):
+            courses = {c.name: c for c in Course.objects.with_card_fields()}
+
+        # Average of 4, 3, 4 is 3.67: three full stars and a 66% fourth
+        rated = courses["Rated"]
+        self.assertEqual(rated.rating, 3.7)
+        self.assertEqual(rated.reviews_count, 3)
+        self.assertEqual(rated.rating_full_stars, 3)
+        self.assertEqual(rated.rating_partial_star_position, 4)
+        self.assertEqual(rated.rating_partial_percentage, 66)
+        self.assertEqual(rated.total_hours, 18)
+
+        unrated = courses["Unrated"]
+        self.assertIsNone(unrated.avg_rating)
+        self.assertEqual(unrated.rating, 0)
+        self.assertEqual(unrated.reviews_count, 0)
+        self.assertEqual(unrated.rating_full_stars, 0)
+        self.assertEqual(unrated.rating_partial_star_position, 0)
+        self.assertEqual(unrated.total_hours, 0)
+
+    def test_whole_ratings_have_no_partial_star(self):
+        Review.objects.filter(score_rating=3).update(score_rating=4)
+        CourseRatingStats.rebuild_for(self.rated.pk)
+
+        rated = Course.objects.with_card_fields().get(pk=self.rated.pk)
+        self.assertEqual(rated.rating_full_stars, 4)
+        self.assertEqual(rated.rating_partial_star_position, 0)
+        self.assertEqual(rated.rating_partial_percentage, 0)
+
+
 class CourseDetailViewTest(TestCase):
     def setUp(self):
         self.factory = RequestFactory()
@@ -225,6 +465,66 @@ class CourseDetailViewTest(TestCase):
         self.assertEqual(response.status_code, 302)
         self.assertTrue("login" in response.url)
 
+    def detail_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse("course_detail", kwargs={"pk": self.course.pk})
+            )
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_query_count_does_not_grow_with_reviews(self):
+        provider_user = get_user_model().objects.create_user(
+            username="provider", password="testpassword", role="training_provider"
+        )
+        self.provider.user = provider_user
+        self.provider.save()
+        ReviewVote.objects.create(review=self.review1, user=self.user, action="upvote")
+        few, _ = self.detail_queries()
+
+        for i in range(20):
+            author = get_user_model().objects.create_user(
+                username=f"reviewer{i}", password="testpassword"
+            )
+            review = Review.objects.create(
+                user=author, course=self.course, score_rating=3, content="OK"
+            )
+            ReviewReply.objects.create(
+                user=provider_user, review=review, content="Thanks"
+            )
+            ReviewVote.objects.create(review=review, user=self.user, action="downvote")
+        many, response = self.detail_queries()
+
+        self.assertEqual(many, few)
+        # Session, user, course, bookmark lists, a page of reviews, their
+        # replies, whether the visitor has reviewed the course
+        self.assertEqual(many, 7)
+        self.assertEqual(response.context["reviews_count"], 22)
+        self.assertEqual(len(response.context["reviews"]), 10)
+        self.assertTrue(response.context["review_page"].has_next)
+        self.assertContains(response, "reviewer19")
+        self.assertNotContains(response, "reviewer9<")
+        self.assertContains(response, 'aria-pressed="true"', count=10)
+        self.assertTrue(response.context["user_has_reviewed"])
+
+    def test_provider_sees_reply_form_only_for_unanswered_reviews(self):
+        provider_user = get_user_model().objects.create_user(
+            username="provider", password="testpassword", role="training_provider"
+        )
+        self.provider.user = provider_user
+        self.provider.save()
+        ReviewReply.objects.create(
+            user=provider_user, review=self.review1, content="Thanks"
+        )
+
+        self.client.login(username="provider", password="testpassword")
+        response = self.client.get(
+            reverse("course_detail", kwargs={"pk": self.course.pk})
+        )
+        self.assertTrue(response.context["is_course_provider"])
+        self.assertContains(response, "provider-reply-form", count=1)
+        self.assertContains(response, "Provider Response:", count=1)
+
 
 def mock_filterCourses(request):
     # Create test provider
@@ -335,6 +635,38 @@ class SearchResultTest(TestCase):
         self.assertIn(self.course1, response.context["courses"])
         self.assertIn(self.course3, response.context["courses"])
 
+    def test_search_by_provider_name(self):
+        response = self.client.get(
+            reverse("search_result"), {"keywords": "Provider Two"}
+        )
+        self.assertEqual(list(response.context["courses"]), [self.course3])
+
+    def test_search_results_default_to_relevance_order(self):
+        # "python" is in course1's name but only in course2's keywords
+        response = self.client.get(reverse("search_result"), {"keywords": "python"})
+        self.assertEqual(response.context["page"].sort, "relevance")
+        self.assertEqual(
+            list(response.context["courses"]), [self.course1, self.course2]
+        )
+
+        response = self.client.get(
+            reverse("search_result"), {"keywords": "python", "sort": "cost"}
+        )
+        self.assertEqual(
+            list(response.context["courses"]), [self.course1, self.course2]
+        )
+        response = self.client.get(
+            reverse("search_result"),
+            {"keywords": "python", "sort": "cost", "order": "desc"},
+        )
+        self.assertEqual(
+            list(response.context["courses"]), [self.course2, self.course1]
+        )
+
+    def test_prefix_query(self):
+        self.assertEqual(prefix_query("Nurse  aide-2"), "nurse:* & aide:* & 2:*")
+        self.assertEqual(prefix_query(" & | !"), "")
+
     def test_filter_by_cost(self):
         response = self.client.get(
             reverse("search_result"), {"min_cost": "900", "max_cost": "1500"}
@@ -556,8 +888,178 @@ class CourseMapTest(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertTemplateUsed(response, "courses/course_map.html")
 
-    @patch("courses.views.requests.get")
-    def test_course_data_view(self, mock_get):
+    def test_course_map_points(self):
+        Course.objects.filter(pk=self.course.pk).update(
+            **location_fields((40.7128, -74.0060))
+        )
+        Course.objects.create(
+            name="Unplaced Course", provider=self.provider, location="Nowhere"
+        )
+
+        with patch("courses.geocoding.requests.get") as mock_get:
+            response = self.client.get(reverse("course_map_points"))
+        self.assertEqual(response.status_code, 200)
+        # The map only reads stored coordinates
+        mock_get.assert_not_called()
+
+        data = response.json()
+        self.assertEqual(len(data["markers"]), 1)
+        self.assertEqual(data["markers"][0]["name"], "Test Course")
+        self.assertEqual(data["markers"][0]["course_id"], self.course.course_id)
+        self.assertEqual(data["markers"][0]["latitude"], 40.7128)
+        self.assertEqual(data["markers"][0]["longitude"], -74.0060)
+        self.assertEqual(data["bounds"], [40.7128, -74.006, 40.7128, -74.006])
+
+
+class CourseMapPointsTest(TestCase):
+    def setUp(self):
+        provider = Provider.objects.create(
+            name="Test Provider", phone_num="1234567890", address="NYC"
+        )
+        places = {
+            "Midtown A": (40.7549, -73.9840),
+            "Midtown B": (40.7527, -73.9772),
+            "Brooklyn": (40.6782, -73.9442),
+            "Boston": (42.3601, -71.0589),
+        }
+        for name, coordinates in places.items():
+            Course.objects.create(name=name, provider=provider, location=name)
+            Course.objects.filter(name=name).update(**location_fields(coordinates))
+
+    def points(self, **params):
+        response = self.client.get(reverse("course_map_points"), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_encode_geohash(self):
+        self.assertEqual(encode_geohash(57.64911, 10.40744), "u4pruydqq")
+        self.assertIsNone(encode_geohash(None, None))
+
+    def test_viewport_only_returns_courses_in_view(self):
+        data = self.points(bbox="40.5,-74.3,40.95,-73.7", zoom=14)
+
+        names = sorted(marker["name"] for marker in data["markers"])
+        self.assertEqual(names, ["Brooklyn", "Midtown A", "Midtown B"])
+        self.assertNotIn("bounds", data)
+
+    def test_radius_query(self):
+        # Times Square; the Midtown courses are within a mile, Brooklyn isn't
+        data = self.points(lat=40.758, lng=-73.9855, radius=1, zoom=14)
+
+        names = sorted(marker["name"] for marker in data["markers"])
+        self.assertEqual(names, ["Midtown A", "Midtown B"])
+
+    def test_low_zoom_returns_clusters(self):
+        with self.assertNumQueries(2):
+            # Bounds, then one grouped query for the clusters
+            data = self.points(zoom=8)
+
+        self.assertEqual(data["markers"], [])
+        self.assertEqual(data["count"], 4)
+        counts = sorted(cluster["count"] for cluster in data["clusters"])
+        self.assertEqual(counts, [1, 3])
+        self.assertEqual(data["bounds"][0], 40.6782)
+
+    def test_fractional_and_out_of_range_zoom(self):
+        data = self.points(zoom="13.6")
+        self.assertEqual(len(data["markers"]), 4)
+        self.assertEqual(data["clusters"], [])
+
+        data = self.points(zoom="8.25")
+        self.assertEqual(data["count"], 4)
+
+        self.assertEqual(parse_zoom("-3"), 0)
+        self.assertEqual(parse_zoom("99.5"), 22)
+        self.assertEqual(parse_zoom("inf"), 13)
+        self.assertEqual(parse_zoom("nan"), 13)
+        self.assertEqual(parse_zoom(None), 13)
+
+    def test_filters_apply(self):
+        data = self.points(location="Midtown", zoom=14)
+        self.assertEqual(len(data["markers"]), 2)
+
+    def test_filters_match_the_course_list(self):
+        Course.objects.filter(name="Brooklyn").update(
+            course_desc="Evening welding classes", lab_hours=80, classroom_hours=30
+        )
+        params = {"keywords": "welding", "min_hours": "100"}
+
+        data = self.points(zoom=14, **params)
+        self.assertEqual([marker["name"] for marker in data["markers"]], ["Brooklyn"])
+
+        response = self.client.get(reverse("search_result"), params)
+        self.assertEqual(
+            [course.name for course in response.context["courses"]], ["Brooklyn"]
+        )
+
+
+class GeocodingTest(TestCase):
+    ADDRESS = "123 Test St, New York, NY, 10001"
+
+    def setUp(self):
+        cache.clear()
+        self.provider = Provider.objects.create(
+            name="Test Provider", phone_num="1234567890", address=self.ADDRESS
+        )
+        self.course = Course.objects.create(
+            name="Test Course", provider=self.provider, location=self.ADDRESS
+        )
+        self.other = Course.objects.create(
+            name="Other Course", provider=self.provider, location="Unknown Place"
+        )
+
+    def test_geocode_pending_looks_up_each_address_once(self):
+        geocoder = StubGeocoder({self.ADDRESS: (40.7, -74.0)})
+
+        placed = geocode_pending(geocoder=geocoder)
+
+        self.assertEqual(placed, 1)
+        self.assertEqual(
+            sorted(geocoder.calls), sorted([self.ADDRESS, "Unknown Place"])
+        )
+        self.course.refresh_from_db()
+        self.provider.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual((self.course.latitude, self.course.longitude), (40.7, -74.0))
+        self.assertEqual(
+            (self.provider.latitude, self.provider.longitude), (40.7, -74.0)
+        )
+        self.assertIsNone(self.other.latitude)
+
+        # Results (including misses) are cached, so a re-run calls out for nothing
+        geocoder.calls.clear()
+        geocode_pending(geocoder=geocoder)
+        self.assertEqual(geocoder.calls, [])
+
+    @patch("courses.geocoding.time.sleep")
+    def test_transient_errors_are_retried(self, mock_sleep):
+        geocoder = StubGeocoder({self.ADDRESS: (40.7, -74.0)})
+        failures = [GeocodingError("OVER_QUERY_LIMIT")]
+
+        def flaky(address):
+            if failures:
+                raise failures.pop()
+            return StubGeocoder.geocode(geocoder, address)
+
+        geocoder.geocode = flaky
+        self.assertEqual(geocode_address(geocoder, self.ADDRESS), (40.7, -74.0))
+        mock_sleep.assert_called_once()
+
+    @patch("courses.geocoding.time.sleep")
+    def test_persistent_errors_are_not_cached(self, mock_sleep):
+        geocoder = StubGeocoder()
+
+        def timeout(address):
+            raise GeocodingError("timeout")
+
+        geocoder.geocode = timeout
+
+        self.assertIsNone(geocode_address(geocoder, self.ADDRESS))
+        self.assertFalse(cached_coordinates(self.ADDRESS))
+        self.assertEqual(mock_sleep.call_count, 2)
+
+    @patch("courses.geocoding.requests.get")
+    def test_google_geocoder(self, mock_get):
         mock_get.return_value = MockResponse(
             {
                 "status": "OK",
@@ -566,20 +1068,845 @@ class CourseMapTest(TestCase):
                 ],
             }
         )
+        self.assertEqual(
+            GoogleGeocoder(api_key="key").geocode(self.ADDRESS), (40.7128, -74.0060)
+        )
 
-        response = self.client.get(reverse("course_map"))
+        mock_get.return_value = MockResponse({"status": "ZERO_RESULTS"})
+        self.assertIsNone(GoogleGeocoder(api_key="key").geocode(self.ADDRESS))
+
+        mock_get.return_value = MockResponse({"status": "OVER_QUERY_LIMIT"})
+        with self.assertRaises(GeocodingError):
+            GoogleGeocoder(api_key="key").geocode(self.ADDRESS)
+
+    @override_settings(GOOGLE_MAPS_API_KEY="")
+    def test_google_geocoder_needs_api_key(self):
+        with self.assertRaises(ImproperlyConfigured):
+            GoogleGeocoder()
+        with self.assertRaises(TypeError):
+            Geocoder()
+
+    def test_changing_location_clears_or_reuses_coordinates(self):
+        geocode_pending(geocoder=StubGeocoder({self.ADDRESS: (40.7, -74.0)}))
+
+        # Moving to an address that's already placed reuses its coordinates
+        self.other.location = self.ADDRESS
+        self.other.save()
+        self.assertEqual((self.other.latitude, self.other.longitude), (40.7, -74.0))
+
+        self.course.location = "Somewhere New"
+        self.course.save()
+        self.course.refresh_from_db()
+        self.assertIsNone(self.course.latitude)
+
+        # Saving without a location change keeps them
+        self.other.cost = 10
+        self.other.save()
+        self.other.refresh_from_db()
+        self.assertEqual(self.other.latitude, 40.7)
+
+    @override_settings(GEOCODER="courses.geocoding.StubGeocoder")
+    def test_geocode_locations_command(self):
+        out = StringIO()
+        call_command("geocode_locations", stdout=out)
+        self.assertIn("Geocoded 0 addresses", out.getvalue())
+
+
+class CoursePaginationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        provider = Provider.objects.create(name="Paging Provider")
+        Course.objects.bulk_create(
+            [
+                Course(
+                    name=f"Course {i:02d}",
+                    provider=provider,
+                    cost=100 * (i % 5),
+                    location="New York" if i % 2 else "Boston",
+                )
+                for i in range(25)
+            ]
+        )
+
+    def collect_pages(self, url_name, params):
+        names, cursor = [], None
+        while True:
+            query = dict(params, format="json")
+            if cursor:
+                query["cursor"] = cursor
+            data = self.client.get(reverse(url_name), query).json()
+            names.extend(re.findall(r"Course \d\d", data["html"]))
+            cursor = data["next_cursor"]
+            if not cursor:
+                return names, data
+
+    def test_list_view_renders_one_page(self):
+        response = self.client.get(reverse("course_list"))
+        self.assertEqual(len(response.context["courses"]), 10)
+        self.assertEqual(response.context["page"].count, 25)
+        self.assertEqual(response.context["courses"][0].name, "Course 24")
+        self.assertTrue(response.context["page"].has_next)
+
+    def test_keyset_pages_cover_every_course_once(self):
+        names, last = self.collect_pages(
+            "course_sort", {"sort": "cost", "order": "desc", "per_page": 10}
+        )
+        self.assertEqual(len(names), 25)
+        self.assertEqual(len(set(names)), 25)
+        self.assertEqual((last["count"], last["num_pages"]), (25, 3))
+        costs = [Course.objects.get(name=name).cost for name in names]
+        self.assertEqual(costs, sorted(costs, reverse=True))
+
+    def test_pages_keep_filters(self):
+        names, last = self.collect_pages(
+            "search_result", {"location": "New York", "sort": "name", "per_page": 10}
+        )
+        self.assertEqual(last["count"], 12)
+        self.assertEqual(names, sorted(names))
+        self.assertTrue(all(int(name[-2:]) % 2 for name in names))
+
+    def test_deep_page_query_is_bounded(self):
+        response = self.client.get(
+            reverse("course_sort"), {"sort": "name", "format": "json"}
+        )
+        cursor = response.json()["next_cursor"]
+
+        def run(params):
+            request = RequestFactory().get("/courses/sort/", params)
+            request.session = {}
+            request.user = AnonymousUser()
+            with CaptureQueriesContext(connection) as queries:
+                response = sort_by(request)
+            return response, len(queries)
+
+        _, first_page_queries = run({"sort": "name"})
+        response, deep_page_queries = run({"sort": "name", "cursor": cursor})
+
+        # A later page costs the same as the first; no OFFSET scan
+        self.assertEqual(deep_page_queries, first_page_queries)
+        content = response.content.decode()
+        self.assertIn("Course 10", content)
+        self.assertNotIn("Course 09", content)
+
+    def test_mismatched_or_bad_cursor_restarts_from_first_page(self):
+        response = self.client.get(
+            reverse("course_sort"), {"sort": "name", "format": "json"}
+        )
+        cursor = response.json()["next_cursor"]
+        for params in (
+            {"sort": "name", "order": "desc", "cursor": cursor},
+            {"sort": "name", "cursor": "not-a-cursor"},
+        ):
+            response = self.client.get(reverse("course_list"), params)
+            first = Course.objects.order_by(
+                "-name" if params.get("order") == "desc" else "name"
+            ).first()
+            self.assertEqual(response.context["courses"][0], first)
+
+    def test_cursor_values_of_the_wrong_type_restart_from_first_page(self):
+        cheapest = Course.objects.order_by("cost", "course_id").first()
+        newest = Course.objects.order_by("-course_id").first()
+        cases = [
+            ({"sort": "cost"}, encode_cursor("cost", "asc", value, 1), cheapest)
+            for value in ("abc", [1], None, True)
+        ] + [
+            ({}, encode_cursor("course_id", "desc", None, 1), newest),
+            ({"sort": "name"}, encode_cursor("name", "asc", 5, 1), None),
+        ]
+        first_by_name = Course.objects.order_by("name", "course_id").first()
+        for params, cursor, first in cases:
+            first = first or first_by_name
+            params = dict(params, cursor=cursor)
+
+            response = self.client.get(reverse("course_list"), params)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.context["courses"][0], first)
+
+            for url_name in ("course_sort", "search_result"):
+                response = self.client.get(
+                    reverse(url_name), dict(params, format="json")
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertIn(first.name, response.json()["html"])
+
+            response = self.client.get(reverse("course_api"), params)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()["results"][0]["name"], first.name)
+
+    def test_invalid_sort_and_page_size_fall_back_to_defaults(self):
+        response = self.client.get(
+            reverse("course_list"), {"sort": "provider__user__password", "per_page": 7}
+        )
+        page = response.context["page"]
+        self.assertEqual(
+            (page.sort, page.order, page.per_page), ("course_id", "desc", 10)
+        )
+
+
+class CourseListingQueryCountTest(TestCase):
+    """Listing pages must not issue a query per course (e.g. for its provider)."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username="student", password="testpassword"
+        )
+        for i in range(12):
+            provider = Provider.objects.create(
+                name=f"Provider {i}", phone_num="1234567890", address=f"{i} Main St"
+            )
+            Course.objects.create(
+                name=f"Course {i}",
+                provider=provider,
+                location="NYC",
+                course_desc="Learn things " * 100,
+            )
+        self.client.login(username="student", password="testpassword")
+        session = self.client.session
+        session["comparison_courses"] = list(
+            Course.objects.values_list("pk", flat=True)[:3]
+        )
+        session.save()
+
+    def assertListingQueries(self, num, url, params=None):
+        # Session, user, bookmark lists (x2), COUNT, the page, comparison tray
+        with self.assertNumQueries(num):
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_course_list(self):
+        response = self.assertListingQueries(
+            7, reverse("course_list"), {"per_page": 20}
+        )
+        self.assertContains(response, "Provider 11")
+        self.assertEqual(len(response.context["courses"]), 12)
+
+    def test_course_list_json(self):
+        # The card fragment alone doesn't show the comparison tray or list
+        # every bookmark list
+        self.assertListingQueries(5, reverse("course_list"), {"format": "json"})
+
+    def test_search_result(self):
+        # The first search also looks up the matching IDs; repeats reuse them
+        self.assertListingQueries(8, reverse("search_result"), {"keywords": "Course"})
+        self.assertListingQueries(7, reverse("search_result"), {"keywords": "Course"})
+
+    def test_sort_by(self):
+        self.assertListingQueries(
+            5, reverse("course_sort"), {"sort": "name", "format": "json"}
+        )
+
+    def test_course_comparison(self):
+        # Session, user, the compared courses
+        response = self.assertListingQueries(3, reverse("course_comparison"))
+        self.assertContains(response, "Provider 0")
+
+    def test_card_loads_only_the_start_of_the_description(self):
+        course = Course.objects.for_cards().first()
+        self.assertEqual(len(course.course_summary), 500)
+        self.assertIn("course_desc", course.get_deferred_fields())
+
+
+class CourseCardCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.provider = Provider.objects.create(
+            name="Card Provider", phone_num="1234567890", address="1 Main St"
+        )
+        self.course = Course.objects.create(
+            name="Cached Course", provider=self.provider, location="NYC"
+        )
+        self.other = Course.objects.create(
+            name="Other Course", provider=self.provider, location="NYC"
+        )
+        self.user = get_user_model().objects.create_user(
+            username="student", password="testpassword"
+        )
+
+    def rendered_cards(self):
+        """Names of the courses whose card was rendered (not cached)."""
+        with patch("courses.cards.render_to_string", wraps=render_to_string) as render:
+            response = self.client.get(reverse("course_list"))
+        self.assertEqual(response.status_code, 200)
+        return sorted(call.args[1]["course"].name for call in render.call_args_list)
+
+    def test_cards_are_served_from_cache(self):
+        self.assertEqual(self.rendered_cards(), ["Cached Course", "Other Course"])
+        self.assertEqual(self.rendered_cards(), [])
+
+        response = self.client.get(reverse("course_list"))
+        self.assertContains(response, "Cached Course")
+
+    def test_course_and_provider_changes_invalidate_cards(self):
+        self.rendered_cards()
+
+        self.course.cost = 99
+        with self.captureOnCommitCallbacks(execute=True):
+            self.course.save()
+        self.assertEqual(self.rendered_cards(), ["Cached Course"])
+
+        self.provider.verification_status = True
+        with self.captureOnCommitCallbacks(execute=True):
+            self.provider.save()
+        self.assertEqual(self.rendered_cards(), ["Cached Course", "Other Course"])
+
+    def test_bumps_wait_for_commit(self):
+        self.rendered_cards()
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.course.cost = 99
+            self.course.save()
+        # Until the write commits, readers keep the old stamp
+        self.assertEqual(self.rendered_cards(), [])
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.rendered_cards(), ["Cached Course"])
+
+    def test_reviews_and_votes_invalidate_cards(self):
+        self.rendered_cards()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            review = Review.objects.create(
+                user=self.user, course=self.other, score_rating=4
+            )
+        self.assertEqual(self.rendered_cards(), ["Other Course"])
+        response = self.client.get(reverse("course_list"))
+        self.assertContains(response, "1 review")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ReviewVote.objects.create(review=review, user=self.user, action="upvote")
+        self.assertEqual(self.rendered_cards(), ["Other Course"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            review.delete()
+        self.assertEqual(self.rendered_cards(), ["Other Course"])
+
+    def test_cards_are_cached_per_kind_of_visitor(self):
+        self.rendered_cards()
+        self.client.login(username="student", password="testpassword")
+        self.assertEqual(self.rendered_cards(), ["Cached Course", "Other Course"])
+
+        response = self.client.get(reverse("course_list"))
+        self.assertContains(response, "openBookmarkModal")
+
+    def test_bump_all_card_versions(self):
+        self.rendered_cards()
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_all_card_versions()
+        self.assertEqual(self.rendered_cards(), ["Cached Course", "Other Course"])
+
+
+class CourseResultCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.provider = Provider.objects.create(
+            name="Result Provider", phone_num="1234567890", address="1 Main St"
+        )
+        self.nursing = Course.objects.create(
+            name="Nursing Basics", provider=self.provider, cost=500, location="Bronx"
+        )
+        self.welding = Course.objects.create(
+            name="Welding", provider=self.provider, cost=900, location="Queens"
+        )
+        self.user = get_user_model().objects.create_user(
+            username="student", password="testpassword"
+        )
+
+    def search(self, url_name="search_result", **params):
+        """Names of the courses found, and how many times filters were run."""
+        with patch("courses.results.apply_filters", wraps=apply_filters) as run:
+            response = self.client.get(reverse(url_name), params)
         self.assertEqual(response.status_code, 200)
+        names = sorted(course.name for course in response.context["courses"])
+        return names, run.call_count
 
-        # Parse the JSON response
-        course_map_data_str = response.context.get("course_map_data")
-        response_data = json.loads(course_map_data_str)
+    def test_normalize_filters(self):
+        self.assertEqual(
+            normalize_filters(
+                {
+                    "keywords": "  Nursing   BASICS ",
+                    "provider": "",
+                    "min_cost": "100",
+                    "max_cost": "abc",
+                    "min_rating": "3.5",
+                }
+            ),
+            {"keywords": "nursing basics", "min_cost": 100, "min_rating": 3.5},
+        )
+
+    def test_filters_compile_to_one_where_clause(self):
+        courses, fuzzy = apply_filters(
+            Course.objects.all(),
+            normalize_filters(
+                {"provider": "result", "min_hours": "0", "min_rating": "0"}
+            ),
+        )
+        self.assertFalse(fuzzy)
+        self.assertEqual(str(courses.query).count(" WHERE "), 1)
+        self.assertEqual(list(courses), [])
+
+        courses, _ = apply_filters(
+            Course.objects.all(), normalize_filters({"course_id": str(self.welding.pk)})
+        )
+        self.assertEqual(list(courses), [self.welding])
+
+    def test_equivalent_queries_share_cached_ids(self):
+        self.assertEqual(self.search(keywords="Nursing"), (["Nursing Basics"], 1))
+        self.assertEqual(
+            self.search(keywords=" nursing ", min_cost="", sort="cost"),
+            (["Nursing Basics"], 0),
+        )
+        self.assertEqual(
+            self.search("course_sort", keywords="NURSING", sort="name"),
+            (["Nursing Basics"], 0),
+        )
+        # A different query is computed separately
+        self.assertEqual(self.search(max_cost="600"), (["Nursing Basics"], 1))
+
+    def test_unfiltered_listing_skips_cache(self):
+        self.assertEqual(self.search(), (["Nursing Basics", "Welding"], 0))
+
+    def test_catalog_changes_invalidate_results(self):
+        self.search(max_cost="600")
+
+        self.welding.cost = 100
+        with self.captureOnCommitCallbacks(execute=True):
+            self.welding.save()
+        self.assertEqual(
+            self.search(max_cost="600"), (["Nursing Basics", "Welding"], 1)
+        )
 
-        # Verify the response data structure
-        self.assertEqual(len(response_data), 1)
-        self.assertEqual(response_data[0]["name"], "Test Course")
-        self.assertEqual(response_data[0]["course_id"], self.course.course_id)
-        self.assertEqual(response_data[0]["latitude"], 40.7128)
-        self.assertEqual(response_data[0]["longitude"], -74.0060)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.nursing.delete()
+        self.assertEqual(self.search(max_cost="600"), (["Welding"], 1))
+
+    def test_reviews_invalidate_rating_filter(self):
+        self.assertEqual(self.search(min_rating="4"), ([], 1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.create(user=self.user, course=self.welding, score_rating=5)
+        self.assertEqual(self.search(min_rating="4"), (["Welding"], 1))
+
+    def test_bump_results_version(self):
+        self.search(location="bronx")
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_results_version()
+        self.assertEqual(self.search(location="bronx"), (["Nursing Basics"], 1))
+
+    def test_large_result_sets_are_not_cached(self):
+        with patch("courses.results.MAX_CACHED_IDS", 1):
+            self.assertEqual(
+                self.search(min_cost="0"), (["Nursing Basics", "Welding"], 2)
+            )
+
+
+class CourseFacetsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.provider = Provider.objects.create(
+            name="Facet Provider", phone_num="1234567890", address="1 Main St"
+        )
+        self.other_provider = Provider.objects.create(
+            name="Other Provider", phone_num="1234567890", address="2 Main St"
+        )
+        self.free = Course.objects.create(
+            name="Free Nursing",
+            provider=self.provider,
+            cost=0,
+            classroom_hours=20,
+            location="1 Main St, New York, NY, 10001",
+        )
+        self.mid = Course.objects.create(
+            name="Nursing Plus",
+            provider=self.provider,
+            cost=800,
+            classroom_hours=60,
+            lab_hours=60,
+            location="5 Grand Concourse, Bronx, NY, 10451",
+        )
+        self.pricey = Course.objects.create(
+            name="Welding",
+            provider=self.other_provider,
+            cost=9000,
+            practical_hours=600,
+            location="9 Main St, Flushing, NY, 11354-1234",
+        )
+        user = get_user_model().objects.create_user(
+            username="student", password="testpassword"
+        )
+        Review.objects.create(user=user, course=self.mid, score_rating=4)
+        Review.objects.create(user=user, course=self.pricey, score_rating=2)
+
+    def facets(self, **params):
+        response = self.client.get(reverse("course_facets"), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def counts(self, buckets, key="label"):
+        return {bucket[key]: bucket["count"] for bucket in buckets}
+
+    def test_parse_postcode(self):
+        self.assertEqual(parse_postcode("1 Main St, New York, NY, 10001"), "10001")
+        self.assertEqual(parse_postcode("12345 Long Rd, NY 11201-0001"), "11201")
+        self.assertEqual(parse_postcode("No zip here"), "")
+        self.assertEqual(self.pricey.postcode, "11354")
+
+    def test_borough(self):
+        self.assertEqual(borough("11432"), "Queens")
+        self.assertEqual(borough("11201"), "Brooklyn")
+        # Nassau County, just over the Queens line
+        self.assertEqual(borough("11001"), "Outside NYC")
+        self.assertEqual(borough("11550"), "Outside NYC")
+        self.assertIsNone(borough(""))
+
+    def test_postcode_follows_location(self):
+        self.free.location = "1 Bay St, Staten Island, NY, 10301"
+        self.free.save()
+        self.free.refresh_from_db()
+        self.assertEqual(self.free.postcode, "10301")
+
+    def test_all_facets(self):
+        data = self.facets()
+        self.assertEqual(data["count"], 3)
+        self.assertEqual(
+            self.counts(data["cost"]),
+            {
+                "Free": 1,
+                "$1 - $500": 0,
+                "$501 - $1,000": 1,
+                "$1,001 - $5,000": 0,
+                "Over $5,000": 1,
+            },
+        )
+        self.assertEqual(data["cost"][1]["min_cost"], 1)
+        self.assertEqual(data["cost"][1]["max_cost"], 500)
+        self.assertEqual(
+            self.counts(data["hours"]),
+            {
+                "Under 40 hours": 1,
+                "40 - 99 hours": 0,
+                "100 - 249 hours": 1,
+                "250 - 499 hours": 0,
+                "500+ hours": 1,
+            },
+        )
+        self.assertEqual(
+            self.counts(data["rating"]),
+            {"4 & up": 1, "3 & up": 1, "2 & up": 2, "1 & up": 2},
+        )
+        self.assertEqual(
+            self.counts(data["borough"]),
+            {"Manhattan": 1, "Bronx": 1, "Queens": 1},
+        )
+        self.assertEqual(
+            self.counts(data["postcode"], "postcode"),
+            {"10001": 1, "10451": 1, "11354": 1},
+        )
+        self.assertEqual(
+            self.counts(data["provider"], "name"),
+            {"Facet Provider": 2, "Other Provider": 1},
+        )
+
+    def test_range_buckets_round_trip_through_filters(self):
+        data = self.facets()
+        for facet, bounds in (
+            ("cost", ("min_cost", "max_cost")),
+            ("hours", ("min_hours", "max_hours")),
+        ):
+            for bucket in data[facet]:
+                params = {
+                    param: bucket[param]
+                    for param in bounds
+                    if bucket[param] is not None
+                }
+                response = self.client.get(
+                    reverse("search_result"), dict(params, format="json")
+                )
+                self.assertEqual(
+                    response.json()["count"], bucket["count"], bucket["label"]
+                )
+
+    def test_facets_follow_filters(self):
+        data = self.facets(keywords="nursing", min_cost="1")
+        self.assertEqual(data["count"], 1)
+        self.assertEqual(self.counts(data["borough"]), {"Bronx": 1})
+        self.assertEqual(self.counts(data["provider"], "name"), {"Facet Provider": 1})
+
+        self.assertEqual(self.facets(min_rating="3")["count"], 1)
+
+    def test_facets_are_one_query_and_cached(self):
+        # Matching IDs, then the grouped counts
+        with self.assertNumQueries(2):
+            self.facets(keywords="nursing")
+        with self.assertNumQueries(0):
+            self.facets(keywords="Nursing ")
+
+        # Unfiltered: the grouped counts alone
+        with self.assertNumQueries(1):
+            self.facets()
+
+    def test_catalog_changes_invalidate_facets(self):
+        self.assertEqual(self.facets(max_cost="1000")["count"], 2)
+        self.pricey.cost = 100
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pricey.save()
+        self.assertEqual(self.facets(max_cost="1000")["count"], 3)
+
+
+class CourseApiTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.provider = Provider.objects.create(
+            name="Api Provider", phone_num="1234567890", address="1 Main St"
+        )
+        for i in range(3):
+            Course.objects.create(
+                name=f"Nursing {i}",
+                provider=self.provider,
+                cost=100 * i,
+                classroom_hours=10,
+                location="NYC",
+            )
+        self.welding = Course.objects.create(
+            name="Welding", provider=self.provider, cost=900, location="NYC"
+        )
+
+    def get(self, **params):
+        return self.client.get(reverse("course_api"), params)
+
+    def test_default_fields(self):
+        response = self.get(sort="cost", order="asc")
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["count"], 4)
+        self.assertEqual(
+            data["results"][0],
+            {
+                "course_id": Course.objects.get(name="Nursing 0").pk,
+                "name": "Nursing 0",
+                "provider": {"provider_id": self.provider.pk, "name": "Api Provider"},
+                "cost": 0,
+                "location": "NYC",
+                "total_hours": 10,
+                "avg_rating": None,
+                "reviews_count": 0,
+                "url": reverse(
+                    "course_detail", args=[Course.objects.get(name="Nursing 0").pk]
+                ),
+            },
+        )
+
+    def test_sparse_fieldsets_load_only_those_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            data = self.get(fields="name,cost", sort="name").json()
+        self.assertEqual(data["results"][0], {"name": "Nursing 0", "cost": 0})
+        page_query = queries.captured_queries[-1]["sql"]
+        self.assertNotIn("course_desc", page_query)
+        self.assertNotIn("users_provider", page_query)
+
+        response = self.get(fields="name,secret")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"error": "Unknown fields: secret"})
+
+    def test_blank_field_names_are_ignored(self):
+        data = self.get(fields=" name , ,cost, name", sort="name").json()
+        self.assertEqual(data["results"][0], {"name": "Nursing 0", "cost": 0})
+
+        data = self.get(fields=" , ").json()
+        self.assertIn("provider", data["results"][0])
+
+    def test_filters_and_cursor_pagination(self):
+        params = {"keywords": "nursing", "sort": "cost", "order": "desc"}
+        first = self.get(per_page=10, **params).json()
+        self.assertEqual(
+            [course["name"] for course in first["results"]],
+            ["Nursing 2", "Nursing 1", "Nursing 0"],
+        )
+
+        Course.objects.bulk_create(
+            [
+                Course(name=f"Extra Nursing {i}", provider=self.provider, cost=i)
+                for i in range(10)
+            ]
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_results_version()
+        first = self.get(per_page=10, **params).json()
+        self.assertEqual(first["count"], 13)
+        self.assertTrue(first["has_next"])
+        second = self.get(per_page=10, cursor=first["next_cursor"], **params).json()
+        self.assertEqual(len(second["results"]), 3)
+        self.assertFalse(second["has_next"])
+
+    def test_conditional_get(self):
+        response = self.client.get(reverse("course_api") + "?min_cost=100&sort=cost")
+        etag = response["ETag"]
+        self.assertTrue(etag.startswith('"'))
+        self.assertIn("Last-Modified", response)
+        self.assertIn("public", response["Cache-Control"])
+
+        # Parameter order doesn't matter
+        response = self.client.get(
+            reverse("course_api") + "?sort=cost&min_cost=100", HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 304)
+
+        response = self.get(min_cost="200")
+        self.assertNotEqual(response["ETag"], etag)
+
+        self.welding.cost = 150
+        with self.captureOnCommitCallbacks(execute=True):
+            self.welding.save()
+        response = self.client.get(
+            reverse("course_api"),
+            {"min_cost": "100", "sort": "cost"},
+            HTTP_IF_NONE_MATCH=etag,
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["count"], 3)
+
+    def test_geocoding_changes_the_etag(self):
+        url = reverse("course_api")
+        params = {"fields": "course_id,latitude"}
+        response = self.client.get(url, params)
+        self.assertIsNone(response.json()["results"][0]["latitude"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            geocode_pending(geocoder=StubGeocoder({"NYC": (40.7, -74.0)}))
+
+        response = self.client.get(url, params, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["results"][0]["latitude"], 40.7)
+
+    def test_read_only(self):
+        response = self.client.post(reverse("course_api"))
+        self.assertEqual(response.status_code, 405)
+
+
+class CatalogConditionalGetTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.provider = Provider.objects.create(
+            name="Etag Provider", phone_num="1234567890", address="1 Main St"
+        )
+        self.course = Course.objects.create(
+            name="Etag Course", provider=self.provider, location="NYC"
+        )
+        self.user = get_user_model().objects.create_user(
+            username="student", password="testpassword", role="career_changer"
+        )
+
+    def revalidate(self, url, response, **params):
+        """Status of a repeat request carrying ``response``'s validators."""
+        return self.client.get(
+            url, params, HTTP_IF_NONE_MATCH=response["ETag"]
+        ).status_code
+
+    def test_anonymous_list_revalidates_but_stays_private(self):
+        url = reverse("course_list")
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        # The bookmark form carries this browser's CSRF token
+        self.assertContains(response, "csrfmiddlewaretoken")
+        self.assertIn("private", response["Cache-Control"])
+        self.assertNotIn("public", response["Cache-Control"])
+        self.assertNotIn("Last-Modified", response)
+        self.assertIn("Cookie", response["Vary"])
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.revalidate(url, response), 304)
+        not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertNotIn("public", not_modified["Cache-Control"])
+
+        # Another page of results is another document
+        self.assertEqual(self.revalidate(url, response, sort="name"), 200)
+
+        self.course.cost = 10
+        with self.captureOnCommitCallbacks(execute=True):
+            self.course.save()
+        self.assertEqual(self.revalidate(url, response), 200)
+
+    def test_anonymous_map_is_public(self):
+        url = reverse("course_map")
+        response = self.client.get(url)
+        self.assertIn("public", response["Cache-Control"])
+        self.assertIn("max-age=60", response["Cache-Control"])
+        self.assertIn("Cookie", response["Vary"])
+        self.assertIn("Last-Modified", response)
+
+        not_modified = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+        )
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_anonymous_comparison_tray_is_part_of_the_etag(self):
+        url = reverse("course_map")
+        response = self.client.get(url)
+        self.assertEqual(self.revalidate(url, response), 304)
+
+        # Anonymous visitors fill the tray from the comparison page
+        self.client.get(reverse("course_comparison"), {"course_ids": self.course.pk})
+        self.assertEqual(self.revalidate(url, response), 200)
+
+        response = self.client.get(url)
+        self.assertIn("private", response["Cache-Control"])
+        self.assertEqual(self.revalidate(url, response), 304)
+
+    def test_signed_in_pages_are_private_and_per_user(self):
+        url = reverse("course_list")
+        anonymous = self.client.get(url)
+        self.client.login(username="student", password="testpassword")
+
+        response = self.client.get(url)
+        self.assertIn("private", response["Cache-Control"])
+        self.assertNotIn("Last-Modified", response)
+        self.assertNotEqual(response["ETag"], anonymous["ETag"])
+        self.assertEqual(self.revalidate(url, response), 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            BookmarkList.objects.create(user=self.user, name="Favorites")
+        self.assertEqual(self.revalidate(url, response), 200)
+
+    def test_course_detail_follows_reviews_and_replies(self):
+        self.client.login(username="student", password="testpassword")
+        url = reverse("course_detail", args=[self.course.pk])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.revalidate(url, response), 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            review = Review.objects.create(
+                user=self.user, course=self.course, score_rating=5, content="Great"
+            )
+        response = self.client.get(url)
+        self.assertEqual(self.revalidate(url, response), 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ReviewReply.objects.create(user=self.user, review=review, content="Thanks")
+        self.assertEqual(self.revalidate(url, response), 200)
+
+        # Other courses' changes don't matter
+        response = self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Course.objects.create(name="Other", provider=self.provider, location="NYC")
+        self.assertEqual(self.revalidate(url, response), 304)
+
+    def test_course_detail_still_requires_login(self):
+        url = reverse("course_detail", args=[self.course.pk])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 302)
+        self.assertNotIn("ETag", response)
+
+    def test_course_map(self):
+        url = reverse("course_map")
+        response = self.client.get(url)
+        self.assertEqual(self.revalidate(url, response), 304)
+
+        self.provider.name = "Renamed Provider"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.provider.save()
+        self.assertEqual(self.revalidate(url, response), 200)
 
 
 class PostNewCourseTest(TestCase):
@@ -1092,6 +2419,48 @@ class ManageCourseTest(TestCase):
         other_course.refresh_from_db()
         self.assertEqual(other_course.name, "Other Course")
 
+    def test_edit_course_rename_onto_existing_name(self):
+        """Renaming onto another of the provider's course names is refused"""
+        response = self.client.post(
+            reverse("edit_course", kwargs={"course_id": self.course1.pk}),
+            {"name": self.course2.name},
+        )
+
+        self.assertRedirects(response, reverse("manage_courses"))
+        self.course1.refresh_from_db()
+        self.assertNotEqual(self.course1.name, self.course2.name)
+        messages = list(get_messages(response.wsgi_request))
+        self.assertEqual(
+            str(messages[0]), f"You already have a course named '{self.course2.name}'."
+        )
+
+    def test_post_new_course_duplicate_name(self):
+        """Posting a course under a name the provider already uses is refused"""
+        response = self.client.post(
+            reverse("new_course"),
+            {
+                "name": self.course1.name,
+                "course_desc": "Again",
+                "cost": 150,
+                "classroom_hours": 12,
+                "lab_hours": 8,
+                "internship_hours": 4,
+                "practical_hours": 6,
+            },
+        )
+
+        self.assertRedirects(response, reverse("manage_courses"))
+        self.assertEqual(
+            Course.objects.filter(
+                provider=self.provider, name=self.course1.name
+            ).count(),
+            1,
+        )
+        messages = list(get_messages(response.wsgi_request))
+        self.assertEqual(
+            str(messages[0]), f"You already have a course named '{self.course1.name}'."
+        )
+
 
 def add_session_to_request(request):
     """Helper function to add session to request"""
@@ -1170,6 +2539,18 @@ class CourseFormTests(TestCase):
 
         # In the view, this empty location would trigger using the provider's address
 
+    def test_duplicate_name_for_provider(self):
+        """A provider can't reuse one of its course names"""
+        Course.objects.create(provider=self.provider, name="Test Course")
+
+        form = CourseForm(data=self.valid_data, provider=self.provider)
+        self.assertFalse(form.is_valid())
+        self.assertTrue(form.has_error("name", code="duplicate"))
+
+        # Other providers may use the name
+        other = Provider.objects.create(name="Other Provider", address="1 Main St")
+        self.assertTrue(CourseForm(data=self.valid_data, provider=other).is_valid())
+
     def test_form_save_with_provider(self):
         """Test saving form with provider instance"""
         # This test is a bit tricky because CourseForm doesn't actually use the provider
@@ -1521,3 +2902,52 @@ class CourseComparisonTests(TestCase):
         # The current implementation may not return 400 status code for missing course_id
         # So we just check that we get a response
         self.assertTrue(response.status_code in [200, 400])
+
+
+class DedupeCoursesCommandTest(TransactionTestCase):
+    """dedupe_courses runs before the unique constraint exists"""
+
+    def setUp(self):
+        # Take the constraint off the model as well as the table, as a
+        # migration's model state would (SQLite rebuilds the table from it)
+        self.constraints = Course._meta.constraints
+        self.constraint = next(
+            constraint
+            for constraint in self.constraints
+            if constraint.name == "unique_course_per_provider"
+        )
+        Course._meta.constraints = [
+            constraint
+            for constraint in self.constraints
+            if constraint is not self.constraint
+        ]
+        with connection.schema_editor() as editor:
+            editor.remove_constraint(Course, self.constraint)
+
+    def tearDown(self):
+        # Leftover duplicates from a failed test would block the constraint
+        Course.objects.all().delete()
+        Course._meta.constraints = self.constraints
+        with connection.schema_editor() as editor:
+            editor.add_constraint(Course, self.constraint)
+
+    def test_renames_all_but_the_oldest_copy(self):
+        provider = Provider.objects.create(name="Provider", address="1 Main St")
+        other = Provider.objects.create(name="Other", address="2 Main St")
+        keep = Course.objects.create(provider=provider, name="Welding")
+        copies = [
+            Course.objects.create(provider=provider, name="Welding") for _ in range(2)
+        ]
+        elsewhere = Course.objects.create(provider=other, name="Welding")
+
+        out = StringIO()
+        call_command("dedupe_courses", "--dry-run", stdout=out)
+        self.assertIn("Would rename 2 duplicate courses", out.getvalue())
+        self.assertEqual(Course.objects.filter(name="Welding").count(), 4)
+
+        call_command("dedupe_courses", stdout=StringIO())
+
+        self.assertEqual(set(Course.objects.filter(name="Welding")), {keep, elsewhere})
+        for copy in copies:
+            copy.refresh_from_db()
+            self.assertEqual(copy.name, f"Welding (#{copy.pk})")
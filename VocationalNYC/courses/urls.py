@@ -5,7 +5,10 @@ urlpatterns = [
     path("", views.CourseListView.as_view(), name="course_list"),
     path("<int:pk>/", views.CourseDetailView.as_view(), name="course_detail"),
     path("search_result/", views.search_result, name="search_result"),
+    path("facets/", views.course_facets, name="course_facets"),
+    path("api/", views.course_api, name="course_api"),
     path("course_map/", views.course_map, name="course_map"),
+    path("course_map/points/", views.course_map_points, name="course_map_points"),
     path("sort/", views.sort_by, name="course_sort"),
     path("manage_courses/", views.manage_courses, name="manage_courses"),
     path("new_course/", views.post_new_course, name="new_course"),
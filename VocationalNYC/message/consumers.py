@@ -2,20 +2,24 @@ import json
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from .models import Chat, Message
-from django.contrib.auth import get_user_model
+from .views import get_display_name
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
-from django.utils import timezone
-
-User = get_user_model()
 
 
 class ChatConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         self.chat_hash = self.scope["url_route"]["kwargs"]["chat_hash"]
         self.room_group_name = f"chat_{self.chat_hash}"
-        await self.accept()
+
+        # Only the chat's participants may join, and they always send as
+        # themselves; everything a message needs is looked up once, here
+        if not await self.join_chat(self.scope["user"]):
+            await self.close()
+            return
+
         await self.channel_layer.group_add(self.room_group_name, self.channel_name)
+        await self.accept()
 
     async def disconnect(self, close_code):
         await self.channel_layer.group_discard(self.room_group_name, self.channel_name)
@@ -24,17 +28,16 @@ class ChatConsumer(AsyncWebsocketConsumer):
         try:
             data = json.loads(text_data)
             message_content = data.get("message", "")
-            sender_username = data.get("sender", "")
-            if not message_content or not sender_username:
+            if not message_content:
                 return
 
-            message_id = await self.save_message(message_content, sender_username)
+            message_id = await self.save_message(message_content)
             await self.channel_layer.group_send(
                 self.room_group_name,
                 {
                     "type": "chat_message",
                     "message": message_content,
-                    "sender": sender_username,
+                    "sender": self.sender.username,
                     "message_id": message_id,
                 },
             )
@@ -42,43 +45,57 @@ class ChatConsumer(AsyncWebsocketConsumer):
             await self.send(text_data=json.dumps({"error": f"Server error: {str(e)}"}))
 
     @database_sync_to_async
-    def save_message(self, message_content, sender_username):
-        try:
-            chat = Chat.objects.get(chat_hash=self.chat_hash)
-            sender = User.objects.get(username=sender_username)
-            recipient = chat.user2 if sender == chat.user1 else chat.user1
-
-            message = Message.objects.create(
-                chat=chat, sender=sender, recipient=recipient, content=message_content
+    def join_chat(self, user):
+        if not user.is_authenticated:
+            return False
+        chat = (
+            Chat.objects.select_related(
+                "user1__provider_profile", "user2__provider_profile"
             )
+            .filter(chat_hash=self.chat_hash)
+            .first()
+        )
+        if chat is None or user.pk not in (chat.user1_id, chat.user2_id):
+            return False
 
-            channel_layer = get_channel_layer()
-            timestamp = timezone.now().isoformat()
-
-            for user in [chat.user1, chat.user2]:
-                async_to_sync(channel_layer.group_send)(
-                    f"user_{user.id}_chat_list",
-                    {
-                        "type": "chat_list_update",
-                        "data": {
-                            "chat_hash": chat.chat_hash,
-                            "timestamp": timestamp,
-                            "last_message": message.content,
-                            "sender_username": sender.username,
-                            "sender_full_name": sender.get_full_name(),
-                            "sender_role": sender.role,
-                            "sender_display_name": (
-                                sender.provider_profile.name
-                                if sender.role == "training_provider"
-                                and hasattr(sender, "provider_profile")
-                                else sender.username
-                            ),
-                        },
+        self.chat = chat
+        if user.pk == chat.user1_id:
+            self.sender, self.recipient = chat.user1, chat.user2
+        else:
+            self.sender, self.recipient = chat.user2, chat.user1
+        self.sender_details = {
+            "sender_username": self.sender.username,
+            "sender_full_name": self.sender.get_full_name(),
+            "sender_role": self.sender.role,
+            "sender_display_name": get_display_name(self.sender),
+        }
+        return True
+
+    @database_sync_to_async
+    def save_message(self, message_content):
+        message = Message.objects.create(
+            chat=self.chat,
+            sender=self.sender,
+            recipient=self.recipient,
+            content=message_content,
+        )
+
+        channel_layer = get_channel_layer()
+        timestamp = message.send_time.isoformat()
+
+        for user in [self.chat.user1, self.chat.user2]:
+            async_to_sync(channel_layer.group_send)(
+                f"user_{user.id}_chat_list",
+                {
+                    "type": "chat_list_update",
+                    "data": {
+                        "chat_hash": self.chat_hash,
+                        "timestamp": timestamp,
+                        "last_message": message.content,
+                        **self.sender_details,
                     },
-                )
-        except Exception as e:
-            print(f"Database error: {str(e)}")
-            raise
+                },
+            )
 
         return message.pk
 
@@ -0,0 +1,75 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from message.models import Chat, HiddenMessage, MessageVisibility
+
+
+def cleared_prefix(message_ids, hidden):
+    """
+    The id of the last message in the run of hidden ones that opens the
+    chat (``message_ids`` in order), or 0 if the first one is visible.
+    """
+    watermark = 0
+    for message_id in message_ids:
+        if message_id not in hidden:
+            break
+        watermark = message_id
+    return watermark
+
+
+class Command(BaseCommand):
+    help = (
+        "Carry hidden messages over from the legacy MessageVisibility rows: "
+        "each participant's cleared prefix becomes their watermark and other "
+        "hidden messages become HiddenMessage rows. Run after migrate."
+    )
+
+    def handle(self, *args, **options):
+        chats = (
+            Chat.objects.filter(messages__visibilities__is_visible=False)
+            .select_related("user1", "user2")
+            .distinct()
+        )
+        converted = hidden_rows = 0
+        for chat in chats.iterator():
+            with transaction.atomic():
+                hidden_rows += self.convert(chat)
+            converted += 1
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Converted {converted} chats ({hidden_rows} hidden messages)"
+            )
+        )
+
+    def convert(self, chat):
+        message_ids = list(chat.messages.order_by("id").values_list("id", flat=True))
+        hidden = {}
+        for user_id, message_id in MessageVisibility.objects.filter(
+            message__chat=chat, is_visible=False
+        ).values_list("user_id", "message_id"):
+            hidden.setdefault(user_id, set()).add(message_id)
+
+        rows, count = [], 0
+        for user in (chat.user1, chat.user2):
+            field = chat.cleared_field(user)
+            user_hidden = hidden.get(user.pk, set())
+            count += len(user_hidden)
+            # Never un-clear anything cleared since the upgrade
+            watermark = max(
+                getattr(chat, field), cleared_prefix(message_ids, user_hidden)
+            )
+            setattr(chat, field, watermark)
+            rows.extend(
+                HiddenMessage(user=user, message_id=message_id)
+                for message_id in sorted(user_hidden)
+                if message_id > watermark
+            )
+
+        Chat.objects.filter(pk=chat.pk).update(
+            user1_cleared_up_to=chat.user1_cleared_up_to,
+            user2_cleared_up_to=chat.user2_cleared_up_to,
+        )
+        HiddenMessage.objects.bulk_create(rows, ignore_conflicts=True)
+        chat.refresh_summary(chat.user1)
+        chat.refresh_summary(chat.user2)
+        return count
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from message.models import Chat
+
+
+class Command(BaseCommand):
+    help = "Recompute every chat's inbox summaries and unread counts"
+
+    def handle(self, *args, **options):
+        rebuilt = 0
+        for chat in Chat.objects.select_related("user1", "user2").iterator():
+            chat.refresh_summary(chat.user1)
+            chat.refresh_summary(chat.user2)
+            rebuilt += 1
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt inbox summaries for {rebuilt} chats")
+        )
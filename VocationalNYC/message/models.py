@@ -1,4 +1,6 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, Exists, F, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce, Greatest
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 import hashlib
@@ -7,14 +9,79 @@ from django.core.exceptions import ValidationError
 User = get_user_model()
 
 
+def _summary(participant, message):
+    """Column values making ``message`` the latest in ``participant``'s inbox."""
+    return {
+        f"{participant}_last_message": message,
+        f"{participant}_last_message_at": message.send_time if message else None,
+        f"{participant}_last_preview": message.content[:200] if message else "",
+    }
+
+
+class ChatQuerySet(models.QuerySet):
+    def inbox(self, user):
+        """
+        ``user``'s chats, latest first, annotated with their side of the
+        summary (``last_time``, ``last_message``, ``unread``) and with both
+        participants and their provider profiles loaded.
+        """
+
+        def mine(column):
+            return Case(
+                When(user1=user, then=F(f"user1_{column}")),
+                default=F(f"user2_{column}"),
+            )
+
+        return (
+            self.filter(Q(user1=user) | Q(user2=user))
+            .select_related("user1__provider_profile", "user2__provider_profile")
+            .annotate(
+                last_time=mine("last_message_at"),
+                last_message=mine("last_preview"),
+                unread=mine("unread"),
+            )
+            .order_by(F("last_time").desc(nulls_last=True), "-id")
+        )
+
+
 class Chat(models.Model):
     user1 = models.ForeignKey(User, on_delete=models.CASCADE, related_name="chat_user1")
     user2 = models.ForeignKey(User, on_delete=models.CASCADE, related_name="chat_user2")
     created_at = models.DateTimeField(auto_now_add=True)
     chat_hash = models.CharField(max_length=64, unique=True, blank=True)
+    # Id of the last message each participant cleared; only later messages
+    # are shown to them (see Chat.visible_messages)
+    user1_cleared_up_to = models.BigIntegerField(default=0)
+    user2_cleared_up_to = models.BigIntegerField(default=0)
+    # Each participant's inbox entry: their latest visible message and how
+    # many messages they haven't read, kept up to date as messages are sent,
+    # read, cleared and deleted. ``manage.py rebuild_chat_summaries``
+    # recomputes them.
+    user1_last_message = models.ForeignKey(
+        "Message", null=True, blank=True, on_delete=models.SET_NULL, related_name="+"
+    )
+    user1_last_message_at = models.DateTimeField(null=True, blank=True)
+    user1_last_preview = models.CharField(max_length=200, blank=True, default="")
+    user1_unread = models.PositiveIntegerField(default=0)
+    user2_last_message = models.ForeignKey(
+        "Message", null=True, blank=True, on_delete=models.SET_NULL, related_name="+"
+    )
+    user2_last_message_at = models.DateTimeField(null=True, blank=True)
+    user2_last_preview = models.CharField(max_length=200, blank=True, default="")
+    user2_unread = models.PositiveIntegerField(default=0)
+
+    objects = ChatQuerySet.as_manager()
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(
+                fields=["user1", "user1_last_message_at"], name="chat_user1_inbox_idx"
+            ),
+            models.Index(
+                fields=["user2", "user2_last_message_at"], name="chat_user2_inbox_idx"
+            ),
+        ]
 
     def clean(self):
         if self.user1 == self.user2:
@@ -32,10 +99,112 @@ class Chat(models.Model):
 
         super().save(*args, **kwargs)
 
+    def participant(self, user):
+        """``"user1"`` or ``"user2"``, the prefix of ``user``'s columns."""
+        return "user1" if user.pk == self.user1_id else "user2"
+
+    def cleared_field(self, user):
+        """The ``cleared_up_to`` column of participant ``user``."""
+        return f"{self.participant(user)}_cleared_up_to"
+
+    def visible_messages(self, user):
+        """
+        The messages ``user`` hasn't cleared or deleted, going by the
+        watermark loaded on this instance.
+        """
+        return self.messages.filter(
+            id__gt=getattr(self, self.cleared_field(user))
+        ).not_hidden_from(user)
+
+    def clear_for(self, user):
+        """Hide every message sent so far from ``user``, in one UPDATE."""
+        last_id = (
+            Message.objects.filter(chat=OuterRef("pk")).order_by("-id").values("id")[:1]
+        )
+        Chat.objects.filter(pk=self.pk).update(
+            **{
+                self.cleared_field(user): Coalesce(Subquery(last_id), Value(0)),
+                f"{self.participant(user)}_unread": 0,
+            },
+            **_summary(self.participant(user), None),
+        )
+
+    def hide_for(self, user, message):
+        """Hide one ``message`` from ``user`` and take it off their inbox entry."""
+        _, created = HiddenMessage.objects.get_or_create(user=user, message=message)
+        participant = self.participant(user)
+        if not created or message.id <= getattr(self, self.cleared_field(user)):
+            return
+        if getattr(self, f"{participant}_last_message_id") == message.id:
+            # Step back to the message before it
+            self.refresh_summary(user)
+        elif message.recipient_id == user.pk and message.read_time is None:
+            unread = f"{participant}_unread"
+            Chat.objects.filter(pk=self.pk).update(
+                **{unread: Greatest(F(unread) - 1, Value(0))}
+            )
+
+    def record_message(self, message):
+        """Make a new ``message`` both participants' latest, in one UPDATE."""
+        recipient = "user1" if message.recipient_id == self.user1_id else "user2"
+        unread = f"{recipient}_unread"
+        Chat.objects.filter(pk=self.pk).update(
+            **_summary("user1", message),
+            **_summary("user2", message),
+            **{unread: F(unread) + 1},
+        )
+
+    def refresh_summary(self, user):
+        """Recompute ``user``'s inbox entry from their visible messages."""
+        messages = self.visible_messages(user)
+        last = messages.order_by("-send_time", "-id").first()
+        unread = messages.filter(recipient=user, read_time__isnull=True).count()
+        participant = self.participant(user)
+        Chat.objects.filter(pk=self.pk).update(
+            **_summary(participant, last), **{f"{participant}_unread": unread}
+        )
+
+    def mark_read(self, user):
+        """Mark the messages sent to ``user`` read, if any are unread."""
+        unread = f"{self.participant(user)}_unread"
+        if not getattr(self, unread):
+            return
+        with transaction.atomic():
+            # Only the messages the counter covers; subtracting what was
+            # marked (rather than zeroing) keeps messages that arrive
+            # meanwhile counted
+            read = (
+                self.visible_messages(user)
+                .filter(recipient=user, read_time__isnull=True)
+                .update(read_time=timezone.now())
+            )
+            if read:
+                Chat.objects.filter(pk=self.pk).update(
+                    **{unread: Greatest(F(unread) - read, Value(0))}
+                )
+        setattr(self, unread, max(getattr(self, unread) - read, 0))
+
     def __str__(self):
         return f"Chat between {self.user1.username} and {self.user2.username}"
 
 
+class MessageQuerySet(models.QuerySet):
+    def not_hidden_from(self, user):
+        hidden = HiddenMessage.objects.filter(user=user, message=OuterRef("pk"))
+        return self.filter(~Exists(hidden))
+
+    def visible_to(self, user):
+        """
+        Messages in ``user``'s chats that ``user`` hasn't cleared or deleted,
+        for queries spanning several chats (``Chat.visible_messages`` covers
+        a single one).
+        """
+        return self.filter(
+            Q(chat__user1=user, id__gt=F("chat__user1_cleared_up_to"))
+            | Q(chat__user2=user, id__gt=F("chat__user2_cleared_up_to"))
+        ).not_hidden_from(user)
+
+
 class Message(models.Model):
     chat = models.ForeignKey(Chat, on_delete=models.CASCADE, related_name="messages")
     sender = models.ForeignKey(
@@ -48,40 +217,74 @@ class Message(models.Model):
     send_time = models.DateTimeField(null=True, blank=True)
     read_time = models.DateTimeField(null=True, blank=True)
 
+    objects = MessageQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["chat", "id"], name="message_chat_id_idx"),
+            # History pages (message.pagination) and inbox previews
+            models.Index(
+                fields=["chat", "send_time", "id"], name="message_chat_sent_idx"
+            ),
+        ]
+
     def clean(self):
-        if self.sender == self.recipient:
+        if self.sender_id == self.recipient_id:
             raise ValidationError("Sender and recipient cannot be the same.")
 
-        if self.sender not in [
-            self.chat.user1,
-            self.chat.user2,
-        ] or self.recipient not in [self.chat.user1, self.chat.user2]:
+        # Compare ids so validating doesn't load the participants
+        participants = {self.chat.user1_id, self.chat.user2_id}
+        if self.sender_id not in participants or self.recipient_id not in participants:
             raise ValidationError(
                 "Both sender and recipient must be participants of this chat."
             )
 
     def save(self, *args, **kwargs):
         is_new = self.pk is None
-        self.full_clean()
+        # clean() checks the participants; the database enforces the foreign
+        # keys, so skip looking each one up again
+        self.full_clean(exclude=["chat", "sender", "recipient"])
 
         if is_new and not self.send_time:
             self.send_time = timezone.now()
 
-        super().save(*args, **kwargs)
+        if not is_new:
+            super().save(*args, **kwargs)
+            return
 
-        if is_new:
-            for user in (self.sender, self.recipient):
-                MessageVisibility.objects.get_or_create(
-                    user=user,
-                    message=self,
-                    defaults={"is_visible": True},
-                )
+        # The chat's inbox summary moves with the message
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self.chat.record_message(self)
 
     def __str__(self):
         return f"Message {self.pk} from {self.sender.username} in Chat {self.chat.pk}"
 
 
+class HiddenMessage(models.Model):
+    """
+    A message one participant deleted on its own. Clearing a whole chat
+    moves the participant's watermark on ``Chat`` instead, so only these
+    individual deletions need a row.
+    """
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    message = models.ForeignKey(
+        Message, on_delete=models.CASCADE, related_name="hidden_by"
+    )
+
+    class Meta:
+        unique_together = ("user", "message")
+
+
 class MessageVisibility(models.Model):
+    """
+    Legacy per-message, per-participant visibility, replaced by the
+    ``cleared_up_to`` watermarks and ``HiddenMessage``. Nothing writes it
+    any more; ``manage.py convert_message_visibility`` carries its hidden
+    rows over. Remove the model once every database has been converted.
+    """
+
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     message = models.ForeignKey(
         Message, on_delete=models.CASCADE, related_name="visibilities"
@@ -0,0 +1,70 @@
+"""
+Keyset pagination of a conversation's history.
+
+``chat_detail`` inlines the latest ``MESSAGES_PER_PAGE`` messages and the
+page fetches older ones from ``chat_history`` as the visitor scrolls up.
+Pages walk back from a ``(send_time, id)`` cursor along the
+``(chat, send_time, id)`` index, so each one is a short index scan however
+long the conversation has run.
+"""
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from courses.pagination import decode_cursor, encode_cursor
+
+MESSAGES_PER_PAGE = 30
+
+# Cursors name the ordering they belong to (see courses.pagination)
+CURSOR_SORT = ("send_time", "desc")
+
+
+class MessagePage:
+    def __init__(self, messages, before):
+        # Oldest first, the order they are shown in
+        self.messages = messages
+        self.before = before
+
+    @property
+    def has_older(self):
+        return self.before is not None
+
+
+def _decode_position(cursor):
+    position = decode_cursor(cursor, *CURSOR_SORT)
+    if position is None:
+        return None
+    send_time, message_id = position
+    if not isinstance(send_time, str):
+        return None
+    try:
+        send_time = parse_datetime(send_time)
+    except ValueError:
+        # Well formed but not a real date, e.g. month 13
+        return None
+    if send_time is None:
+        return None
+    return send_time, message_id
+
+
+def paginate_messages(messages, before=None, per_page=MESSAGES_PER_PAGE):
+    """
+    The ``per_page`` latest of ``messages`` sent before the ``before``
+    cursor (the latest overall without one), as a ``MessagePage``.
+    """
+    position = _decode_position(before)
+    if position is not None:
+        send_time, message_id = position
+        messages = messages.filter(
+            Q(send_time__lt=send_time) | Q(send_time=send_time, id__lt=message_id)
+        )
+
+    # One extra row tells whether older messages remain
+    rows = list(messages.order_by("-send_time", "-id")[: per_page + 1])
+    cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        oldest = rows[-1]
+        cursor = encode_cursor(*CURSOR_SORT, oldest.send_time.isoformat(), oldest.id)
+    rows.reverse()
+    return MessagePage(rows, cursor)
@@ -1,15 +1,29 @@
 import hashlib
-from django.test import TestCase, Client
+from io import StringIO
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.test import Client, TestCase, TransactionTestCase, override_settings
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+from django.test.utils import CaptureQueriesContext
+from channels.db import database_sync_to_async
 from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.models import AnonymousUser
 from asgiref.sync import async_to_sync
-from .models import Chat, Message, MessageVisibility
+from .consumers import ChatConsumer
+from .models import Chat, HiddenMessage, Message, MessageVisibility
+from .routing import websocket_urlpatterns
 from users.models import Provider
 from django.utils import timezone
-from unittest.mock import patch, Mock, MagicMock
-from message.views import create_message_with_visibility
+from unittest.mock import patch, Mock
+from courses.pagination import encode_cursor
+from message.pagination import CURSOR_SORT, MESSAGES_PER_PAGE, paginate_messages
+from message.views import create_message, get_visible_messages
 
 import socket
 
@@ -184,15 +198,15 @@ class ChatViewsTest(TestCase):
         form_mock.is_valid.return_value = True
         form_mock.cleaned_data = {"content": message_content}
 
-        # mock the MessageForm and create_message_with_visibility function
+        # mock the MessageForm and create_message function
         with patch("message.views.MessageForm", return_value=form_mock):
-            with patch("message.views.create_message_with_visibility") as mock_create:
+            with patch("message.views.create_message") as mock_create:
                 response = self.client.post(
                     reverse("chat_detail", kwargs={"chat_hash": self.chat.chat_hash}),
                     {"content": message_content},
                 )
 
-                # verify the create_message_with_visibility function was called
+                # verify the create_message function was called
                 mock_create.assert_called_once()
                 call_args = mock_create.call_args[0]
                 self.assertEqual(call_args[0], self.chat)
@@ -222,17 +236,19 @@ class ChatViewsTest(TestCase):
         # verify the message is still in the database
         self.assertTrue(Message.objects.filter(id=self.message1.id).exists())
 
-        # verify the message visibility is updated for the current user
-        visibility = MessageVisibility.objects.get(
-            user=self.user1, message=self.message1
+        # verify the message is hidden from the current user only
+        self.assertTrue(
+            HiddenMessage.objects.filter(
+                user=self.user1, message=self.message1
+            ).exists()
         )
-        self.assertFalse(visibility.is_visible)
-
-        # verify the message visibility is still visible for the other user
-        visibility = MessageVisibility.objects.get(
-            user=self.user2, message=self.message1
+        self.assertEqual(
+            list(get_visible_messages(self.chat, self.user1)), [self.message2]
+        )
+        self.assertEqual(
+            list(get_visible_messages(self.chat, self.user2)),
+            [self.message1, self.message2],
         )
-        self.assertTrue(visibility.is_visible)
 
     def test_delete_chat(self):
         """test deleting a chat"""
@@ -249,19 +265,10 @@ class ChatViewsTest(TestCase):
         # verify the chat is still the database
         self.assertTrue(Chat.objects.filter(chat_hash=self.chat.chat_hash).exists())
 
-        # verify the chat visibility is updated for the current user
-        visibilities = MessageVisibility.objects.filter(
-            user=self.user1, message__chat=self.chat
-        )
-        for visibility in visibilities:
-            self.assertFalse(visibility.is_visible)
-
-        # verify the chat visibility is still visible for the other user
-        visibilities = MessageVisibility.objects.filter(
-            user=self.user2, message__chat=self.chat
-        )
-        for visibility in visibilities:
-            self.assertTrue(visibility.is_visible)
+        # verify the messages are hidden from the current user only
+        self.chat.refresh_from_db()
+        self.assertFalse(get_visible_messages(self.chat, self.user1).exists())
+        self.assertEqual(get_visible_messages(self.chat, self.user2).count(), 2)
 
     def test_select_chat_partner_get(self):
         """test selecting a chat partner"""
@@ -344,7 +351,7 @@ class ChatViewsTest(TestCase):
         self.assertEqual(response.status_code, 403)  # should return forbidden
 
 
-class CreateMessageWithVisibilityTests(TestCase):
+class CreateMessageTests(TestCase):
     def setUp(self):
         # Create test users
         self.user1 = User.objects.create_user(username="user1", password="pass123")
@@ -353,117 +360,502 @@ class CreateMessageWithVisibilityTests(TestCase):
         # Create a test chat
         self.chat = Chat.objects.create(user1=self.user1, user2=self.user2)
 
-    @patch("message.views.Message.objects.create")
-    @patch("message.views.MessageVisibility.objects.create")
-    def test_create_message_with_visibility(
-        self, mock_visibility_create, mock_message_create
-    ):
-        """Test that create_message_with_visibility creates a message and visibility records"""
-        # setup mock for Message.objects.create
-        mock_message = MagicMock()
-        mock_message.chat = self.chat
-        mock_message.sender = self.user1
-        mock_message.recipient = self.user2
-        mock_message.content = "Test message"
-        mock_message_create.return_value = mock_message
-
+    def test_create_message(self):
+        """Test that create_message creates a message visible to both users"""
         before_call = timezone.now()
-        # call the function to test
-        create_message_with_visibility(
-            self.chat, self.user1, self.user2, "Test message"
-        )
+        message = create_message(self.chat, self.user1, self.user2, "Test message")
         after_call = timezone.now()
 
-        # verify Message.objects.create was called
-        mock_message_create.assert_called_once()
-        args, kwargs = mock_message_create.call_args
+        message.refresh_from_db()
+        self.assertEqual(message.chat, self.chat)
+        self.assertEqual(message.sender, self.user1)
+        self.assertEqual(message.recipient, self.user2)
+        self.assertEqual(message.content, "Test message")
+        self.assertTrue(before_call <= message.send_time <= after_call)
+
+        for user in (self.user1, self.user2):
+            self.assertEqual(list(get_visible_messages(self.chat, user)), [message])
+
+    def test_create_message_reverse_users(self):
+        """Test with user2 as sender and user1 as recipient"""
+        message = create_message(self.chat, self.user2, self.user1, "Reply message")
 
-        self.assertEqual(kwargs["chat"], self.chat)
-        self.assertEqual(kwargs["sender"], self.user1)
-        self.assertEqual(kwargs["recipient"], self.user2)
-        self.assertEqual(kwargs["content"], "Test message")
+        self.assertEqual(message.sender, self.user2)
+        self.assertEqual(message.recipient, self.user1)
 
-        # verify send_time is within the expected range
-        self.assertTrue(hasattr(kwargs["send_time"], "year"))
-        self.assertTrue(before_call <= kwargs["send_time"] <= after_call)
+    def test_message_count_after_create(self):
+        """test the message count after creating messages"""
+        create_message(self.chat, self.user1, self.user2, "Test message for counting")
+
+        self.assertEqual(Message.objects.filter(chat=self.chat).count(), 1)
 
-        # verify MessageVisibility.objects.create was called twice (once for each user)
-        self.assertEqual(mock_visibility_create.call_count, 2)
+    def test_create_message_queries(self):
+        """sending a message is an insert and a summary update"""
+        with self.assertNumQueries(4):
+            # SAVEPOINT, message INSERT, chat UPDATE, RELEASE
+            create_message(self.chat, self.user1, self.user2, "Test message")
 
-        # verify fjrst call (for sender)
-        mock_visibility_create.assert_any_call(
-            user=self.user1, message=mock_message, is_visible=True
+
+class ChatVisibilityTests(TestCase):
+    def setUp(self):
+        self.user1 = User.objects.create_user(username="user1", password="pass123")
+        self.user2 = User.objects.create_user(username="user2", password="pass123")
+        self.chat = Chat.objects.create(user1=self.user1, user2=self.user2)
+        self.old = [
+            create_message(self.chat, self.user1, self.user2, f"Old {i}")
+            for i in range(5)
+        ]
+
+    def test_clearing_is_one_update(self):
+        with self.assertNumQueries(1):
+            self.chat.clear_for(self.user2)
+        self.chat.refresh_from_db()
+        self.assertEqual(self.chat.user2_cleared_up_to, self.old[-1].pk)
+        self.assertEqual(self.chat.user1_cleared_up_to, 0)
+
+    def test_messages_after_clearing_are_visible(self):
+        self.chat.clear_for(self.user1)
+        self.chat.refresh_from_db()
+        new = create_message(self.chat, self.user2, self.user1, "New")
+
+        self.assertEqual(list(get_visible_messages(self.chat, self.user1)), [new])
+        self.assertEqual(
+            list(get_visible_messages(self.chat, self.user2)), self.old + [new]
         )
 
-        # verify second call (for recipient)
-        mock_visibility_create.assert_any_call(
-            user=self.user2, message=mock_message, is_visible=True
+    def test_clearing_an_empty_chat(self):
+        user3 = User.objects.create_user(username="user3", password="pass123")
+        chat = Chat.objects.create(user1=self.user1, user2=user3)
+        chat.clear_for(user3)
+        chat.refresh_from_db()
+        self.assertEqual(chat.user2_cleared_up_to, 0)
+        message = create_message(chat, self.user1, user3, "Hi")
+        self.assertEqual(list(get_visible_messages(chat, user3)), [message])
+
+    def test_visible_to_spans_chats(self):
+        user3 = User.objects.create_user(username="user3", password="pass123")
+        other_chat = Chat.objects.create(user1=self.user1, user2=user3)
+        other = create_message(other_chat, user3, self.user1, "Elsewhere")
+        HiddenMessage.objects.create(user=self.user1, message=self.old[0])
+        self.chat.clear_for(self.user2)
+
+        self.assertEqual(
+            set(Message.objects.visible_to(self.user1)),
+            set(self.old[1:]) | {other},
         )
+        self.assertEqual(set(Message.objects.visible_to(self.user2)), set())
+        self.assertEqual(set(Message.objects.visible_to(user3)), {other})
 
-    @patch("message.views.Message.objects.create")
-    @patch("message.views.MessageVisibility.objects.create")
-    def test_create_message_with_visibility_reverse_users(
-        self, mock_visibility_create, mock_message_create
-    ):
-        """Test with user2 as sender and user1 as recipient"""
-        # setup mock for Message.objects.create
-        mock_message = MagicMock()
-        mock_message.chat = self.chat
-        mock_message.sender = self.user2
-        mock_message.recipient = self.user1
-        mock_message.content = "Reply message"
-        mock_message_create.return_value = mock_message
+    def test_inbox_preview_skips_cleared_messages(self):
+        self.client.login(username="user1", password="pass123")
+        self.chat.clear_for(self.user1)
+        response = self.client.get(reverse("chat_home"))
+        chat = next(iter(response.context["chats"]))
+        self.assertFalse(chat.last_message)
 
-        before_call = timezone.now()
-        # call the function to test
-        create_message_with_visibility(
-            self.chat, self.user2, self.user1, "Reply message"
+        create_message(self.chat, self.user2, self.user1, "Fresh")
+        response = self.client.get(reverse("chat_home"))
+        chat = next(iter(response.context["chats"]))
+        self.assertEqual(chat.last_message, "Fresh")
+
+
+class ChatHistoryTests(TestCase):
+    def setUp(self):
+        self.user1 = User.objects.create_user(username="user1", password="pass123")
+        self.user2 = User.objects.create_user(username="user2", password="pass123")
+        self.chat = Chat.objects.create(user1=self.user1, user2=self.user2)
+        start = timezone.now() - timedelta(days=1)
+        self.messages = [
+            Message.objects.create(
+                chat=self.chat,
+                sender=self.user1 if i % 2 else self.user2,
+                recipient=self.user2 if i % 2 else self.user1,
+                content=f"Message {i}",
+                # pairs share a send time, so the id breaks ties
+                send_time=start + timedelta(minutes=i // 2),
+            )
+            for i in range(MESSAGES_PER_PAGE * 2 + 5)
+        ]
+        self.client.login(username="user1", password="pass123")
+        self.history_url = reverse("chat_history", args=[self.chat.chat_hash])
+
+    def test_chat_detail_inlines_latest_messages(self):
+        response = self.client.get(reverse("chat_detail", args=[self.chat.chat_hash]))
+
+        self.assertEqual(
+            list(response.context["messages"]), self.messages[-MESSAGES_PER_PAGE:]
+        )
+        self.assertTrue(response.context["message_page"].has_older)
+        self.assertContains(response, self.history_url)
+        self.assertNotContains(response, "Message 0<")
+
+    def test_history_pages_back_to_the_first_message(self):
+        page = paginate_messages(self.chat.visible_messages(self.user1))
+        seen = list(page.messages)
+        before = page.before
+        while before:
+            response = self.client.get(self.history_url, {"before": before})
+            data = response.json()
+            ids = [
+                int(part.split('"')[0])
+                for part in data["html"].split('data-message-id="')[1:]
+            ]
+            seen = list(Message.objects.filter(id__in=ids).order_by("id")) + seen
+            before = data["before"]
+            self.assertEqual(data["has_older"], before is not None)
+
+        self.assertEqual(seen, self.messages)
+
+    def test_history_query_count(self):
+        before = paginate_messages(self.chat.visible_messages(self.user1)).before
+        with self.assertNumQueries(4):
+            # session, user, chat, one page of messages
+            self.client.get(self.history_url, {"before": before})
+
+    def test_history_respects_cleared_messages(self):
+        self.chat.clear_for(self.user1)
+        create_message(self.chat, self.user2, self.user1, "After clearing")
+
+        data = self.client.get(self.history_url).json()
+        self.assertIn("After clearing", data["html"])
+        self.assertNotIn("Message 0", data["html"])
+        self.assertFalse(data["has_older"])
+
+    def test_bad_cursor_returns_latest_page(self):
+        latest = self.client.get(self.history_url).json()
+        self.assertEqual(
+            self.client.get(self.history_url, {"before": "!!"}).json()["before"],
+            latest["before"],
         )
-        after_call = timezone.now()
 
-        # verify Message.objects.create was called
-        mock_message_create.assert_called_once()
-        args, kwargs = mock_message_create.call_args
+        impossible = encode_cursor(*CURSOR_SORT, "2024-13-45T00:00:00", 1)
+        response = self.client.get(self.history_url, {"before": impossible})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["before"], latest["before"])
+
+    def test_send_times_are_shown_in_local_time(self):
+        message = self.messages[-1]
+        message.send_time = datetime(2031, 1, 15, 17, 30, tzinfo=dt_timezone.utc)
+        message.save()
 
-        self.assertEqual(kwargs["chat"], self.chat)
-        self.assertEqual(kwargs["sender"], self.user2)
-        self.assertEqual(kwargs["recipient"], self.user1)
-        self.assertEqual(kwargs["content"], "Reply message")
+        response = self.client.get(reverse("chat_detail", args=[self.chat.chat_hash]))
+        self.assertContains(response, "Wednesday, January 15, 2031 at 12:30:00 PM")
 
-        # verify send_time is within the expected range
-        self.assertTrue(hasattr(kwargs["send_time"], "year"))
-        self.assertTrue(before_call <= kwargs["send_time"] <= after_call)
+    def test_history_requires_participant(self):
+        User.objects.create_user(username="user3", password="pass123")
+        self.client.login(username="user3", password="pass123")
+        self.assertEqual(self.client.get(self.history_url).status_code, 403)
 
-        # verify MessageVisibility.objects.create was called twice (once for each user)
-        self.assertEqual(mock_visibility_create.call_count, 2)
+        self.client.logout()
+        self.assertEqual(self.client.get(self.history_url).status_code, 302)
 
-        # verify first call (for sender)
-        mock_visibility_create.assert_any_call(
-            user=self.user2, message=mock_message, is_visible=True
+
+class ChatSummaryTests(TestCase):
+    def setUp(self):
+        self.student = User.objects.create_user(
+            username="student", password="pass123", role="career_changer"
+        )
+        self.provider_user = User.objects.create_user(
+            username="provider", password="pass123", role="training_provider"
+        )
+        Provider.objects.create(
+            user=self.provider_user,
+            name="Test Provider",
+            phone_num="1234567890",
+            address="Test Address",
         )
+        self.chat = Chat.objects.create(user1=self.student, user2=self.provider_user)
 
-        # verify second call (for recipient)
-        mock_visibility_create.assert_any_call(
-            user=self.user1, message=mock_message, is_visible=True
+    def summary(self, user):
+        chat = Chat.objects.get(pk=self.chat.pk)
+        participant = chat.participant(user)
+        return (
+            getattr(chat, f"{participant}_last_message_id"),
+            getattr(chat, f"{participant}_last_preview"),
+            getattr(chat, f"{participant}_unread"),
         )
 
-    @patch("message.views.Message.objects.create")
-    @patch("message.views.MessageVisibility.objects.create")
-    def test_message_count_after_create(
-        self, mock_visibility_create, mock_message_create
-    ):
-        """test the message count after creating messages"""
-        # setup mock for Message.objects.create
-        mock_message = MagicMock()
-        mock_message_create.return_value = mock_message
+    def test_sending_updates_both_participants(self):
+        first = create_message(self.chat, self.student, self.provider_user, "Hi")
+        second = create_message(self.chat, self.student, self.provider_user, "Hello?")
+
+        self.assertEqual(self.summary(self.student), (second.pk, "Hello?", 0))
+        self.assertEqual(self.summary(self.provider_user), (second.pk, "Hello?", 2))
+        self.assertNotEqual(first.pk, second.pk)
+
+    def test_long_messages_are_previewed(self):
+        create_message(self.chat, self.student, self.provider_user, "x" * 500)
+        self.assertEqual(self.summary(self.student)[1], "x" * 200)
+
+    def test_opening_the_chat_reads_it(self):
+        message = create_message(self.chat, self.student, self.provider_user, "Hi")
+        self.client.login(username="provider", password="pass123")
+
+        response = self.client.get(reverse("chat_detail", args=[self.chat.chat_hash]))
+
+        self.assertEqual(response.context["chats"][0].unread, 0)
+        self.assertEqual(self.summary(self.provider_user)[2], 0)
+        message.refresh_from_db()
+        self.assertIsNotNone(message.read_time)
+
+    def test_inbox_shows_unread_counts(self):
+        create_message(self.chat, self.student, self.provider_user, "Hi")
+        self.client.login(username="provider", password="pass123")
+
+        response = self.client.get(reverse("chat_home"))
+
+        self.assertContains(response, 'class="chat-unread"')
+        self.assertEqual(response.context["chats"][0].last_message, "Hi")
+
+    def test_clearing_resets_the_summary(self):
+        create_message(self.chat, self.student, self.provider_user, "Hi")
+        self.chat.clear_for(self.provider_user)
+
+        self.assertEqual(self.summary(self.provider_user), (None, "", 0))
+        self.assertEqual(self.summary(self.student)[1], "Hi")
+
+    def test_deleting_the_last_message_steps_back(self):
+        first = create_message(self.chat, self.student, self.provider_user, "Hi")
+        second = create_message(self.chat, self.provider_user, self.student, "Bye")
+        self.client.login(username="student", password="pass123")
+
+        self.client.post(reverse("delete_message", args=[second.pk]))
+
+        # the deleted message was the student's only unread one
+        self.assertEqual(self.summary(self.student), (first.pk, "Hi", 0))
+        self.assertEqual(self.summary(self.provider_user)[0], second.pk)
 
-        # create a message visibility record
-        create_message_with_visibility(
-            self.chat, self.user1, self.user2, "Test message for counting"
+    def test_deleting_an_earlier_unread_message_uncounts_it(self):
+        first = create_message(self.chat, self.student, self.provider_user, "Hi")
+        second = create_message(self.chat, self.student, self.provider_user, "Bye")
+        self.client.login(username="provider", password="pass123")
+
+        self.client.post(reverse("delete_message", args=[first.pk]))
+        self.assertEqual(self.summary(self.provider_user), (second.pk, "Bye", 1))
+
+        # Deleting it again changes nothing
+        self.client.post(reverse("delete_message", args=[first.pk]))
+        self.assertEqual(self.summary(self.provider_user)[2], 1)
+
+        # Nor does the sender deleting their own copy
+        self.chat.hide_for(self.student, second)
+        self.assertEqual(self.summary(self.provider_user)[2], 1)
+
+    def test_reading_keeps_messages_that_arrive_meanwhile(self):
+        create_message(self.chat, self.student, self.provider_user, "Hi")
+        chat = Chat.objects.get(pk=self.chat.pk)
+        # A message counted after the reader loaded the chat, whose row
+        # isn't visible to its UPDATE yet
+        Chat.objects.update(user2_unread=F("user2_unread") + 1)
+
+        chat.mark_read(self.provider_user)
+
+        self.assertEqual(self.summary(self.provider_user)[2], 1)
+
+    def test_reading_skips_hidden_messages(self):
+        hidden = create_message(self.chat, self.student, self.provider_user, "Hi")
+        create_message(self.chat, self.student, self.provider_user, "Again")
+        self.chat.refresh_from_db()
+        self.chat.hide_for(self.provider_user, hidden)
+        self.chat.refresh_from_db()
+
+        self.chat.mark_read(self.provider_user)
+
+        self.assertEqual(self.summary(self.provider_user)[2], 0)
+        hidden.refresh_from_db()
+        self.assertIsNone(hidden.read_time)
+
+    def test_inbox_query_count_does_not_grow_with_chats(self):
+        def inbox_queries():
+            self.client.login(username="student", password="pass123")
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(reverse("chat_home"))
+            return len(queries)
+
+        create_message(self.chat, self.student, self.provider_user, "Hi")
+        baseline = inbox_queries()
+        for i in range(3):
+            other = User.objects.create_user(
+                username=f"provider{i}", password="pass123", role="training_provider"
+            )
+            Provider.objects.create(
+                user=other, name=f"Provider {i}", phone_num="1", address="Somewhere"
+            )
+            chat = Chat.objects.create(user1=self.student, user2=other)
+            create_message(chat, other, self.student, f"Hello {i}")
+
+        self.assertEqual(inbox_queries(), baseline)
+
+    def test_rebuild_command_recomputes_summaries(self):
+        message = create_message(self.chat, self.student, self.provider_user, "Hi")
+        Chat.objects.update(
+            user2_last_message=None, user2_last_preview="", user2_unread=0
+        )
+
+        out = StringIO()
+        call_command("rebuild_chat_summaries", stdout=out)
+
+        self.assertIn("1 chats", out.getvalue())
+        self.assertEqual(self.summary(self.provider_user), (message.pk, "Hi", 1))
+
+
+class ConvertMessageVisibilityTests(TestCase):
+    def setUp(self):
+        self.user1 = User.objects.create_user(username="user1", password="pass123")
+        self.user2 = User.objects.create_user(username="user2", password="pass123")
+        self.chat = Chat.objects.create(user1=self.user1, user2=self.user2)
+        self.messages = [
+            create_message(self.chat, self.user1, self.user2, f"Message {i}")
+            for i in range(5)
+        ]
+        # How the old views left things: user2 cleared the chat (every
+        # message hidden), then user1 deleted three messages one at a time
+        for message in self.messages:
+            MessageVisibility.objects.create(
+                user=self.user2, message=message, is_visible=False
+            )
+            MessageVisibility.objects.create(
+                user=self.user1,
+                message=message,
+                is_visible=message not in self.messages[:2] + self.messages[3:4],
+            )
+        self.latest = create_message(self.chat, self.user1, self.user2, "After")
+
+    def convert(self):
+        out = StringIO()
+        call_command("convert_message_visibility", stdout=out)
+        self.chat.refresh_from_db()
+        return out.getvalue()
+
+    def test_cleared_prefix_becomes_the_watermark(self):
+        out = self.convert()
+
+        self.assertIn("Converted 1 chats (8 hidden messages)", out)
+        self.assertEqual(self.chat.user2_cleared_up_to, self.messages[-1].pk)
+        self.assertEqual(self.chat.user1_cleared_up_to, self.messages[1].pk)
+        self.assertEqual(
+            list(HiddenMessage.objects.values_list("user", "message")),
+            [(self.user1.pk, self.messages[3].pk)],
+        )
+
+        self.assertEqual(
+            list(get_visible_messages(self.chat, self.user2)), [self.latest]
+        )
+        self.assertEqual(
+            list(get_visible_messages(self.chat, self.user1)),
+            [self.messages[2], self.messages[4], self.latest],
+        )
+
+    def test_summaries_follow_the_converted_visibility(self):
+        self.convert()
+        self.assertEqual(self.chat.user2_unread, 1)
+        self.assertEqual(self.chat.user2_last_message_id, self.latest.pk)
+
+        self.latest.delete()
+        self.convert()
+        self.assertEqual(self.chat.user2_unread, 0)
+        self.assertIsNone(self.chat.user2_last_message_id)
+
+    def test_converting_twice_changes_nothing(self):
+        self.convert()
+        self.convert()
+        self.assertEqual(HiddenMessage.objects.count(), 1)
+        self.assertEqual(self.chat.user2_cleared_up_to, self.messages[-1].pk)
+
+    def test_later_clears_are_kept(self):
+        self.chat.clear_for(self.user1)
+        self.convert()
+        self.assertEqual(self.chat.user1_cleared_up_to, self.latest.pk)
+        self.assertEqual(HiddenMessage.objects.count(), 0)
+
+
+IN_MEMORY_CHANNEL_LAYERS = {
+    "default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}
+}
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS)
+class ChatConsumerTests(TransactionTestCase):
+    def setUp(self):
+        self.student = User.objects.create_user(
+            username="student", password="pass123", role="career_changer"
+        )
+        self.provider_user = User.objects.create_user(
+            username="provider", password="pass123", role="training_provider"
+        )
+        Provider.objects.create(
+            user=self.provider_user,
+            name="Test Provider",
+            phone_num="1234567890",
+            address="Test Address",
+        )
+        self.chat = Chat.objects.create(user1=self.student, user2=self.provider_user)
+
+    def communicator(self, user):
+        communicator = WebsocketCommunicator(
+            URLRouter(websocket_urlpatterns), f"/ws/chat/{self.chat.chat_hash}/"
+        )
+        communicator.scope["user"] = user
+        return communicator
+
+    async def test_anonymous_users_are_rejected(self):
+        communicator = self.communicator(AnonymousUser())
+        connected, _ = await communicator.connect()
+        self.assertFalse(connected)
+
+    async def test_non_participants_are_rejected(self):
+        outsider = await database_sync_to_async(User.objects.create_user)(
+            username="outsider", password="pass123"
+        )
+        communicator = self.communicator(outsider)
+        connected, _ = await communicator.connect()
+        self.assertFalse(connected)
+
+    async def test_messages_are_sent_as_the_connected_user(self):
+        communicator = self.communicator(self.student)
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+
+        # A client-supplied sender is ignored
+        await communicator.send_json_to({"message": "Hi", "sender": "provider"})
+        response = await communicator.receive_json_from()
+        await communicator.disconnect()
+
+        self.assertEqual(response["message"], "Hi")
+        self.assertEqual(response["sender"], "student")
+        message = await database_sync_to_async(Message.objects.get)(
+            pk=response["message_id"]
         )
+        self.assertEqual(message.sender_id, self.student.pk)
+        self.assertEqual(message.recipient_id, self.provider_user.pk)
+
+    async def test_chat_list_update_uses_display_name(self):
+        layer = get_channel_layer()
+        await layer.group_add(f"user_{self.student.pk}_chat_list", "inbox")
+
+        communicator = self.communicator(self.provider_user)
+        await communicator.connect()
+        await communicator.send_json_to({"message": "Welcome"})
+        await communicator.receive_json_from()
+        await communicator.disconnect()
+
+        update = await layer.receive("inbox")
+        self.assertEqual(update["data"]["last_message"], "Welcome")
+        self.assertEqual(update["data"]["sender_display_name"], "Test Provider")
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS)
+class ChatConsumerQueryTests(TestCase):
+    def test_saving_a_message_only_inserts_it(self):
+        student = User.objects.create_user(username="student", password="pass123")
+        other = User.objects.create_user(username="other", password="pass123")
+        chat = Chat.objects.create(user1=student, user2=other)
 
-        # verify Message.objects.create was called once
-        self.assertEqual(mock_message_create.call_count, 1)
+        consumer = ChatConsumer()
+        consumer.chat_hash = chat.chat_hash
+        self.assertTrue(async_to_sync(consumer.join_chat)(student))
 
-        # verify MessageVisibility.objects.create was called twice (once for each user)
-        self.assertEqual(mock_visibility_create.call_count, 2)
+        for content in ("First", "Second"):
+            with self.assertNumQueries(4):
+                # SAVEPOINT, message INSERT, chat UPDATE, RELEASE
+                async_to_sync(consumer.save_message)(content)
@@ -6,6 +6,7 @@ urlpatterns = [
     path("list/", views.chat_list, name="chat_list"),
     path("select/", views.select_chat_partner, name="select_chat_partner"),
     path("<str:chat_hash>/", views.chat_detail, name="chat_detail"),
+    path("<str:chat_hash>/history/", views.chat_history, name="chat_history"),
     path("delete_chat/<str:chat_hash>/", views.delete_chat, name="delete_chat"),
     path(
         "delete_message/<int:message_id>/", views.delete_message, name="delete_message"
@@ -1,59 +1,51 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponseForbidden
+from django.http import HttpResponseForbidden, JsonResponse
+from django.template.loader import render_to_string
 from django.db.models import Q
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from django.conf import settings
-from .models import Chat, Message, MessageVisibility
+from .models import Chat, Message
 from users.models import Provider
 from .forms import MessageForm
+from .pagination import paginate_messages
 
 timezone.activate(settings.TIME_ZONE)
 
 
-@login_required
-def chat_home(request):
-    user = request.user
-    from django.db.models import OuterRef, Subquery, DateTimeField, TextField
-
-    visible_messages = Message.objects.filter(
-        chat=OuterRef("pk"), visibilities__user=user, visibilities__is_visible=True
-    ).order_by("-send_time")
-
-    chats = (
-        Chat.objects.filter(Q(user1=user) | Q(user2=user))
-        .annotate(
-            last_time=Subquery(
-                visible_messages.values("send_time")[:1], output_field=DateTimeField()
-            ),
-            last_message=Subquery(
-                visible_messages.values("content")[:1], output_field=TextField()
-            ),
-        )
-        .order_by("-last_time", "-id")
-    )
-
-    def get_display_name(u):
-        if u.role == "training_provider":
-            try:
-                return u.provider_profile.name
-            except Provider.DoesNotExist:
-                return u.username
-        else:
+def get_display_name(u):
+    if u.role == "training_provider":
+        try:
+            # If the user is a provider, return business name
+            return u.provider_profile.name
+        except Provider.DoesNotExist:
+            # Fallback to username if provider profile doesn't exist
             return u.username
+    else:
+        # If the user is a student or any other role, return their username
+        return u.username
+
 
-    def get_student_full_name(u):
-        if u.role == "career_changer":
-            # If the user is a student or any other role, return their full name
-            return u.get_full_name()
+def get_student_full_name(u):
+    if u.role == "career_changer":
+        # If the user is a student or any other role, return their full name
+        return u.get_full_name()
 
+
+def inbox_chats(user):
+    """``user``'s chats for the inbox, with the other participant's names."""
+    chats = list(Chat.objects.inbox(user))
     for c in chats:
-        other = c.user2 if c.user1 == user else c.user1
+        other = c.user2 if c.user1_id == user.pk else c.user1
         c.display_name = get_display_name(other)
         c.student_full_name = get_student_full_name(other)
+    return chats
 
-    context = {"chats": chats, "welcome_message": True}
+
+@login_required
+def chat_home(request):
+    context = {"chats": inbox_chats(request.user), "welcome_message": True}
 
     return render(request, "chat/chat_ui.html", context)
 
@@ -74,55 +66,23 @@ def chat_list(request):
 
 @login_required
 def chat_detail(request, chat_hash):
-    # Get the current user's chats and annotate with the last message time
     user = request.user
-    from django.db.models import OuterRef, Subquery, DateTimeField, TextField
-
-    visible_messages = Message.objects.filter(
-        chat=OuterRef("pk"), visibilities__user=user, visibilities__is_visible=True
-    ).order_by("-send_time")
-
-    chats = (
-        Chat.objects.filter(Q(user1=user) | Q(user2=user))
-        .annotate(
-            last_time=Subquery(
-                visible_messages.values("send_time")[:1], output_field=DateTimeField()
-            ),
-            last_message=Subquery(
-                visible_messages.values("content")[:1], output_field=TextField()
-            ),
-        )
-        .order_by("-last_time", "-id")
-    )
 
     # If the URL contains a chat_hash, filter the chats to find the current chat
-    current_chat = get_object_or_404(Chat, chat_hash=chat_hash)
+    current_chat = get_object_or_404(
+        Chat.objects.select_related(
+            "user1__provider_profile", "user2__provider_profile"
+        ),
+        chat_hash=chat_hash,
+    )
 
     # If the chat_hash doesn't match the user, return a forbidden response
     if user not in [current_chat.user1, current_chat.user2]:
         return HttpResponseForbidden("You do not have permission to view this chat.")
 
-    def get_display_name(u):
-        if u.role == "training_provider":
-            try:
-                # If the user is a provider, return business name
-                return u.provider_profile.name
-            except Provider.DoesNotExist:
-                # Fallback to username if provider profile doesn't exist
-                return u.username
-        else:
-            # If the user is a student or any other role, return their username
-            return u.username
-
-    def get_student_full_name(u):
-        if u.role == "career_changer":
-            # If the user is a student or any other role, return their full name
-            return u.get_full_name()
-
-    for c in chats:
-        other = c.user2 if c.user1 == user else c.user1
-        c.display_name = get_display_name(other)
-        c.student_full_name = get_student_full_name(other)
+    # Opening the chat reads it, before the inbox shows its unread count
+    current_chat.mark_read(user)
+    chats = inbox_chats(user)
 
     other_user = (
         current_chat.user2 if user == current_chat.user1 else current_chat.user1
@@ -143,29 +103,44 @@ def chat_detail(request, chat_hash):
         #     msg.save()
         #     return redirect("chat_detail", chat_hash=current_chat.chat_hash)
         if form.is_valid():
-            create_message_with_visibility(
-                current_chat, user, other_user, form.cleaned_data["content"]
-            )
+            create_message(current_chat, user, other_user, form.cleaned_data["content"])
             return redirect("chat_detail", chat_hash=current_chat.chat_hash)
     else:
         form = MessageForm()
 
-    # messages = current_chat.messages.order_by("send_time")
-    messages = get_visible_messages(current_chat, user)
-    for message in messages:
-        message.local_send_time = timezone.localtime(message.send_time)
+    # The latest messages; older ones load from chat_history on scroll
+    page = paginate_messages(current_chat.visible_messages(user))
 
     # render
     context = {
         "chats": chats,
         "current_chat": current_chat,
-        "messages": messages,
+        "messages": page.messages,
+        "message_page": page,
         "form": form,
         "other_user": other_user,
     }
     return render(request, "chat/chat_ui.html", context)
 
 
+@login_required
+def chat_history(request, chat_hash):
+    """A page of older messages, as HTML for the conversation to prepend."""
+    chat = get_object_or_404(Chat, chat_hash=chat_hash)
+    if request.user.pk not in (chat.user1_id, chat.user2_id):
+        return HttpResponseForbidden("You do not have permission to view this chat.")
+
+    page = paginate_messages(
+        chat.visible_messages(request.user), request.GET.get("before")
+    )
+    html = render_to_string(
+        "chat/message_items.html", {"messages": page.messages}, request=request
+    )
+    return JsonResponse(
+        {"html": html, "before": page.before, "has_older": page.has_older}
+    )
+
+
 User = get_user_model()
 
 
@@ -191,8 +166,8 @@ def select_chat_partner(request):
     return render(request, "chat/select_chat_partner.html", {"users": users})
 
 
-def create_message_with_visibility(chat, sender, recipient, content):
-    message = Message.objects.create(
+def create_message(chat, sender, recipient, content):
+    return Message.objects.create(
         chat=chat,
         sender=sender,
         recipient=recipient,
@@ -200,16 +175,9 @@ def create_message_with_visibility(chat, sender, recipient, content):
         send_time=timezone.now(),
     )
 
-    MessageVisibility.objects.create(user=sender, message=message, is_visible=True)
-    MessageVisibility.objects.create(user=recipient, message=message, is_visible=True)
-
-    return message
-
 
 def get_visible_messages(chat, user):
-    return Message.objects.filter(
-        chat=chat, visibilities__user=user, visibilities__is_visible=True
-    ).order_by("send_time")
+    return chat.visible_messages(user).order_by("send_time")
 
 
 @login_required
@@ -224,10 +192,8 @@ def delete_message(request, message_id):
         )
 
     if request.method == "POST":
-        # Update the visibility of the message for the user
-        MessageVisibility.objects.update_or_create(
-            user=request.user, message=message, defaults={"is_visible": False}
-        )
+        # Hide the message from this user only
+        chat.hide_for(request.user, message)
 
     return redirect("chat_detail", chat_hash=chat.chat_hash)
 
@@ -240,11 +206,6 @@ def delete_chat(request, chat_hash):
         return HttpResponseForbidden("You do not have permission to clear this chat.")
 
     if request.method == "POST":
-        messages = Message.objects.filter(chat=chat)
-
-        for message in messages:
-            MessageVisibility.objects.update_or_create(
-                user=request.user, message=message, defaults={"is_visible": False}
-            )
+        chat.clear_for(request.user)
 
     return redirect("chat_detail", chat_hash=chat.chat_hash)
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from courses.cards import bump_all_card_versions
+from courses.results import bump_results_version
+from review.models import CourseRatingStats
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized course rating stats from all reviews"
+
+    def handle(self, *args, **options):
+        rebuilt = CourseRatingStats.rebuild()
+        bump_all_card_versions()
+        bump_results_version()
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt rating stats for {rebuilt} courses")
+        )
@@ -1,4 +1,6 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, F, FloatField, Q, Sum
+from django.db.models.functions import Cast, NullIf
 from django.conf import settings  # ✅ Import settings to get the custom user model
 from courses.models import Course  # ✅ Import the Course model from courses app
 from django.contrib.auth import get_user_model
@@ -20,6 +22,23 @@ class Review(models.Model):
     helpful_count = models.PositiveIntegerField(default=0)
     not_helpful_count = models.PositiveIntegerField(default=0)
 
+    class Meta:
+        # One per review ordering on the course page (review/pagination.py)
+        indexes = [
+            models.Index(
+                fields=["course", "created_at", "review_id"],
+                name="review_course_created_idx",
+            ),
+            models.Index(
+                fields=["course", "helpful_count", "review_id"],
+                name="review_course_helpful_idx",
+            ),
+            models.Index(
+                fields=["course", "score_rating", "review_id"],
+                name="review_course_rating_idx",
+            ),
+        ]
+
     def __str__(self):
         return f"Review {self.review_id} by {self.user.username} for {self.course.name}"
 
@@ -56,3 +75,99 @@ class ReviewVote(models.Model):
 
     class Meta:
         unique_together = ("review", "user")
+
+
+class CourseRatingStats(models.Model):
+    """
+    Denormalized rating aggregates for one course.
+
+    Kept in step with the course's reviews by the handlers in review/signals.py
+    so listing pages can read ratings with a join instead of a GROUP BY over
+    all reviews. ``manage.py rebuild_rating_stats`` recomputes every row.
+    """
+
+    course = models.OneToOneField(
+        Course,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="rating_stats",
+    )
+    review_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.IntegerField(default=0)
+    avg_rating = models.FloatField(null=True, blank=True, db_index=True)
+    rating_1_count = models.PositiveIntegerField(default=0)
+    rating_2_count = models.PositiveIntegerField(default=0)
+    rating_3_count = models.PositiveIntegerField(default=0)
+    rating_4_count = models.PositiveIntegerField(default=0)
+    rating_5_count = models.PositiveIntegerField(default=0)
+
+    STARS = range(1, 6)
+
+    def __str__(self):
+        return f"Rating stats for course {self.course_id}"
+
+    @property
+    def histogram(self):
+        return {star: getattr(self, f"rating_{star}_count") for star in self.STARS}
+
+    @classmethod
+    def add_review(cls, course_id, score):
+        _, created = cls.objects.get_or_create(course_id=course_id)
+        if created:
+            # The course may already have reviews from before the stats
+            # existed; count them all, the new one included
+            cls.rebuild_for(course_id)
+            return
+        cls._apply(course_id, int(score), 1)
+
+    @classmethod
+    def remove_review(cls, course_id, score):
+        # No get_or_create here: the course itself may be mid-delete
+        cls._apply(course_id, int(score), -1)
+
+    @classmethod
+    def _apply(cls, course_id, score, delta):
+        """Add or subtract one review in a single UPDATE."""
+        updates = {
+            "review_count": F("review_count") + delta,
+            "rating_sum": F("rating_sum") + delta * score,
+            "avg_rating": Cast(F("rating_sum") + delta * score, FloatField())
+            / NullIf(F("review_count") + delta, 0),
+        }
+        if score in cls.STARS:
+            field = f"rating_{score}_count"
+            updates[field] = F(field) + delta
+        cls.objects.filter(course_id=course_id).update(**updates)
+
+    @classmethod
+    def aggregate_reviews(cls, reviews):
+        """Per-course stats rows computed from a Review queryset."""
+        rows = reviews.values("course_id").annotate(
+            review_count=Count("pk"),
+            rating_sum=Sum("score_rating"),
+            **{
+                f"rating_{star}_count": Count("pk", filter=Q(score_rating=star))
+                for star in cls.STARS
+            },
+        )
+        return [
+            cls(avg_rating=row["rating_sum"] / row["review_count"], **row)
+            for row in rows
+        ]
+
+    @classmethod
+    def rebuild_for(cls, course_id):
+        with transaction.atomic():
+            cls.objects.filter(course_id=course_id).delete()
+            cls.objects.bulk_create(
+                cls.aggregate_reviews(Review.objects.filter(course_id=course_id))
+            )
+
+    @classmethod
+    def rebuild(cls):
+        with transaction.atomic():
+            cls.objects.all().delete()
+            stats = cls.objects.bulk_create(
+                cls.aggregate_reviews(Review.objects.all()), batch_size=1000
+            )
+        return len(stats)
@@ -0,0 +1,120 @@
+"""
+Keyset pagination of a course's reviews.
+
+The course detail page inlines the first page of reviews and fetches the
+rest from ``CourseReviewsView`` as the visitor scrolls. Each ordering has a
+``(course, <sort column>, review_id)`` index, so every page is a short index
+scan from the cursor however many reviews the course has.
+"""
+
+from django.db.models import OuterRef, Prefetch, Q, Subquery
+from django.utils.dateparse import parse_datetime
+
+from courses.pagination import decode_cursor, encode_cursor
+from .models import Review, ReviewReply, ReviewVote
+
+# name -> (column, order)
+REVIEW_SORTS = {
+    "newest": ("created_at", "desc"),
+    "helpful": ("helpful_count", "desc"),
+    "highest": ("score_rating", "desc"),
+    "lowest": ("score_rating", "asc"),
+}
+DEFAULT_REVIEW_SORT = "newest"
+REVIEWS_PER_PAGE = 10
+
+
+class ReviewPage:
+    def __init__(self, reviews, sort, next_cursor):
+        self.reviews = reviews
+        self.sort = sort
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def as_dict(self):
+        return {
+            "sort": self.sort,
+            "next_cursor": self.next_cursor,
+            "has_next": self.has_next,
+        }
+
+
+def course_reviews(course, user):
+    """
+    ``course``'s reviews with what a review item shows: its author, replies
+    (with their authors) and ``user_vote``, the visitor's vote on it.
+    """
+    user_vote = ReviewVote.objects.filter(review=OuterRef("pk"), user=user.pk).values(
+        "action"
+    )[:1]
+    replies = ReviewReply.objects.select_related("user").order_by("created_at")
+    return (
+        Review.objects.filter(course=course)
+        .select_related("user")
+        .prefetch_related(Prefetch("replies", queryset=replies))
+        .annotate(user_vote=Subquery(user_vote))
+    )
+
+
+def _cursor_value(column, value):
+    if column == "created_at":
+        return value.isoformat()
+    return value
+
+
+def _decode_position(cursor, sort, order, column):
+    position = decode_cursor(cursor, sort, order)
+    if position is None:
+        return None
+    value, review_id = position
+    if column == "created_at":
+        try:
+            value = parse_datetime(value) if isinstance(value, str) else None
+        except ValueError:
+            # Well formed but not a real date, e.g. month 13
+            return None
+    elif not isinstance(value, int):
+        value = None
+    if value is None:
+        return None
+    return value, review_id
+
+
+def paginate_reviews(reviews, sort=None, cursor=None, per_page=REVIEWS_PER_PAGE):
+    """One ``ReviewPage`` of ``reviews`` in ``sort`` order, after ``cursor``."""
+    if sort not in REVIEW_SORTS:
+        sort = DEFAULT_REVIEW_SORT
+    column, order = REVIEW_SORTS[sort]
+    descending = order == "desc"
+
+    position = _decode_position(cursor, sort, order, column)
+    if position is not None:
+        value, review_id = position
+        if descending:
+            after = Q(**{f"{column}__lt": value}) | Q(
+                **{column: value, "review_id__lt": review_id}
+            )
+        else:
+            after = Q(**{f"{column}__gt": value}) | Q(
+                **{column: value, "review_id__gt": review_id}
+            )
+        reviews = reviews.filter(after)
+
+    if descending:
+        reviews = reviews.order_by(f"-{column}", "-review_id")
+    else:
+        reviews = reviews.order_by(column, "review_id")
+
+    # One extra row tells whether another page follows
+    rows = list(reviews[: per_page + 1])
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        last = rows[-1]
+        next_cursor = encode_cursor(
+            sort, order, _cursor_value(column, getattr(last, column)), last.review_id
+        )
+    return ReviewPage(rows, sort, next_cursor)
@@ -0,0 +1,64 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from courses.cards import bump_card_versions
+from courses.results import bump_results_version
+from vocationalnyc.conditional import bump_page_versions
+from .models import CourseRatingStats, Review, ReviewReply, ReviewVote
+
+
+@receiver(post_save, sender=Review)
+def update_rating_stats_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+
+    if created:
+        CourseRatingStats.add_review(instance.course_id, instance.score_rating)
+        return
+
+    # An existing review changed; only its score matters to the stats
+    update_fields = kwargs.get("update_fields")
+    if update_fields is None or "score_rating" in update_fields:
+        CourseRatingStats.rebuild_for(instance.course_id)
+
+
+@receiver(post_delete, sender=Review)
+def update_rating_stats_on_delete(sender, instance, **kwargs):
+    CourseRatingStats.remove_review(instance.course_id, instance.score_rating)
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def bump_reviewed_course_card(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_card_versions([instance.course_id])
+        bump_page_versions("course", [instance.course_id])
+        # Ratings feed the min_rating filter
+        bump_results_version()
+
+
+def _reviewed_course_id(review_id):
+    return (
+        Review.objects.filter(pk=review_id).values_list("course_id", flat=True).first()
+    )
+
+
+@receiver(post_save, sender=ReviewVote)
+@receiver(post_delete, sender=ReviewVote)
+def bump_voted_course_card(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    course_id = _reviewed_course_id(instance.review_id)
+    if course_id is not None:
+        bump_card_versions([course_id])
+        bump_page_versions("course", [course_id])
+
+
+@receiver(post_save, sender=ReviewReply)
+@receiver(post_delete, sender=ReviewReply)
+def bump_replied_course_page(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    course_id = _reviewed_course_id(instance.review_id)
+    if course_id is not None:
+        bump_page_versions("course", [course_id])
@@ -1,8 +1,21 @@
-from django.test import TestCase, Client
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import (
+    Client,
+    TestCase,
+    TransactionTestCase,
+    skipUnlessDBFeature,
+)
 from django.urls import reverse
 from django.contrib.auth import get_user_model
-from .models import Review, ReviewReply, ReviewVote
+from .models import CourseRatingStats, Review, ReviewReply, ReviewVote
 from courses.models import Course
+from courses.pagination import encode_cursor
+from courses.results import results_version
 from users.models import Provider
 
 User = get_user_model()
@@ -317,6 +330,108 @@ class ReviewViewTests(TestCase):
         self.assertTrue(Review.objects.filter(pk=self.review.pk).exists())
 
 
+class CourseRatingStatsTests(TestCase):
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(
+                username=f"rater{i}", password="password123", role="career_changer"
+            )
+            for i in range(3)
+        ]
+        self.provider = Provider.objects.create(name="Stats Provider")
+        self.course = Course.objects.create(name="Stats Course", provider=self.provider)
+
+    def stats(self):
+        return CourseRatingStats.objects.get(course=self.course)
+
+    def test_stats_follow_review_writes(self):
+        first = Review.objects.create(
+            user=self.users[0], course=self.course, content="ok", score_rating=5
+        )
+        Review.objects.create(
+            user=self.users[1], course=self.course, content="ok", score_rating=4
+        )
+
+        stats = self.stats()
+        self.assertEqual((stats.review_count, stats.rating_sum), (2, 9))
+        self.assertEqual(stats.avg_rating, 4.5)
+        self.assertEqual(stats.histogram, {1: 0, 2: 0, 3: 0, 4: 1, 5: 1})
+
+        first.delete()
+        stats = self.stats()
+        self.assertEqual((stats.review_count, stats.avg_rating), (1, 4.0))
+        self.assertEqual(stats.rating_5_count, 0)
+
+    def test_stats_average_is_null_without_reviews(self):
+        review = Review.objects.create(
+            user=self.users[0], course=self.course, content="ok", score_rating=3
+        )
+        review.delete()
+        stats = self.stats()
+        self.assertEqual(stats.review_count, 0)
+        self.assertIsNone(stats.avg_rating)
+
+    def test_score_change_recomputes_stats(self):
+        review = Review.objects.create(
+            user=self.users[0], course=self.course, content="ok", score_rating=2
+        )
+        review.score_rating = 4
+        review.save()
+        stats = self.stats()
+        self.assertEqual((stats.avg_rating, stats.rating_2_count), (4.0, 0))
+        self.assertEqual(stats.rating_4_count, 1)
+
+    def test_views_keep_stats_in_sync(self):
+        self.client.login(username="rater0", password="password123")
+        self.client.post(
+            reverse("review-create", args=[self.course.pk]),
+            {"content": "Great", "score_rating": 5},
+        )
+        self.assertEqual(self.stats().review_count, 1)
+
+        review = Review.objects.get()
+        self.client.post(reverse("review-delete", args=[review.pk]))
+        self.assertEqual(self.stats().review_count, 0)
+
+    def test_deleting_course_with_reviews(self):
+        Review.objects.create(
+            user=self.users[0], course=self.course, content="ok", score_rating=5
+        )
+        self.course.delete()
+        self.assertFalse(CourseRatingStats.objects.exists())
+
+    def test_first_stats_row_counts_existing_reviews(self):
+        # Reviews written before the stats table existed
+        for user, score in zip(self.users[:2], [1, 5]):
+            Review.objects.create(
+                user=user, course=self.course, content="ok", score_rating=score
+            )
+        CourseRatingStats.objects.all().delete()
+
+        Review.objects.create(
+            user=self.users[2], course=self.course, content="ok", score_rating=3
+        )
+
+        stats = self.stats()
+        self.assertEqual((stats.review_count, stats.avg_rating), (3, 3.0))
+        self.assertEqual(stats.histogram, {1: 1, 2: 0, 3: 1, 4: 0, 5: 1})
+
+    def test_rebuild_command(self):
+        for user, score in zip(self.users, [1, 3, 5]):
+            Review.objects.create(
+                user=user, course=self.course, content="ok", score_rating=score
+            )
+        CourseRatingStats.objects.all().delete()
+        out = StringIO()
+
+        call_command("rebuild_rating_stats", stdout=out)
+
+        self.assertIn("1 courses", out.getvalue())
+        stats = self.stats()
+        self.assertEqual((stats.review_count, stats.avg_rating), (3, 3.0))
+        self.assertEqual(stats.histogram, {1: 1, 2: 0, 3: 1, 4: 0, 5: 1})
+
+
 class ReviewVoteViewTests(TestCase):
     def setUp(self):
         self.client = Client()
@@ -424,6 +539,78 @@ class ReviewVoteViewTests(TestCase):
         self.assertEqual(self.review.helpful_count, 0)
         self.assertEqual(self.review.not_helpful_count, 0)
 
+    def test_vote_only_writes_counters(self):
+        """a vote updates the counters without re-saving the review"""
+        version = results_version()
+        response = self.client.post(
+            reverse("review-vote", args=[self.review.pk]), {"action": "upvote"}
+        )
+
+        self.assertEqual(response.json(), {"helpful_count": 1, "not_helpful_count": 0})
+        # Saving the review would have retired every cached search result
+        self.assertEqual(results_version(), version)
+
+
+# SQLite has no row locks and its in-memory test database rejects concurrent
+# writers outright; CI runs this against PostgreSQL
+@skipUnlessDBFeature("has_select_for_update")
+class ConcurrentReviewVoteTests(TransactionTestCase):
+    def setUp(self):
+        provider = Provider.objects.create(
+            name="Test Provider", phone_num="1234567890", address="123 Test St"
+        )
+        course = Course.objects.create(
+            name="Test Course", provider=provider, location="Test Location"
+        )
+        author = User.objects.create_user(username="author", password="password123")
+        self.review = Review.objects.create(
+            user=author, course=course, content="Great course!", score_rating=5
+        )
+        self.voters = [
+            User.objects.create_user(username=f"voter{i}", password="password123")
+            for i in range(8)
+        ]
+
+    def vote(self, voter, actions, barrier):
+        client = Client()
+        client.force_login(voter)
+        url = reverse("review-vote", args=[self.review.pk])
+        barrier.wait()
+        try:
+            for action in actions:
+                response = client.post(url, {"action": action})
+                self.assertEqual(response.status_code, 200)
+        finally:
+            connection.close()
+
+    def test_parallel_votes_keep_counters_in_step_with_votes(self):
+        # Each voter votes, switches, undoes and votes again, all at once
+        plans = [
+            ["upvote", "downvote", "downvote", "upvote"],
+            ["downvote", "downvote", "upvote"],
+            ["upvote", "upvote", "downvote", "upvote", "downvote"],
+        ]
+        barrier = threading.Barrier(len(self.voters))
+        with ThreadPoolExecutor(max_workers=len(self.voters)) as executor:
+            futures = [
+                executor.submit(self.vote, voter, plans[i % len(plans)], barrier)
+                for i, voter in enumerate(self.voters)
+            ]
+            for future in futures:
+                future.result()
+
+        votes = ReviewVote.objects.filter(review=self.review)
+        self.review.refresh_from_db()
+        self.assertEqual(
+            self.review.helpful_count, votes.filter(action="upvote").count()
+        )
+        self.assertEqual(
+            self.review.not_helpful_count, votes.filter(action="downvote").count()
+        )
+        # 3 voters end on an upvote, 3 on nothing and 2 on a downvote
+        self.assertEqual(self.review.helpful_count, 3)
+        self.assertEqual(self.review.not_helpful_count, 2)
+
 
 class ReviewReplyViewTests(TestCase):
     def setUp(self):
@@ -508,3 +695,99 @@ class ReviewReplyViewTests(TestCase):
         self.assertFalse(
             ReviewReply.objects.filter(content="This is my reply!").exists()
         )
+
+
+class CourseReviewsViewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="reader", password="password123", role="career_changer"
+        )
+        provider = Provider.objects.create(
+            name="Test Provider", phone_num="1234567890", address="123 Test St"
+        )
+        self.course = Course.objects.create(
+            name="Test Course", provider=provider, location="Test Location"
+        )
+        for i in range(25):
+            author = User.objects.create_user(
+                username=f"author{i}", password="password123"
+            )
+            Review.objects.create(
+                user=author,
+                course=self.course,
+                content=f"Review {i}",
+                score_rating=i % 5 + 1,
+                helpful_count=i * 7 % 11,
+            )
+        self.client.login(username="reader", password="password123")
+        self.url = reverse("course-reviews", args=[self.course.pk])
+
+    def fetch_all(self, sort):
+        """Review ids in the order the pages return them."""
+        ids, cursor = [], None
+        while True:
+            params = {"sort": sort}
+            if cursor:
+                params["cursor"] = cursor
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            self.assertEqual(data["sort"], sort)
+            ids.extend(
+                int(part.split('"')[0])
+                for part in data["html"].split('data-review-id="')[1:]
+            )
+            cursor = data["next_cursor"]
+            if not data["has_next"]:
+                return ids
+
+    def test_each_ordering_pages_through_every_review(self):
+        reviews = Review.objects.filter(course=self.course)
+        expected = {
+            "newest": reviews.order_by("-created_at", "-review_id"),
+            "helpful": reviews.order_by("-helpful_count", "-review_id"),
+            "highest": reviews.order_by("-score_rating", "-review_id"),
+            "lowest": reviews.order_by("score_rating", "review_id"),
+        }
+        for sort, ordered in expected.items():
+            with self.subTest(sort=sort):
+                self.assertEqual(
+                    self.fetch_all(sort),
+                    list(ordered.values_list("review_id", flat=True)),
+                )
+
+    def test_page_query_count_is_constant(self):
+        with self.assertNumQueries(5):
+            # Session, user, course, a page of reviews, their replies
+            data = self.client.get(self.url).json()
+        with self.assertNumQueries(5):
+            self.client.get(self.url, {"cursor": data["next_cursor"]})
+
+    def page_ids(self, params):
+        html = self.client.get(self.url, params).json()["html"]
+        return [int(part.split('"')[0]) for part in html.split('data-review-id="')[1:]]
+
+    def test_bad_sort_and_cursor_fall_back_to_first_page(self):
+        first = self.client.get(self.url).json()
+        self.assertEqual(first["sort"], "newest")
+        response = self.client.get(self.url, {"sort": "bogus", "cursor": "!!"})
+        self.assertEqual(response.json()["next_cursor"], first["next_cursor"])
+        self.assertEqual(
+            self.page_ids({"sort": "bogus", "cursor": "!!"}), self.page_ids({})
+        )
+
+        # A cursor from another ordering is ignored too
+        helpful = self.client.get(self.url, {"sort": "helpful"}).json()
+        self.assertEqual(
+            self.page_ids({"cursor": helpful["next_cursor"]}), self.page_ids({})
+        )
+
+        impossible = encode_cursor("newest", "desc", "2024-13-45T00:00:00", 1)
+        response = self.client.get(self.url, {"cursor": impossible})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.page_ids({"cursor": impossible}), self.page_ids({}))
+
+    def test_login_required(self):
+        self.client.logout()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 302)
@@ -1,6 +1,7 @@
 from django.urls import path
 from .views import (
     ReviewListView,
+    CourseReviewsView,
     ReviewDetailView,
     ReviewReplyListView,
     ReviewReplyDetailView,
@@ -14,6 +15,7 @@ from .views import (
 urlpatterns = [
     path("reviews/", ReviewListView.as_view(), name="review-list"),
     path("reviews/<int:pk>/", ReviewDetailView.as_view(), name="review-detail"),
+    path("course/<int:pk>/", CourseReviewsView.as_view(), name="course-reviews"),
     path("replies/", ReviewReplyListView.as_view(), name="review-reply-list"),
     path(
         "replies/<int:pk>/", ReviewReplyDetailView.as_view(), name="review-reply-detail"
@@ -4,13 +4,17 @@ from django.views import View
 from django.contrib.auth.decorators import login_required
 from django.utils.decorators import method_decorator
 from django.core.serializers import serialize
+from django.db import transaction
+from django.db.models import F
 from .models import ReviewReply
 from .models import Review, ReviewVote
+from .pagination import course_reviews, paginate_reviews
 from courses.models import Course
 from users.models import Provider
 
 # from django.urls import reverse
 from django.shortcuts import render
+from django.template.loader import render_to_string
 
 
 class ReviewListView(View):
@@ -55,6 +59,31 @@ class ReviewReplyDetailView(View):
         return JsonResponse(data)
 
 
+@method_decorator(login_required, name="dispatch")
+class CourseReviewsView(View):
+    """
+    One page of a course's reviews for the detail page's infinite scroll:
+    the rendered review items plus the cursor of the next page (JSON).
+    """
+
+    def get(self, request, pk):
+        course = get_object_or_404(Course.objects.select_related("provider"), pk=pk)
+        page = paginate_reviews(
+            course_reviews(course, request.user),
+            request.GET.get("sort"),
+            request.GET.get("cursor"),
+        )
+        html = render_to_string(
+            "courses/review_items.html",
+            {
+                "reviews": page.reviews,
+                "is_course_provider": course.provider.user_id == request.user.pk,
+            },
+            request=request,
+        )
+        return JsonResponse({"html": html, **page.as_dict()})
+
+
 @method_decorator(login_required, name="dispatch")
 class ReviewCreateView(View):
     def post(self, request, pk):
@@ -69,12 +98,14 @@ class ReviewCreateView(View):
         if Review.objects.filter(course=course, user=request.user).exists():
             return redirect("course_detail", pk=pk)
 
-        Review.objects.create(
-            course=course,
-            user=request.user,
-            content=content,
-            score_rating=int(score_rating),
-        )
+        # The rating stats row is updated by a signal in the same transaction
+        with transaction.atomic():
+            Review.objects.create(
+                course=course,
+                user=request.user,
+                content=content,
+                score_rating=int(score_rating),
+            )
         return redirect("course_detail", pk=pk)
 
 
@@ -108,59 +139,65 @@ class ReviewDeleteView(View):
                 status=403,
             )
 
-        course_id = review.course.pk
-        review.delete()
+        course_id = review.course_id
+        with transaction.atomic():
+            review.delete()
         return redirect("course_detail", pk=course_id)
 
 
+# vote action -> the review counter it feeds
+VOTE_COUNTERS = {"upvote": "helpful_count", "downvote": "not_helpful_count"}
+
+
 class ReviewVoteView(View):
     def post(self, request, pk):
-        review = get_object_or_404(Review, pk=pk)
         action = request.POST.get("action")
         user = request.user
 
-        if action not in ["upvote", "downvote"]:
+        if action not in VOTE_COUNTERS:
             return JsonResponse({"error": "Invalid vote action"}, status=400)
 
-        existing_vote = ReviewVote.objects.filter(review=review, user=user).first()
+        with transaction.atomic():
+            # Locking the review makes concurrent votes on it take turns, so
+            # each one sees the vote rows the previous one left behind
+            review = get_object_or_404(
+                Review.objects.select_for_update().only("review_id"), pk=pk
+            )
+            existing_vote = ReviewVote.objects.filter(review=review, user=user).first()
+            deltas = {}
 
-        if not existing_vote:
-            # No vote exists yet — create one
-            if action == "upvote":
-                review.helpful_count += 1
-            else:
-                review.not_helpful_count += 1
-            ReviewVote.objects.create(review=review, user=user, action=action)
+            if not existing_vote:
+                # No vote exists yet — create one
+                ReviewVote.objects.create(review=review, user=user, action=action)
+                deltas[action] = 1
 
-        else:
-            if existing_vote.action == action:
+            elif existing_vote.action == action:
                 # Same vote clicked again — undo it
-                if action == "upvote":
-                    review.helpful_count -= 1
-                else:
-                    review.not_helpful_count -= 1
                 existing_vote.delete()
+                deltas[action] = -1
 
             else:
                 # Switching vote
-                if action == "upvote":
-                    review.helpful_count += 1
-                    review.not_helpful_count -= 1
-                else:
-                    review.helpful_count -= 1
-                    review.not_helpful_count += 1
-
+                deltas[existing_vote.action] = -1
+                deltas[action] = 1
                 existing_vote.action = action
-                existing_vote.save()
-
-        review.save()
+                existing_vote.save(update_fields=["action"])
+
+            # Apply the change in SQL rather than writing back counts read
+            # earlier, and touch nothing but the counters
+            Review.objects.filter(pk=review.pk).update(
+                **{
+                    VOTE_COUNTERS[name]: F(VOTE_COUNTERS[name]) + delta
+                    for name, delta in deltas.items()
+                }
+            )
+            counts = (
+                Review.objects.filter(pk=review.pk)
+                .values("helpful_count", "not_helpful_count")
+                .get()
+            )
 
-        return JsonResponse(
-            {
-                "helpful_count": review.helpful_count,
-                "not_helpful_count": review.not_helpful_count,
-            }
-        )
+        return JsonResponse(counts)
 
 
 @method_decorator(login_required, name="dispatch")
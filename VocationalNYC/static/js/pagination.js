@@ -1,55 +1,90 @@
+// Course list pagination.
+// Pages come from the server one at a time (keyset pagination on
+// /courses/sort/?format=json). The browser only remembers the cursors of the
+// pages it has visited, so "Prev" can step back.
 
+let paginationState = { cursors: [""], nextCursor: "", numPages: 1 };
+
+function courseListParams(cursor) {
+    const params = new URLSearchParams(window.location.search);
+    const dropdown = document.getElementById("SortByDropDown");
+    if (dropdown && dropdown.value && dropdown.value !== "blank") {
+        const [field, direction] = dropdown.value.split("-");
+        params.set("sort", field);      // e.g., "name"
+        params.set("order", direction); // e.g., "asc" or "desc"
+    }
+    params.set("per_page", document.getElementById("itemsPerPage").value);
+    params.set("format", "json");
+    if (cursor) {
+        params.set("cursor", cursor);
+    } else {
+        params.delete("cursor");
+    }
+    return params;
+}
+
+function renderPageInfo() {
+    const pageNumber = paginationState.cursors.length;
+    document.getElementById("pageInfo").textContent = `Page ${pageNumber} of ${paginationState.numPages}`;
+    document.getElementById("prevPage").disabled = pageNumber === 1;
+    document.getElementById("nextPage").disabled = !paginationState.nextCursor;
+}
+
+function loadCoursePage(cursor) {
+    return fetch(`/courses/sort/?${courseListParams(cursor).toString()}`, {
+        method: "GET",
+        headers: {
+            "X-Requested-With": "XMLHttpRequest",
+        },
+    })
+    .then(response => response.json())
+    .then(data => {
+        document.getElementById("All-Course-Container").innerHTML = data.html;
+        paginationState.nextCursor = data.next_cursor || "";
+        paginationState.numPages = data.num_pages;
+        return data;
+    });
+}
+
+// Reload from the first page, e.g. after the sort order or page size changed
 function reinitializePagination() {
-        const courses = Array.from(document.querySelectorAll('.Course-Card-Outer-Container'));
-        const itemsPerPage = document.getElementById('itemsPerPage');
-        const prevPageBtn = document.getElementById('prevPage');
-        const nextPageBtn = document.getElementById('nextPage');
-        const pageInfo = document.getElementById('pageInfo');
-
-        let currentPage = 1;
-        let maxItemsPerPage = parseInt(itemsPerPage.value);
-
-        // Function to render courses for the current page
-        function renderCourses() {
-            const start = (currentPage - 1) * maxItemsPerPage;
-            const end = start + maxItemsPerPage;
-
-            // Hide all courses first
-            courses.forEach(course => course.style.display = 'none');
-
-            // Display only the relevant courses
-            courses.slice(start, end).forEach(course => course.style.display = 'block');
-
-            // Update pagination info
-            pageInfo.textContent = `Page ${currentPage} of ${Math.ceil(courses.length / maxItemsPerPage)}`;
-            prevPageBtn.disabled = currentPage === 1;
-            nextPageBtn.disabled = currentPage === Math.ceil(courses.length / maxItemsPerPage);
-        }
-
-        // Event Listeners for Pagination
-        prevPageBtn.addEventListener('click', () => {
-            if (currentPage > 1) {
-                currentPage--;
-                renderCourses();
-            }
-        });
-
-        nextPageBtn.addEventListener('click', () => {
-            if (currentPage < Math.ceil(courses.length / maxItemsPerPage)) {
-                currentPage++;
-                renderCourses();
-            }
-        });
-
-        // Event Listener for changing number of items per page
-        itemsPerPage.addEventListener('change', (e) => {
-            maxItemsPerPage = parseInt(e.target.value);
-            currentPage = 1; // Reset to first page
-            renderCourses();
-        });
-
-        // Initial render
-        renderCourses();
+    loadCoursePage("")
+    .then(() => {
+        paginationState.cursors = [""];
+        renderPageInfo();
+    })
+    .catch(error => console.error("Pagination error:", error));
 }
 
-document.addEventListener('DOMContentLoaded', reinitializePagination);
+document.addEventListener("DOMContentLoaded", function () {
+    const list = document.querySelector("#All-Course-Container .CourseList");
+    if (list) {
+        paginationState.nextCursor = list.dataset.nextCursor;
+        paginationState.numPages = parseInt(list.dataset.numPages) || 1;
+    }
+    renderPageInfo();
+
+    document.getElementById("nextPage").addEventListener("click", () => {
+        const cursor = paginationState.nextCursor;
+        if (!cursor) return;
+        loadCoursePage(cursor)
+        .then(() => {
+            paginationState.cursors.push(cursor);
+            renderPageInfo();
+        })
+        .catch(error => console.error("Pagination error:", error));
+    });
+
+    document.getElementById("prevPage").addEventListener("click", () => {
+        if (paginationState.cursors.length === 1) return;
+        const cursors = paginationState.cursors.slice(0, -1);
+        loadCoursePage(cursors[cursors.length - 1])
+        .then(() => {
+            paginationState.cursors = cursors;
+            renderPageInfo();
+        })
+        .catch(error => console.error("Pagination error:", error));
+    });
+
+    document.getElementById("itemsPerPage").addEventListener("change", reinitializePagination);
+});
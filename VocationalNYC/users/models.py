@@ -1,3 +1,4 @@
+from django.core.cache import cache
 from django.db import models
 from .managers import CustomUserManager
 from django.contrib.auth.models import AbstractUser
@@ -76,6 +77,14 @@ class Student(models.Model):
         return f"Student: {self.user.username}"
 
 
+# Cache key for the provider directory row count (see users.views)
+PROVIDER_COUNT_KEY = "provider_list_count"
+
+
+def invalidate_provider_count():
+    cache.delete(PROVIDER_COUNT_KEY)
+
+
 def certificate_file_path(instance, filename):
     # Generate a unique filename using UUID
     ext = filename.split(".")[-1]
@@ -107,6 +116,9 @@ class Provider(models.Model):
         blank=True,
         help_text="Upload your business certificate (PDF, JPG, PNG). Size limit: 5MB",
     )
+    # Coordinates of ``address``, filled in by courses.geocoding
+    latitude = models.FloatField(null=True, blank=True, editable=False)
+    longitude = models.FloatField(null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
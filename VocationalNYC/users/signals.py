@@ -0,0 +1,14 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Provider, invalidate_provider_count
+
+
+@receiver(post_save, sender=Provider)
+@receiver(post_delete, sender=Provider)
+def clear_provider_count(sender, raw=False, **kwargs):
+    if raw:
+        return
+    # After commit, so a concurrent request cannot re-cache the old count
+    transaction.on_commit(invalidate_provider_count)
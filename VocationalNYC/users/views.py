@@ -1,8 +1,8 @@
-import requests
 import logging
 import os
 
 from django.shortcuts import render, redirect
+from django.utils.decorators import method_decorator
 from django.views import generic
 from allauth.account.views import SignupView, LoginView, PasswordResetFromKeyView
 from .forms import (
@@ -21,13 +21,15 @@ from django.db import transaction
 from django.views.decorators.http import require_POST
 import json
 
-from users.models import Provider, Student, Tag
+from users.models import PROVIDER_COUNT_KEY, Provider, Student, Tag
 from bookmarks.models import BookmarkList
 from review.models import Review
 
 from allauth.account.views import PasswordResetView
 from django.http import JsonResponse, HttpResponseRedirect
 from django.urls import reverse
+from vocationalnyc.conditional import conditional_page, page_version
+from vocationalnyc.pagination import CachedCountPaginator
 
 logger = logging.getLogger(__name__)
 
@@ -288,6 +290,9 @@ def check_provider_name(request):
         return JsonResponse({"exists": False})
 
 
+@method_decorator(
+    conditional_page(lambda request, pk: [page_version("provider", pk)]), name="get"
+)
 class ProviderDetailView(generic.DetailView):
     model = Provider
     template_name = "provider/provider_detail.html"
@@ -300,40 +305,41 @@ class ProviderDetailView(generic.DetailView):
 
 
 class ProviderListView(generic.ListView):
+    """
+    Provider directory, served purely from the database.
+
+    Providers are refreshed offline by ``manage.py sync_courses``.
+    """
+
     model = Provider
     template_name = "provider/provider_list.html"
     context_object_name = "all_provider"
+    paginate_by = 50
+    paginator_class = CachedCountPaginator
+    orderings = {
+        "name": ["name"],
+        "-name": ["-name"],
+        "newest": ["-created_at", "-provider_id"],
+    }
+
+    def get_ordering(self):
+        return self.orderings.get(self.request.GET.get("order"), ["name"])
 
     def get_queryset(self):
-        API_URL = "https://data.cityofnewyork.us/resource/fgq8-am2v.json"
-        response = requests.get(API_URL)
-        if response.status_code == 200:
-            all_data = response.json()
-
-            for data in all_data:
-                provider_name = data.get("organization_name", "").strip()
-
-                if not provider_name:
-                    continue  # skip invalid data
-
-                # check whether provider exists
-                provider, created = Provider.objects.get_or_create(
-                    name=provider_name,
-                    defaults={
-                        "phone_num": data.get("phone1", "0000000000"),
-                        "address": data.get("address1", "Unknown"),
-                        "open_time": data.get("open_time", "N/A"),
-                        "provider_desc": data.get(
-                            "provider_description", "No description"
-                        ),
-                        "website": data.get("website", ""),
-                    },
-                )
+        return Provider.objects.only(
+            "provider_id", "name", "phone_num", "address", "website"
+        ).order_by(*self.get_ordering())
 
-        else:
-            print(f"Call API failed, the status code is: {response.status_code}")
+    def get_paginator(self, queryset, per_page, **kwargs):
+        return self.paginator_class(
+            queryset, per_page, cache_key=PROVIDER_COUNT_KEY, **kwargs
+        )
 
-        return Provider.objects.all()
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        order = self.request.GET.get("order")
+        context["order"] = order if order in self.orderings else "name"
+        return context
 
 
 @login_required
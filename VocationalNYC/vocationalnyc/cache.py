@@ -0,0 +1,93 @@
+"""
+Cache helpers shared by the apps.
+
+``get_or_compute`` is ``cache.get_or_set`` with stampede protection: when a
+popular key expires, one worker takes a short-lived lock and recomputes the
+value while the others wait for it, instead of every worker hitting the
+database (or an external API) at once. ``cache_lock`` is the lock on its own,
+for jobs that must not run twice at the same time.
+
+Locks rely on ``cache.add`` being atomic, which holds for the Redis backend
+used in production.
+"""
+
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.core.cache import cache
+
+LOCK_TIMEOUT = 30
+LOCK_WAIT = 5
+POLL_INTERVAL = 0.05
+
+_missing = object()
+
+
+class LockNotAcquired(Exception):
+    pass
+
+
+def _lock_key(key):
+    return f"lock:{key}"
+
+
+@contextmanager
+def cache_lock(key, timeout=LOCK_TIMEOUT):
+    """
+    Hold ``key``'s lock for the duration of the block; raise
+    ``LockNotAcquired`` if someone else holds it. The lock expires after
+    ``timeout`` seconds in case its holder dies.
+    """
+    lock_key = _lock_key(key)
+    token = uuid.uuid4().hex
+    if not cache.add(lock_key, token, timeout):
+        raise LockNotAcquired(key)
+    try:
+        yield
+    finally:
+        # If the block outlived the timeout, another worker may hold the
+        # lock by now; only release it while it is still ours
+        if cache.get(lock_key) == token:
+            cache.delete(lock_key)
+
+
+def get_or_compute(
+    key, compute, timeout=None, lock_timeout=LOCK_TIMEOUT, wait=LOCK_WAIT
+):
+    """
+    Return the cached value of ``key``, computing and caching it on a miss.
+
+    ``timeout`` may be a number of seconds, ``None`` (never expire) or a
+    function of the computed value returning either. Any value, including
+    ``None``, is cached; exceptions from ``compute`` are not.
+    """
+    value = cache.get(key, _missing)
+    if value is not _missing:
+        return value
+
+    deadline = time.monotonic() + wait
+    while True:
+        try:
+            with cache_lock(key, lock_timeout):
+                value = compute()
+                if callable(timeout):
+                    cache.set(key, value, timeout(value))
+                else:
+                    cache.set(key, value, timeout)
+                return value
+        except LockNotAcquired:
+            pass
+
+        # Another worker is computing it; wait for its result
+        while time.monotonic() < deadline:
+            time.sleep(POLL_INTERVAL)
+            value = cache.get(key, _missing)
+            if value is not _missing:
+                return value
+            if cache.get(_lock_key(key)) is None:
+                # It gave up (compute raised); try to take over
+                break
+        else:
+            # Don't keep the request waiting any longer
+            return compute()
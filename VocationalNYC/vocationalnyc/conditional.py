@@ -0,0 +1,128 @@
+"""
+Conditional GET for the catalog pages.
+
+A page's ``ETag`` is computed from cheap version stamps instead of from the
+rendered response: the stamps of what the page shows (the catalog, a course,
+a provider), the query string and whatever differs per visitor. A matching
+``If-None-Match`` gets a 304 without the view running any of its queries.
+
+Page stamps live in the cache. Signal handlers bump them whenever what the
+page shows changes: saving or deleting a course, provider, review, reply or
+vote bumps the affected course and provider pages (the catalog sync bumps
+them explicitly), and bookmark list changes bump the owner's stamp. A bump
+just deletes the stamp once the write commits, and the next reader stores
+a fresh one with the current time, which is also the page's
+``Last-Modified``.
+
+The comparison tray kept in the session is part of every visitor's ETag,
+signed in or not, and a page with pending flash messages gets no ETag.
+
+Anonymous pages carry ``Cache-Control: public`` with a short ``max-age`` so
+nginx or a CDN can serve them. Pages for signed-in users, sessions with
+flash messages or a comparison tray, and pages rendering a CSRF token
+(``public=False``, or any response whose rendering asked for a token) are
+``private`` and must be revalidated on every use.
+"""
+
+import hashlib
+import json
+import uuid
+from functools import wraps
+
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+PUBLIC_MAX_AGE = 60
+
+
+def _page_key(kind, pk):
+    return f"page_version:{kind}:{pk}"
+
+
+def page_version(kind, pk):
+    """``(stamp, modified)`` of one page's version, creating it if needed."""
+    return cache.get_or_set(
+        _page_key(kind, pk), lambda: (uuid.uuid4().hex, timezone.now()), None
+    )
+
+
+def bump_page_versions(kind, pks):
+    keys = [_page_key(kind, pk) for pk in pks]
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def _is_shared(request):
+    """Whether the response may be stored by shared caches."""
+    return (
+        not request.user.is_authenticated
+        and not request.session.get("comparison_courses")
+        and not len(get_messages(request))
+        # Set once the page has rendered a CSRF token, which belongs to
+        # this browser alone
+        and not request.META.get("CSRF_COOKIE_NEEDS_UPDATE")
+    )
+
+
+def _viewer(request):
+    user = request.user
+    viewer = {"comparison": request.session.get("comparison_courses", [])}
+    if user.is_authenticated:
+        viewer["user"] = [user.pk, user.username, getattr(user, "role", None)]
+        viewer["version"] = page_version("user", user.pk)[0]
+    return viewer
+
+
+def conditional_page(versions, public=True):
+    """
+    Serve 304s for a view whose output only depends on the request path,
+    the visitor and the stamps returned by ``versions(request, *args,
+    **kwargs)`` (a list of ``(stamp, modified)`` pairs, e.g. from
+    ``page_version``). Pass ``public=False`` for views that render a CSRF
+    token for every visitor, so their 304s aren't marked public either.
+    """
+
+    def stamps(request, *args, **kwargs):
+        if not hasattr(request, "_page_stamps"):
+            request._page_stamps = list(versions(request, *args, **kwargs))
+        return request._page_stamps
+
+    def etag(request, *args, **kwargs):
+        # Flash messages are shown once; never answer 304 over them
+        if len(get_messages(request)):
+            return None
+        state = {
+            "stamps": [stamp for stamp, _ in stamps(request, *args, **kwargs)],
+            "viewer": _viewer(request),
+            "path": request.get_full_path(),
+        }
+        return hashlib.sha256(json.dumps(state, sort_keys=True).encode()).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        # Per-visitor state has no modification time, so only pages that
+        # are the same for everyone get one
+        if not (public and _is_shared(request)):
+            return None
+        return max(modified for _, modified in stamps(request, *args, **kwargs))
+
+    def decorator(view):
+        conditional_view = condition(etag_func=etag, last_modified_func=last_modified)(
+            view
+        )
+
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            if public and _is_shared(request):
+                patch_cache_control(response, public=True, max_age=PUBLIC_MAX_AGE)
+            else:
+                patch_cache_control(response, private=True, no_cache=True)
+            patch_vary_headers(response, ("Cookie",))
+            return response
+
+        return wrapped
+
+    return decorator
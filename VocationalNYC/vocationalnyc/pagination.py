@@ -0,0 +1,24 @@
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
+
+from .cache import get_or_compute
+
+
+class CachedCountPaginator(Paginator):
+    """
+    Paginator that keeps the total row count in the cache, so paging through
+    a large table doesn't run ``COUNT(*)`` on every request.
+    """
+
+    def __init__(self, *args, cache_key, cache_timeout=300, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache_key = cache_key
+        self.cache_timeout = cache_timeout
+
+    @cached_property
+    def count(self):
+        return get_or_compute(
+            self.cache_key,
+            lambda: super(CachedCountPaginator, self).count,
+            self.cache_timeout,
+        )
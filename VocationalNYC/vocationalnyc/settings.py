@@ -18,6 +18,8 @@ import environ
 import json
 
 import os
+import sys
+import tempfile
 
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -92,6 +94,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "users",
     "allauth",
     "allauth.account",
@@ -175,6 +178,42 @@ else:
         },
     }
 
+# Cache: Redis (the same server as the channel layer) is shared by every
+# worker and survives restarts. Without Redis, a file-based cache still gives
+# local runs one cache across processes. Tests get an isolated in-memory one.
+TESTING = len(sys.argv) > 1 and sys.argv[1] == "test"
+
+if TESTING:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+elif USE_REDIS:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": env(
+                "REDIS_CACHE_URL",
+                default="redis://{}:{}/1".format(
+                    os.environ.get("REDIS_HOST", "localhost"),
+                    os.environ.get("REDIS_PORT", 6379),
+                ),
+            ),
+            "KEY_PREFIX": "vocationalnyc",
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": env(
+                "CACHE_DIR",
+                default=os.path.join(tempfile.gettempdir(), "vocationalnyc_cache"),
+            ),
+        }
+    }
+
 # Database Configuration
 if DJANGO_ENV == "travis":
     DATABASES = {
@@ -290,6 +329,8 @@ ACCOUNT_ADAPTER = "users.adapters.MyAccountAdapter"
 
 
 GOOGLE_MAPS_API_KEY = env("GOOGLE_MAPS_API_KEY", default="")
+# Backend used by the batch geocoding job (see courses/geocoding.py)
+GEOCODER = env("GEOCODER", default="courses.geocoding.GoogleGeocoder")
 
 # Add logging configuration
 LOGGING = {
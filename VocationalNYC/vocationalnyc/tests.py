@@ -0,0 +1,71 @@
+import threading
+from unittest.mock import Mock, patch
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from .cache import LockNotAcquired, _lock_key, cache_lock, get_or_compute
+
+
+class GetOrComputeTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_computes_once_and_caches_any_value(self):
+        compute = Mock(return_value=None)
+
+        self.assertIsNone(get_or_compute("key", compute))
+        self.assertIsNone(get_or_compute("key", compute))
+
+        compute.assert_called_once()
+
+    def test_exceptions_are_not_cached(self):
+        compute = Mock(side_effect=[ValueError("boom"), 42])
+
+        with self.assertRaises(ValueError):
+            get_or_compute("key", compute)
+        self.assertEqual(get_or_compute("key", compute), 42)
+        # The lock was released despite the error
+        with cache_lock("key"):
+            pass
+
+    def test_timeout_can_depend_on_the_value(self):
+        with patch("vocationalnyc.cache.cache.set") as cache_set:
+            get_or_compute("key", lambda: None, timeout=lambda v: 10 if v else 1)
+        cache_set.assert_called_once_with("key", None, 1)
+
+    def test_waits_for_the_worker_holding_the_lock(self):
+        compute = Mock(return_value="mine")
+
+        with cache_lock("key"):
+            timer = threading.Timer(0.1, cache.set, args=("key", "theirs"))
+            timer.start()
+            value = get_or_compute("key", compute, wait=2)
+            timer.join()
+
+        self.assertEqual(value, "theirs")
+        compute.assert_not_called()
+
+    def test_computes_anyway_when_the_wait_runs_out(self):
+        with cache_lock("key"):
+            value = get_or_compute("key", lambda: "mine", wait=0.1)
+        self.assertEqual(value, "mine")
+
+    def test_cache_lock_is_exclusive(self):
+        with cache_lock("job"):
+            with self.assertRaises(LockNotAcquired):
+                with cache_lock("job"):
+                    pass
+        with cache_lock("job"):
+            pass
+
+    def test_expired_lock_taken_by_another_worker_is_kept(self):
+        with cache_lock("job", timeout=30):
+            # Ours ran out and someone else acquired it
+            cache.delete(_lock_key("job"))
+            self.assertTrue(cache.add(_lock_key("job"), "theirs"))
+
+        self.assertEqual(cache.get(_lock_key("job")), "theirs")
+        with self.assertRaises(LockNotAcquired):
+            with cache_lock("job"):
+                pass